@@ -11,7 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from app.config import settings
 from app.database import Base
 # Import all models to ensure they are registered with Base
-from app.models import user, scan, recipe, shopping_list, pantry
+from app.models import user, scan, recipe, shopping_list, pantry, llm_usage, recipe_catalog, job, stored_image
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,46 @@
+"""Add hourly LLM usage rollups
+
+Revision ID: 004_llm_usage_rollups
+Revises: 003_performance_indexes
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "004_llm_usage_rollups"
+down_revision: Union[str, None] = "003_performance_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_usage_rollups",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False, index=True),
+        sa.Column("endpoint", sa.String(100), nullable=False),
+        sa.Column("user_id", sa.String(36), nullable=False, index=True),
+        sa.Column("model", sa.String(200), nullable=False),
+        sa.Column("outcome", sa.String(50), nullable=False),
+        sa.Column("calls", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completion_tokens", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cost_usd", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("queue_wait_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("ttfb_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("latency_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("latency_histogram", sa.JSON(), nullable=False),
+        sa.UniqueConstraint(
+            "bucket_start", "endpoint", "user_id", "model", "outcome",
+            name="uq_llm_usage_rollups_bucket",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("llm_usage_rollups")
@@ -0,0 +1,27 @@
+"""Add MinHash signatures to recipes for near-duplicate detection
+
+Revision ID: 005_recipe_minhash
+Revises: 004_llm_usage_rollups
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "005_recipe_minhash"
+down_revision: Union[str, None] = "004_llm_usage_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled in as recipes are saved; backfill with `python -m app.dedupe_recipes`
+    op.add_column("recipes", sa.Column("minhash", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("recipes", "minhash")
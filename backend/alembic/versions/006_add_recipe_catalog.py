@@ -0,0 +1,57 @@
+"""Add shared anonymized recipe catalog
+
+Revision ID: 006_recipe_catalog
+Revises: 005_recipe_minhash
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "006_recipe_catalog"
+down_revision: Union[str, None] = "005_recipe_minhash"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recipe_catalog",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("fingerprint", sa.String(64), nullable=False, unique=True),
+        sa.Column("title", sa.String(300), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("cook_time", sa.Integer()),
+        sa.Column("difficulty", sa.String(50)),
+        sa.Column("servings", sa.Integer()),
+        sa.Column("ingredients", sa.JSON(), nullable=False),
+        sa.Column("instructions", sa.JSON(), nullable=False),
+        sa.Column("required_ingredients", sa.JSON(), nullable=False),
+        sa.Column("required_count", sa.Integer(), nullable=False),
+        sa.Column("contributions", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("times_served", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "recipe_catalog_ingredients",
+        sa.Column(
+            "catalog_id",
+            sa.String(36),
+            sa.ForeignKey("recipe_catalog.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("name", sa.String(200), primary_key=True),
+    )
+    op.create_index(
+        "ix_recipe_catalog_ingredients_name", "recipe_catalog_ingredients", ["name"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recipe_catalog_ingredients_name", table_name="recipe_catalog_ingredients")
+    op.drop_table("recipe_catalog_ingredients")
+    op.drop_table("recipe_catalog")
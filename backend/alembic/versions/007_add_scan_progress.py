@@ -0,0 +1,34 @@
+"""Add scan processing progress columns
+
+Revision ID: 007_scan_progress
+Revises: 006_recipe_catalog
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "007_scan_progress"
+down_revision: Union[str, None] = "006_recipe_catalog"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scans", sa.Column("stage", sa.String(50), nullable=True))
+    op.add_column("scans", sa.Column("attempts", sa.Integer(), nullable=True, server_default="0"))
+    op.add_column("scans", sa.Column("error", sa.Text(), nullable=True))
+    op.add_column("scans", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    # Existing scans finished synchronously; their stage is their status
+    op.execute("UPDATE scans SET stage = status")
+
+
+def downgrade() -> None:
+    op.drop_column("scans", "updated_at")
+    op.drop_column("scans", "error")
+    op.drop_column("scans", "attempts")
+    op.drop_column("scans", "stage")
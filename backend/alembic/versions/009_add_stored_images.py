@@ -0,0 +1,35 @@
+"""Add reference-counted content-addressed image storage
+
+Revision ID: 009_stored_images
+Revises: 008_jobs
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "009_stored_images"
+down_revision: Union[str, None] = "008_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing uploads keep their flat uuid filenames and have no row;
+    # deleting their scan deletes the file directly, as before.
+    op.create_table(
+        "stored_images",
+        sa.Column("key", sa.String(200), primary_key=True),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stored_images")
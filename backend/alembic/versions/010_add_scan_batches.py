@@ -0,0 +1,32 @@
+"""Add parent scans for multi-image batch scans
+
+Revision ID: 010_scan_batches
+Revises: 009_stored_images
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "010_scan_batches"
+down_revision: Union[str, None] = "009_stored_images"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scans", sa.Column("parent_id", sa.String(36), nullable=True))
+    op.create_foreign_key(
+        "fk_scans_parent_id", "scans", "scans", ["parent_id"], ["id"], ondelete="CASCADE"
+    )
+    op.create_index("ix_scans_parent_id", "scans", ["parent_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scans_parent_id", table_name="scans")
+    op.drop_constraint("fk_scans_parent_id", "scans", type_="foreignkey")
+    op.drop_column("scans", "parent_id")
@@ -0,0 +1,37 @@
+"""Add fridge-state diffs against the user's previous scan
+
+Revision ID: 011_scan_diffs
+Revises: 010_scan_batches
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "011_scan_diffs"
+down_revision: Union[str, None] = "010_scan_batches"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scans", sa.Column("previous_scan_id", sa.String(36), nullable=True))
+    op.create_foreign_key(
+        "fk_scans_previous_scan_id", "scans", "scans", ["previous_scan_id"], ["id"], ondelete="SET NULL"
+    )
+    op.add_column("scans", sa.Column("diff", sa.JSON(), nullable=True))
+    # Finding the previous completed scan: newest first per user
+    op.create_index(
+        "ix_scans_user_status_created_at", "scans", ["user_id", "status", sa.text("created_at DESC")]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scans_user_status_created_at", table_name="scans")
+    op.drop_column("scans", "diff")
+    op.drop_constraint("fk_scans_previous_scan_id", "scans", type_="foreignkey")
+    op.drop_column("scans", "previous_scan_id")
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.database import get_db
+from app.models.user import User
+from app.services.auth import get_admin_user
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -63,11 +65,22 @@ async def full_health_check(db: Session = Depends(get_db)):
         logger.error(f"Groq API check failed: {e}")
         checks["groq_api"] = "unhealthy"
 
+    # Groq limiter/breaker state for this worker
+    from app.services.groq_service import groq_breaker, groq_limiter
+    if groq_breaker.state != groq_breaker.CLOSED:
+        checks["groq_circuit"] = groq_breaker.state
+    else:
+        checks["groq_circuit"] = "healthy"
+
     overall_status = "healthy" if all(v in ["healthy", "configured"] for v in checks.values()) else "degraded"
 
     return {
         "status": overall_status,
         "checks": checks,
+        "groq": {
+            "limiter": groq_limiter.stats(),
+            "breaker": groq_breaker.stats(),
+        },
         "version": "1.0.0"
     }
 
@@ -93,11 +106,11 @@ async def groq_api_test():
 
     # Try a simple API call
     try:
-        from groq import Groq
-        client = Groq(api_key=settings.GROQ_API_KEY)
+        from app.services.groq_service import get_client
+        client = await get_client()
 
         # Simple test prompt
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[{"role": "user", "content": "Say API working in exactly 2 words."}],
             temperature=0,
@@ -115,3 +128,96 @@ async def groq_api_test():
         logger.error(f"Groq API test failed: {e}")
 
     return result
+
+
+@router.get("/health/llm")
+async def llm_health():
+    """Limiter, circuit breaker and model routing state for Groq calls."""
+    from app.services.groq_service import groq_breaker, groq_limiter, text_router, vision_router
+    from app.services.llm_usage import usage_recorder
+
+    return {
+        "status": "healthy" if groq_breaker.state == groq_breaker.CLOSED else "degraded",
+        "limiter": groq_limiter.stats(),
+        "breaker": groq_breaker.stats(),
+        "usage_recorder": usage_recorder.stats(),
+        "routing": {
+            "vision": vision_router.stats(),
+            "text": text_router.stats(),
+        },
+    }
+
+
+@router.get("/health/llm/usage")
+async def llm_usage_rollup(
+    group_by: str = Query("endpoint", pattern="^(endpoint|user_id|model)$"),
+    hours: int = Query(24, ge=1, le=24 * 90),
+    db: Session = Depends(get_db),
+    _admin: User = Depends(get_admin_user),
+):
+    """Persisted LLM cost and latency percentiles per endpoint, user or model. Admins only."""
+    from app.services.llm_usage import usage_summary
+
+    try:
+        return {"group_by": group_by, "hours": hours, "usage": usage_summary(db, group_by, hours)}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+
+@router.get("/health/cache")
+async def cache_stats():
+    """Hit/miss statistics for the in-process LLM result caches."""
+    from app.services.groq_service import detection_cache, recipe_cache
+    from app.services.prefetch import recipe_prefetcher
+
+    return {
+        "detection": detection_cache.stats(),
+        "recipes": recipe_cache.stats(),
+        "prefetch": recipe_prefetcher.stats(),
+    }
+
+
+@router.get("/health/scans")
+async def scan_worker_stats():
+    """Scan worker pool queue depth, throughput and retries for this worker."""
+    from app.services.scan_jobs import scan_workers
+
+    return scan_workers.stats()
+
+
+@router.get("/health/images")
+async def image_pool_stats():
+    """Image process pool size and throughput for this worker."""
+    from app.services.image_pool import image_pool
+
+    return image_pool.stats()
+
+
+@router.get("/health/catalog")
+async def catalog_stats(db: Session = Depends(get_db)):
+    """Shared recipe catalog size, hit rate and estimated LLM spend saved."""
+    from sqlalchemy import func
+
+    from app.models.recipe_catalog import CatalogRecipe
+    from app.services.recipe_catalog import recipe_catalog
+
+    entries, served = db.query(func.count(CatalogRecipe.id), func.sum(CatalogRecipe.times_served)).one()
+    return {
+        **recipe_catalog.stats(),
+        "entries": entries,
+        "total_times_served": served or 0,
+    }
+
+
+@router.get("/health/metrics")
+async def metrics_snapshot():
+    """In-process counters for this worker."""
+    from app.core.metrics import metrics
+    from app.services.groq_service import text_flight, vision_flight
+
+    snapshot = metrics.snapshot()
+    snapshot["singleflight"] = {
+        "vision": vision_flight.stats(),
+        "text": text_flight.stats(),
+    }
+    return snapshot
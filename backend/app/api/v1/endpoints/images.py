@@ -0,0 +1,67 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.services.derivatives import DERIVATIVE_FORMATS, derivative_cache, etag
+from app.services.image import validate_image_path
+from app.services.storage import StorageError
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+router = APIRouter()
+
+# Variants are keyed by content hash, so a URL's bytes never change
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ORIGINAL_MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "heic": "image/heic",
+}
+
+
+@router.get("/{key:path}")
+async def get_image(
+    request: Request,
+    key: str,
+    size: int | None = Query(None, description="Fit within size x size pixels"),
+    format: Literal["jpeg", "webp"] | None = Query(None, description="Re-encode as this format"),
+):
+    """
+    Serve a stored image, or a resized/re-encoded variant of it.
+
+    Variants are rendered on first request and cached on disk. Responses are
+    immutable with strong ETags, and support Range requests.
+    """
+    if not validate_image_path(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+
+    if size is not None:
+        if size not in settings.IMAGE_DERIVATIVE_SIZES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported size. Allowed: {', '.join(map(str, settings.IMAGE_DERIVATIVE_SIZES))}"
+            )
+        format = format or "jpeg"
+
+    tag = etag(key, size, format)
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if tag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        path = await derivative_cache.get(key, size, format)
+    except StorageError as e:
+        logger.info(f"Image not available: {e}")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found") from e
+
+    if format is None:
+        media_type = ORIGINAL_MEDIA_TYPES.get(key.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+    else:
+        media_type = DERIVATIVE_FORMATS[format][2]
+    return FileResponse(path, media_type=media_type, headers=headers)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from app.core.limiter import limiter
+from app.database import get_db
+from app.models.job import Job
+from app.models.user import User
+from app.schemas.job import JobResponse
+from app.services.auth import get_current_user
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+@limiter.limit("120/minute")
+async def get_job(
+    request: Request,
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a background job's status and, once it has succeeded, its result.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    if job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this job"
+        )
+
+    return job
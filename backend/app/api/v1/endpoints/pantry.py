@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.core.limiter import limiter
 from app.database import get_db
 from app.models.pantry import PantryItem
+from app.models.scan import Scan
 from app.models.user import User
 from app.schemas.pantry import (
     PANTRY_CATEGORIES,
@@ -13,9 +14,13 @@ from app.schemas.pantry import (
     PantryItemResponse,
     PantryItemUpdate,
     PantryResponse,
+    PantrySyncRequest,
+    PantrySyncResponse,
 )
 from app.services.auth import get_current_user
 from app.services.categorization import categorize_ingredient
+from app.services.fridge_state import diff_ingredients
+from app.services.pantry import apply_scan_diff, load_pantry_ingredients
 
 router = APIRouter()
 
@@ -117,6 +122,57 @@ async def add_pantry_items_bulk(
     return created_items
 
 
+@router.post("/sync", response_model=PantrySyncResponse)
+@limiter.limit("10/minute")
+async def sync_pantry_from_scan(
+    request: Request,
+    sync: PantrySyncRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Update the pantry from what a scan changed since the user's previous scan.
+
+    Only added and changed items are written (and, with ``remove_missing``,
+    removed ones deleted), so frequent scanners don't rewrite their whole
+    pantry each time. Pass ``full`` to reconcile the pantry with the whole
+    scan instead; with ``remove_missing`` that deletes whatever it doesn't show.
+    """
+    scan = db.query(Scan).filter(Scan.id == sync.scan_id).first()
+
+    if not scan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scan not found"
+        )
+
+    if scan.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to use this scan"
+        )
+
+    if scan.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Scan has not completed"
+        )
+
+    if sync.full or scan.diff is None:
+        # Reconcile against the pantry as it is before this sync (scans from
+        # before diffs were recorded have nothing else to go on)
+        diff = diff_ingredients(load_pantry_ingredients(db, current_user.id), scan.ingredients)
+    else:
+        diff = scan.diff
+    added, updated, removed = apply_scan_diff(db, current_user.id, diff, sync.remove_missing)
+    db.commit()
+
+    for item in added + updated:
+        db.refresh(item)
+
+    return PantrySyncResponse(added=added, updated=updated, removed=removed, unchanged=diff["unchanged"])
+
+
 @router.put("/{item_id}", response_model=PantryItemResponse)
 @limiter.limit("30/minute")
 async def update_pantry_item(
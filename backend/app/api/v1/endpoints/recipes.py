@@ -1,17 +1,35 @@
-import asyncio
+import json
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, load_only
 
+from app.config import settings
 from app.core.limiter import limiter
+from app.core.metrics import metrics
 from app.database import get_db
-from app.models.pantry import PantryItem
+from app.models.job import Job
 from app.models.recipe import Recipe
 from app.models.scan import Scan
 from app.models.user import User
+from app.schemas.job import JobResponse
 from app.schemas.recipe import RecipeGenerate, RecipeListResponse, RecipeResponse
 from app.services.auth import get_current_user
-from app.services.groq_service import generate_recipes
+from app.services.fridge_state import mark_new_ingredients
+from app.services.groq_service import (
+    generate_recipes,
+    merge_ingredients,
+    recipe_cache,
+    recipe_cache_key,
+    stream_recipes,
+)
+from app.services.job_queue import PermanentJobError, enqueue, job_handler
+from app.services.llm_usage import bind_call_context
+from app.services.pantry import load_pantry_ingredients
+from app.services.prefetch import recipe_prefetcher
+from app.services.recipe_catalog import recipe_catalog
+from app.services.recipe_dedup import RecipeIndex, recipe_indexes, recipe_signature
+from app.services.resilience import ServiceUnavailableError
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -19,19 +37,9 @@ logger = setup_logger(__name__)
 router = APIRouter()
 
 
-@router.post("/generate", response_model=list[RecipeResponse], status_code=status.HTTP_201_CREATED)
-@limiter.limit("15/minute")
-async def generate_recipes_from_scan(
-    request: Request,
-    recipe_request: RecipeGenerate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Generate recipe suggestions from a scan.
-    """
-    # Get the scan
-    scan = db.query(Scan).filter(Scan.id == recipe_request.scan_id).first()
+def load_generation_inputs(db: Session, scan_id: str, current_user: User) -> tuple[Scan, list[dict]]:
+    """Fetch and authorize the scan, and the user's pantry in ingredient format."""
+    scan = db.query(Scan).filter(Scan.id == scan_id).first()
 
     if not scan:
         raise HTTPException(
@@ -51,60 +59,224 @@ async def generate_recipes_from_scan(
             detail="No ingredients detected in scan"
         )
 
-    # Fetch user's pantry items
-    pantry_items = (
-        db.query(PantryItem)
-        .options(load_only(PantryItem.name, PantryItem.quantity))
-        .filter(PantryItem.user_id == current_user.id)
+    pantry_ingredients = load_pantry_ingredients(db, current_user.id)
+
+    return scan, pantry_ingredients
+
+
+def build_recipe(recipe_data: dict, user_id: str, scan_id: str) -> Recipe:
+    """Create a Recipe row from a generated recipe draft."""
+    return Recipe(
+        user_id=user_id,
+        scan_id=scan_id,
+        title=recipe_data.get("title", "Untitled Recipe"),
+        description=recipe_data.get("description"),
+        cook_time=recipe_data.get("cook_time"),
+        difficulty=recipe_data.get("difficulty", "medium"),
+        servings=recipe_data.get("servings", 2),
+        ingredients=recipe_data.get("ingredients", []),
+        instructions=recipe_data.get("instructions", []),
+        is_favorite=False,
+        times_made=0
+    )
+
+
+def save_recipe_draft(
+    db: Session,
+    index: RecipeIndex | None,
+    recipe_data: dict,
+    user_id: str,
+    scan_id: str,
+) -> Recipe | None:
+    """
+    Add a generated draft to the session unless it nearly duplicates one of
+    the user's recipes (see RECIPE_DEDUP_MODE). Returns the new recipe, the
+    existing near-duplicate in "merge" mode, or None if the draft was dropped.
+    """
+    signature = recipe_signature(recipe_data)
+    if index is not None:
+        match = index.find_similar(signature, settings.RECIPE_DEDUP_THRESHOLD)
+        existing = db.get(Recipe, match[0]) if match else None
+        if match is not None and existing is not None:
+            mode = settings.RECIPE_DEDUP_MODE
+            metrics.incr(f"recipes.near_duplicates.{mode}")
+            logger.info(
+                f"Draft '{recipe_data.get('title')}' is a near-duplicate of '{existing.title}' "
+                f"(similarity {match[1]:.2f}); {mode}"
+            )
+            return existing if mode == "merge" else None
+
+    recipe = build_recipe(recipe_data, user_id, scan_id)
+    recipe.minhash = signature
+    db.add(recipe)
+    if index is not None:
+        db.flush()
+        index.add(recipe.id, signature)
+    return recipe
+
+
+def saved_from_scan(db: Session, user_id: str, scan_id: str, recipes_data: list[dict]) -> dict[str, Recipe]:
+    """The user's recipes already saved from these drafts of this scan, by title."""
+    titles = [recipe_data["title"] for recipe_data in recipes_data if recipe_data.get("title")]
+    if not titles:
+        return {}
+    saved = (
+        db.query(Recipe)
+        .filter(Recipe.user_id == user_id, Recipe.scan_id == scan_id, Recipe.title.in_(titles))
         .all()
     )
+    return {recipe.title: recipe for recipe in saved}
+
+
+def catalog_hits(
+    db: Session,
+    index: RecipeIndex | None,
+    scan: Scan,
+    pantry_ingredients: list[dict],
+    preferences: dict | None,
+    count: int,
+) -> list[dict]:
+    """Shared catalog recipes for this fridge that aren't already in the user's library."""
+    if not settings.RECIPE_CATALOG_ENABLED:
+        return []
+
+    def in_library(draft: dict) -> bool:
+        return index is not None and index.find_similar(
+            recipe_signature(draft), settings.RECIPE_DEDUP_THRESHOLD
+        ) is not None
+
+    return recipe_catalog.lookup(
+        db,
+        merge_ingredients(scan.ingredients, pantry_ingredients),
+        preferences,
+        count,
+        exclude=in_library,
+    )
 
-    # Convert pantry items to ingredient format
-    pantry_ingredients = [
-        {
-            'name': item.name,
-            'quantity': item.quantity,
-        }
-        for item in pantry_items
-    ]
 
+def contribute_to_catalog(db: Session, recipes_data: list[dict]) -> None:
+    """Share freshly generated drafts with the catalog; never fails the request."""
+    if not settings.RECIPE_CATALOG_ENABLED or not recipes_data:
+        return
     try:
-        # Generate recipes using Groq (run in thread to avoid blocking event loop)
-        recipes_data = await asyncio.to_thread(
-            generate_recipes,
-            available_ingredients=scan.ingredients,
-            preferences=current_user.preferences,
-            count=recipe_request.count,
-            pantry_ingredients=pantry_ingredients,
-        )
+        recipe_catalog.contribute(db, recipes_data)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not add recipes to the shared catalog: {e}")
+
 
-        # Save recipes to database
+def sse_event(event: str, data) -> str:
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def generate_for_scan(
+    db: Session,
+    scan: Scan,
+    user: User,
+    count: int,
+    pantry_ingredients: list[dict],
+) -> list[Recipe]:
+    """
+    Produce ``count`` recipes for a scan and save them to the user's library:
+    cached drafts, an in-flight prefetch or catalog hits first, then Groq.
+    """
+    try:
+        # Repeat "generate" clicks with unchanged inputs reuse the cached drafts
+        cache_key = recipe_cache_key(
+            user.id, mark_new_ingredients(scan.ingredients, scan.diff), user.preferences, count, pantry_ingredients
+        )
+        index = None
+        if settings.RECIPE_DEDUP_MODE != "off":
+            index = recipe_indexes.get(db, user.id)
+
+        fresh = []
+        saved: dict[str, Recipe] = {}
+        recipes_data = recipe_cache.get(cache_key)
+        if recipes_data is None:
+            # A speculative generation for this scan may still be running
+            recipes_data = await recipe_prefetcher.join(cache_key)
+            fresh = recipes_data or []
+
+        if recipes_data is None:
+            # Serve what the shared catalog covers; Groq generates the rest
+            recipes_data = catalog_hits(db, index, scan, pantry_ingredients, user.preferences, count)
+            remaining = count - len(recipes_data)
+            if remaining > 0:
+                extra = {"avoid_titles": [r["title"] for r in recipes_data]} if recipes_data else {}
+                fresh = await generate_recipes(
+                    available_ingredients=mark_new_ingredients(scan.ingredients, scan.diff),
+                    preferences=user.preferences,
+                    count=remaining,
+                    pantry_ingredients=pantry_ingredients,
+                    **extra,
+                )
+                recipes_data = recipes_data + fresh
+            if recipes_data:
+                recipe_cache.set(cache_key, recipes_data)
+        else:
+            logger.info(f"Recipe cache hit for scan {scan.id}")
+            # A repeat click returns the recipes the first one saved
+            saved = saved_from_scan(db, user.id, scan.id, recipes_data)
+
+        # Save recipes to database, folding near-duplicates of the user's library
         recipes = []
+        dropped = []
         for recipe_data in recipes_data:
-            recipe = Recipe(
-                user_id=current_user.id,
-                scan_id=scan.id,
-                title=recipe_data.get("title", "Untitled Recipe"),
-                description=recipe_data.get("description"),
-                cook_time=recipe_data.get("cook_time"),
-                difficulty=recipe_data.get("difficulty", "medium"),
-                servings=recipe_data.get("servings", 2),
-                ingredients=recipe_data.get("ingredients", []),
-                instructions=recipe_data.get("instructions", []),
-                is_favorite=False,
-                times_made=0
+            recipe = saved.get(recipe_data.get("title")) or save_recipe_draft(
+                db, index, recipe_data, user.id, scan.id
+            )
+            if recipe is None:
+                dropped.append(recipe_data.get("title", ""))
+            elif recipe not in recipes:
+                recipes.append(recipe)
+
+        if dropped and settings.RECIPE_DEDUP_MODE == "replace":
+            # One extra round asking for different dishes; repeats are dropped
+            replacements = await generate_recipes(
+                available_ingredients=mark_new_ingredients(scan.ingredients, scan.diff),
+                preferences=user.preferences,
+                count=len(dropped),
+                pantry_ingredients=pantry_ingredients,
+                avoid_titles=dropped + [r.title for r in recipes],
             )
-            db.add(recipe)
-            recipes.append(recipe)
+            fresh = fresh + replacements
+            for recipe_data in replacements:
+                recipe = save_recipe_draft(db, index, recipe_data, user.id, scan.id)
+                if recipe is not None and recipe not in recipes:
+                    recipes.append(recipe)
 
         db.commit()
+        contribute_to_catalog(db, fresh)
 
         for recipe in recipes:
             db.refresh(recipe)
 
         return recipes
 
-    except HTTPException:
+    except Exception:
+        db.rollback()
+        recipe_indexes.forget(user.id)
+        raise
+
+
+@router.post("/generate", response_model=list[RecipeResponse], status_code=status.HTTP_201_CREATED)
+@limiter.limit("15/minute")
+async def generate_recipes_from_scan(
+    request: Request,
+    recipe_request: RecipeGenerate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Generate recipe suggestions from a scan.
+    """
+    bind_call_context("recipes.generate", current_user.id)
+    scan, pantry_ingredients = load_generation_inputs(db, recipe_request.scan_id, current_user)
+
+    try:
+        return await generate_for_scan(db, scan, current_user, recipe_request.count, pantry_ingredients)
+    except (HTTPException, ServiceUnavailableError):
         raise
     except Exception as e:
         logger.error(f"Error generating recipes: {e}", exc_info=True)
@@ -114,6 +286,153 @@ async def generate_recipes_from_scan(
         ) from e
 
 
+@router.post("/generate/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit("15/minute")
+async def enqueue_recipe_generation(
+    request: Request,
+    response: Response,
+    recipe_request: RecipeGenerate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queue recipe generation for a background worker. Poll ``GET /jobs/{id}``;
+    on success its result lists the ids of the saved recipes.
+    """
+    if not settings.JOB_QUEUE_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Background recipe generation is not enabled"
+        )
+    scan, _ = load_generation_inputs(db, recipe_request.scan_id, current_user)
+
+    job = enqueue(
+        db, "recipes.generate", {"scan_id": scan.id, "count": recipe_request.count}, user_id=current_user.id
+    )
+    db.commit()
+    db.refresh(job)
+    response.headers["Location"] = str(request.url_for("get_job", job_id=job.id))
+    return job
+
+
+@job_handler("recipes.generate")
+async def run_recipe_generation_job(db: Session, job: Job) -> dict:
+    """Job-queue handler (``python -m app.worker``): generate and save recipes for a scan."""
+    bind_call_context("recipes.generate_job", job.user_id)
+    user = db.get(User, job.user_id)
+    if user is None:
+        raise PermanentJobError("User no longer exists")
+    try:
+        scan, pantry_ingredients = load_generation_inputs(db, job.payload["scan_id"], user)
+    except HTTPException as e:
+        raise PermanentJobError(e.detail) from e
+
+    recipes = await generate_for_scan(db, scan, user, job.payload["count"], pantry_ingredients)
+    return {"recipe_ids": [recipe.id for recipe in recipes]}
+
+
+@router.post("/generate/stream")
+@limiter.limit("15/minute")
+async def stream_recipes_from_scan(
+    request: Request,
+    recipe_request: RecipeGenerate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Generate recipes from a scan as a Server-Sent Events stream.
+
+    Each recipe is saved and pushed as a ``recipe`` event as soon as the model
+    finishes it, followed by a final ``done`` event (or ``error`` on failure).
+    """
+    bind_call_context("recipes.generate_stream", current_user.id)
+    scan, pantry_ingredients = load_generation_inputs(db, recipe_request.scan_id, current_user)
+
+    cache_key = recipe_cache_key(
+        current_user.id,
+        mark_new_ingredients(scan.ingredients, scan.diff),
+        current_user.preferences,
+        recipe_request.count,
+        pantry_ingredients,
+    )
+    cached = recipe_cache.get(cache_key)
+    user_id = current_user.id
+    scan_id = scan.id
+
+    async def recipe_drafts(index: RecipeIndex | None, fresh: list[dict]):
+        if cached is not None:
+            logger.info(f"Recipe cache hit for scan {scan_id}")
+            for recipe_data in cached:
+                yield recipe_data
+            return
+        prefetched = await recipe_prefetcher.join(cache_key)
+        if prefetched:
+            fresh.extend(prefetched)
+            for recipe_data in prefetched:
+                yield recipe_data
+            return
+        # Catalog hits go out first; the model streams the remainder
+        hits = catalog_hits(
+            db, index, scan, pantry_ingredients, current_user.preferences, recipe_request.count
+        )
+        for recipe_data in hits:
+            yield recipe_data
+        if len(hits) >= recipe_request.count:
+            return
+        async for recipe_data in stream_recipes(
+            available_ingredients=mark_new_ingredients(scan.ingredients, scan.diff),
+            preferences=current_user.preferences,
+            count=recipe_request.count - len(hits),
+            pantry_ingredients=pantry_ingredients,
+        ):
+            fresh.append(recipe_data)
+            yield recipe_data
+
+    async def event_stream():
+        drafts = []
+        fresh = []
+        emitted = set()
+        # Streamed drafts can't be re-requested, so "replace" behaves like "skip" here
+        index = recipe_indexes.get(db, user_id) if settings.RECIPE_DEDUP_MODE != "off" else None
+        # A cache hit returns the recipes a previous request saved from this scan
+        saved = saved_from_scan(db, user_id, scan_id, cached) if cached is not None else {}
+        try:
+            async for recipe_data in recipe_drafts(index, fresh):
+                drafts.append(recipe_data)
+                recipe = saved.get(recipe_data.get("title")) or save_recipe_draft(
+                    db, index, recipe_data, user_id, scan_id
+                )
+                if recipe is None or recipe.id in emitted:
+                    continue
+                db.commit()
+                db.refresh(recipe)
+                emitted.add(recipe.id)
+                payload = RecipeResponse.model_validate(recipe).model_dump(mode="json")
+                yield sse_event("recipe", payload)
+        except ServiceUnavailableError as e:
+            db.rollback()
+            recipe_indexes.forget(user_id)
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logger.error(f"Error streaming recipes: {e}", exc_info=True)
+            db.rollback()
+            recipe_indexes.forget(user_id)
+            yield sse_event("error", {"detail": f"Error generating recipes: {str(e)}"})
+            return
+
+        if cached is None and drafts:
+            recipe_cache.set(cache_key, drafts)
+        contribute_to_catalog(db, fresh)
+        yield sse_event("done", {"count": len(emitted)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("", response_model=list[RecipeListResponse])
 @limiter.limit("60/minute")
 async def list_recipes(
@@ -299,5 +618,6 @@ async def delete_recipe(
 
     db.delete(recipe)
     db.commit()
+    recipe_indexes.remove(current_user.id, recipe_id)
 
     return None
@@ -1,18 +1,46 @@
 import asyncio
-from pathlib import Path
-
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from typing import cast
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.core.limiter import limiter
 from app.database import get_db
+from app.models.job import Job
 from app.models.scan import Scan
 from app.models.user import User
 from app.schemas.scan import ScanResponse, ScanUpdate
 from app.services.auth import get_current_user, get_optional_user
+from app.services.fridge_state import mark_new_ingredients, record_scan_diff, scans_diffed_against
 from app.services.groq_service import detect_ingredients_from_image
-from app.services.image import save_upload_file
+from app.services.image import (
+    SavedUpload,
+    commit_with_uploads,
+    delete_image,
+    discard_on_failure,
+    discard_uploads,
+    load_vision_image,
+    save_upload_file,
+)
+from app.services.ingredient_merge import merge_ingredients
+from app.services.job_queue import enqueue, job_handler
+from app.services.llm_usage import bind_call_context
+from app.services.pantry import load_pantry_ingredients
+from app.services.prefetch import recipe_prefetcher
+from app.services.resilience import ServiceUnavailableError
+from app.services.scan_jobs import ScanJob, scan_workers
+from app.services.storage import StorageError, image_store
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -20,49 +48,286 @@ logger = setup_logger(__name__)
 router = APIRouter()
 
 
-@router.post("", response_model=ScanResponse, status_code=status.HTTP_201_CREATED)
+def schedule_recipe_prefetch(db: Session, scan: Scan, user: User | None) -> None:
+    """Users almost always generate recipes next; start on them now."""
+    if settings.RECIPE_PREFETCH_ENABLED and user and scan.status == "completed" and scan.ingredients:
+        recipe_prefetcher.schedule(
+            scan_id=scan.id,
+            user_id=user.id,
+            ingredients=mark_new_ingredients(list(scan.ingredients), scan.diff),
+            preferences=user.preferences,
+            pantry_ingredients=load_pantry_ingredients(db, user.id),
+            count=settings.RECIPE_PREFETCH_COUNT,
+        )
+
+
+async def detect_image(vision: bytes, image_path: str) -> list[dict]:
+    """Detect one scan image. Tiled detection also crops the stored full-size image."""
+    if settings.VISION_DETECTION_MODE != "tiled":
+        return await detect_ingredients_from_image(vision)
+    try:
+        source = await image_store.read(image_path)
+    except StorageError as e:
+        logger.warning(f"Tiling the vision payload instead of the stored image: {e}")
+        source = None
+    return await detect_ingredients_from_image(vision, source=source)
+
+
+async def detect_stored_image(image_path: str, vision: bytes | None = None) -> list[dict]:
+    """
+    Detect one scan image. ``vision`` is the payload prepared at upload;
+    without it the stored image is reloaded.
+    """
+    if vision is None:
+        vision = await load_vision_image(image_path)
+    return await detect_image(vision, image_path)
+
+
+def complete_scan(db: Session, scan: Scan, ingredients: list[dict]) -> None:
+    scan.ingredients = ingredients
+    scan.status = scan.stage = "completed"
+    scan.error = None
+    record_scan_diff(db, scan)
+    logger.info(f"Scan {scan.id} completed: {len(ingredients)} ingredients")
+
+
+async def detect_scan(db: Session, scan: Scan, attempt: int, vision: bytes | None = None) -> None:
+    """Detect a processing scan's ingredients, recording progress on it. Raises if detection fails."""
+    scan.stage = "detecting"
+    scan.attempts = attempt
+    db.commit()
+
+    complete_scan(db, scan, await detect_stored_image(scan.image_path, vision))
+    db.commit()
+
+
+async def detect_batch(db: Session, parent: Scan, attempt: int, visions: dict[str, bytes] | None = None) -> None:
+    """
+    Detect every image of a batch scan concurrently (SCAN_BATCH_CONCURRENCY
+    at a time) and merge their ingredients onto the parent. Images that fail
+    are marked on their child scan; the batch completes with the rest, and
+    raises only if none could be scanned. Retries skip completed images.
+
+    Only the model calls run concurrently: the session is not safe to share
+    between tasks, so results are written to it one by one afterwards.
+    """
+    visions = visions or {}
+    pending = [child for child in parent.children if child.status != "completed"]
+    parent.stage = "detecting"
+    parent.attempts = attempt
+    for child in pending:
+        child.stage = "detecting"
+        child.attempts = attempt
+    images = [(cast(str, child.image_path), visions.get(cast(str, child.id))) for child in pending]
+    db.commit()
+
+    semaphore = asyncio.Semaphore(settings.SCAN_BATCH_CONCURRENCY)
+
+    async def detect_child(image_path: str, vision: bytes | None) -> list[dict]:
+        async with semaphore:
+            return await detect_stored_image(image_path, vision)
+
+    results = await asyncio.gather(*(detect_child(*image) for image in images), return_exceptions=True)
+    failures: list[tuple[Scan, Exception]] = []
+    for child, result in zip(pending, results, strict=True):
+        if isinstance(result, Exception):
+            failures.append((child, result))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            complete_scan(db, child, result)
+    db.commit()
+    for child, error in failures:
+        record_detection_failure(db, child, error, final=True)
+    if failures and len(failures) == len(parent.children):
+        raise failures[0][1]
+
+    completed = [child.ingredients for child in parent.children if child.status == "completed"]
+    parent.ingredients = merge_ingredients(completed)
+    parent.status = parent.stage = "completed"
+    parent.error = (
+        f"{len(failures)} of {len(parent.children)} images could not be scanned" if failures else None
+    )
+    record_scan_diff(db, parent)
+    db.commit()
+    logger.info(
+        f"Batch scan {parent.id} completed: {len(parent.ingredients)} ingredients "
+        f"from {len(completed)} of {len(parent.children)} images"
+    )
+
+
+def record_detection_failure(db: Session, scan: Scan, error: Exception, final: bool) -> None:
+    scan.error = str(error)
+    if final:
+        scan.status = scan.stage = "failed"
+    else:
+        scan.stage = "retrying"
+    db.commit()
+
+
+async def process_scan_job(job: ScanJob) -> None:
+    """Worker-pool handler: detect a queued scan's ingredients, retrying with backoff."""
+    bind_call_context("scans.create", job.user_id)
+    db = scan_workers.session_factory()
+    try:
+        scan = db.get(Scan, job.scan_id)
+        if scan is None:
+            logger.info(f"Scan {job.scan_id} was deleted before detection")
+            return
+
+        try:
+            if job.batch:
+                await detect_batch(db, scan, job.attempt)
+            else:
+                await detect_scan(db, scan, job.attempt, job.vision)
+        except Exception as e:
+            retry_after = e.retry_after if isinstance(e, ServiceUnavailableError) else None
+            delay = scan_workers.backoff(job.attempt, retry_after)
+            record_detection_failure(db, scan, e, final=delay is None)
+            if delay is None:
+                logger.error(f"Scan {scan.id} failed after {job.attempt} attempts: {e}")
+            else:
+                scan_workers.retry_later(process_scan_job, job, delay)
+                logger.warning(f"Scan {scan.id} attempt {job.attempt} failed, retrying in {delay:.1f}s: {e}")
+            return
+
+        user = db.get(User, job.user_id) if job.user_id != "guest-demo" else None
+        schedule_recipe_prefetch(db, scan, user)
+    finally:
+        db.close()
+
+
+@job_handler("scan.detect")
+async def run_scan_detect_job(db: Session, job: Job) -> dict:
+    """Job-queue handler (``python -m app.worker``): detect a queued scan's ingredients."""
+    bind_call_context("scans.create", job.user_id)
+    scan = db.get(Scan, job.payload["scan_id"])
+    if scan is None:
+        return {"skipped": "scan deleted"}
+
+    try:
+        await detect_scan(db, scan, job.attempts)
+    except Exception as e:
+        # The queue retries with backoff; the scan shows where it stands
+        record_detection_failure(db, scan, e, final=job.attempts >= job.max_attempts)
+        raise
+
+    # No recipe prefetch here: it would warm this worker's cache, not the API's
+    return {"ingredients": len(scan.ingredients)}
+
+
+@job_handler("scan.detect_batch")
+async def run_scan_batch_job(db: Session, job: Job) -> dict:
+    """Job-queue handler: detect the images of a queued batch scan and merge them."""
+    bind_call_context("scans.create_batch", job.user_id)
+    scan = db.get(Scan, job.payload["scan_id"])
+    if scan is None:
+        return {"skipped": "scan deleted"}
+
+    try:
+        await detect_batch(db, scan, job.attempts)
+    except Exception as e:
+        record_detection_failure(db, scan, e, final=job.attempts >= job.max_attempts)
+        raise
+
+    return {"ingredients": len(scan.ingredients), "images": len(scan.children)}
+
+
+@router.post("", response_model=ScanResponse, status_code=status.HTTP_202_ACCEPTED)
 @limiter.limit("10/minute")
 async def create_scan(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User | None = Depends(get_optional_user)
 ):
     """
     Upload a fridge image and detect ingredients.
+
+    Returns 202 with the scan in ``processing`` state as soon as the upload
+    is saved; poll ``GET /scans/{id}`` until its status is ``completed`` or
+    ``failed``. Detection runs on the durable job queue (JOB_QUEUE_ENABLED)
+    or the in-process worker pool; with SCAN_WORKERS=0 it runs inline and
+    the scan is returned completed with 201.
     """
     logger.info("=== SCAN UPLOAD STARTED ===")
     logger.info(f"File name: {file.filename}")
     logger.info(f"Content type: {file.content_type}")
+    user_id = current_user.id if current_user else "guest-demo"
+    bind_call_context("scans.create", user_id)
+
+    use_pool = scan_workers.enabled and not settings.JOB_QUEUE_ENABLED
+    if use_pool:
+        # Don't accept an upload there is no room to process
+        scan_workers.check_capacity()
 
     try:
         # Save the uploaded image
         logger.info("Saving uploaded image...")
-        image_path = await save_upload_file(file)
+        upload = await save_upload_file(file)
+        image_path = upload.key
         logger.info(f"Image saved to: {image_path}")
 
-        # Create scan record
-        logger.info("Creating scan record...")
-        scan = Scan(
-            user_id=current_user.id if current_user else "guest-demo",
-            image_path=image_path,
-            status="processing",
-            ingredients=[]
-        )
-        db.add(scan)
-        db.commit()
+        async with discard_on_failure(db, upload):
+            # Create scan record
+            logger.info("Creating scan record...")
+            scan = Scan(
+                user_id=user_id,
+                image_path=image_path,
+                status="processing",
+                stage="queued",
+                attempts=0,
+                ingredients=[]
+            )
+            db.add(scan)
+            if settings.JOB_QUEUE_ENABLED:
+                # Committed together: a worker never sees a job without its scan
+                db.flush()
+                enqueue(
+                    db, "scan.detect", {"scan_id": scan.id},
+                    user_id=user_id, max_attempts=settings.SCAN_DETECTION_MAX_ATTEMPTS,
+                )
+            # Stored first, then committed together with the scan that references it
+            await commit_with_uploads(db, upload)
         db.refresh(scan)
         logger.info(f"Scan created with ID: {scan.id}")
 
-        # Detect ingredients (run in thread to avoid blocking event loop)
+        if use_pool:
+            try:
+                scan_workers.submit(process_scan_job, ScanJob(scan.id, user_id, image_path, vision=upload.vision))
+            except ServiceUnavailableError as e:
+                scan.status = scan.stage = "failed"
+                scan.error = str(e)
+                db.commit()
+                raise
+
+        if use_pool or settings.JOB_QUEUE_ENABLED:
+            response.headers["Location"] = str(request.url_for("get_scan", scan_id=scan.id))
+            logger.info(f"=== SCAN QUEUED: {scan.id} ===")
+            return scan
+
+        # Detect ingredients
+        response.status_code = status.HTTP_201_CREATED
         logger.info("Calling Groq to detect ingredients...")
+        scan.stage = "detecting"
+        scan.attempts = 1
         try:
-            ingredients = await asyncio.to_thread(detect_ingredients_from_image, image_path)
+            # Straight from the in-memory decode
+            ingredients = await detect_image(upload.vision, image_path)
             scan.ingredients = ingredients
-            scan.status = "completed"
+            scan.status = scan.stage = "completed"
+            record_scan_diff(db, scan)
             logger.info(f"SUCCESS: Found {len(ingredients)} ingredients")
+        except ServiceUnavailableError as e:
+            # Groq is overloaded - fail fast and let the client retry later
+            scan.status = scan.stage = "failed"
+            scan.error = str(e)
+            db.commit()
+            raise
         except Exception as e:
-            scan.status = "failed"
+            scan.status = scan.stage = "failed"
+            scan.error = str(e)
             logger.error(f"ERROR detecting ingredients: {e}")
             import traceback
             logger.error(traceback.format_exc())
@@ -70,11 +335,13 @@ async def create_scan(
         db.commit()
         db.refresh(scan)
 
+        schedule_recipe_prefetch(db, scan, current_user)
+
         logger.info(f"=== SCAN COMPLETED: {scan.status} ===")
         return scan
 
-    except HTTPException:
-        # Re-raise HTTP exceptions (like validation errors)
+    except (HTTPException, ServiceUnavailableError):
+        # Re-raise HTTP exceptions (like validation errors) and fail-fast signals
         raise
     except Exception as e:
         logger.error("=== SCAN FAILED ===")
@@ -87,6 +354,128 @@ async def create_scan(
         ) from e
 
 
+async def save_batch_uploads(files: list[UploadFile], db: Session) -> list[SavedUpload]:
+    """Save a batch's uploads concurrently; if any is rejected, discard the others."""
+    results = await asyncio.gather(*(save_upload_file(file) for file in files), return_exceptions=True)
+    uploads = [r for r in results if isinstance(r, SavedUpload)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if not errors:
+        return uploads
+
+    await discard_uploads(db, *uploads)
+    raise errors[0]
+
+
+@router.post("/batch", response_model=ScanResponse, status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit("5/minute")
+async def create_batch_scan(
+    request: Request,
+    response: Response,
+    files: list[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: User | None = Depends(get_optional_user)
+):
+    """
+    Upload several photos of one fridge/pantry and detect ingredients across them.
+
+    Images are optimized in parallel and detected concurrently, so a batch
+    takes about as long as its slowest image. Returns a parent scan whose
+    ingredients are merged and deduplicated across images (each with the
+    number of images it was seen in as ``sources``); ``children`` holds the
+    per-image scans. Queued and inline processing work as for ``POST /scans``.
+    """
+    if not 1 <= len(files) <= settings.SCAN_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch scan takes 1 to {settings.SCAN_BATCH_MAX_IMAGES} images"
+        )
+
+    user_id = current_user.id if current_user else "guest-demo"
+    bind_call_context("scans.create_batch", user_id)
+    logger.info(f"=== BATCH SCAN UPLOAD STARTED: {len(files)} images ===")
+
+    use_pool = scan_workers.enabled and not settings.JOB_QUEUE_ENABLED
+    if use_pool:
+        scan_workers.check_capacity()
+
+    try:
+        uploads = await save_batch_uploads(files, db)
+
+        async with discard_on_failure(db, *uploads):
+            children = [
+                Scan(
+                    user_id=user_id,
+                    image_path=upload.key,
+                    status="processing",
+                    stage="queued",
+                    attempts=0,
+                    ingredients=[]
+                )
+                for upload in uploads
+            ]
+            # The parent has no image of its own; its children hold the uploads
+            parent = Scan(
+                user_id=user_id,
+                image_path="",
+                status="processing",
+                stage="queued",
+                attempts=0,
+                ingredients=[],
+                children=children
+            )
+            db.add(parent)
+            if settings.JOB_QUEUE_ENABLED:
+                db.flush()
+                enqueue(
+                    db, "scan.detect_batch", {"scan_id": parent.id},
+                    user_id=user_id, max_attempts=settings.SCAN_DETECTION_MAX_ATTEMPTS,
+                )
+            await commit_with_uploads(db, *uploads)
+        db.refresh(parent)
+        logger.info(f"Batch scan created with ID: {parent.id}")
+
+        if use_pool:
+            try:
+                scan_workers.submit(process_scan_job, ScanJob(parent.id, user_id, "", batch=True))
+            except ServiceUnavailableError as e:
+                parent.status = parent.stage = "failed"
+                parent.error = str(e)
+                db.commit()
+                raise
+
+        if use_pool or settings.JOB_QUEUE_ENABLED:
+            response.headers["Location"] = str(request.url_for("get_scan", scan_id=parent.id))
+            logger.info(f"=== BATCH SCAN QUEUED: {parent.id} ===")
+            return parent
+
+        response.status_code = status.HTTP_201_CREATED
+        visions = {child.id: upload.vision for child, upload in zip(children, uploads, strict=True)}
+        try:
+            await detect_batch(db, parent, 1, visions)
+        except ServiceUnavailableError as e:
+            record_detection_failure(db, parent, e, final=True)
+            raise
+        except Exception as e:
+            record_detection_failure(db, parent, e, final=True)
+            logger.error(f"ERROR detecting batch ingredients: {e}")
+
+        db.refresh(parent)
+
+        schedule_recipe_prefetch(db, parent, current_user)
+
+        logger.info(f"=== BATCH SCAN COMPLETED: {parent.status} ===")
+        return parent
+
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"=== BATCH SCAN FAILED: {e} ===", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing scan: {str(e)}"
+        ) from e
+
+
 @router.get("", response_model=list[ScanResponse])
 @limiter.limit("60/minute")
 async def list_scans(
@@ -99,8 +488,10 @@ async def list_scans(
     """
     List user's scans.
     """
+    # A batch is listed once, as its parent
     scans = db.query(Scan).filter(
-        Scan.user_id == current_user.id
+        Scan.user_id == current_user.id,
+        Scan.parent_id.is_(None)
     ).order_by(
         Scan.created_at.desc()
     ).offset(offset).limit(limit).all()
@@ -165,9 +556,17 @@ async def update_scan(
 
     # Update ingredients
     scan.ingredients = scan_update.ingredients
+    if scan.status == "completed":
+        record_scan_diff(db, scan)
+        # Later scans were diffed against the old ingredients
+        for later in scans_diffed_against(db, scan):
+            record_scan_diff(db, later)
     db.commit()
     db.refresh(scan)
 
+    # Prefetched recipes were generated from the old ingredient list
+    recipe_prefetcher.discard_scan(scan.id)
+
     return scan
 
 
@@ -180,7 +579,7 @@ async def delete_scan(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Delete a scan and its associated image file.
+    Delete a scan and its reference to the uploaded image.
     """
     scan = db.query(Scan).filter(Scan.id == scan_id).first()
 
@@ -196,17 +595,19 @@ async def delete_scan(
             detail="Not authorized to delete this scan"
         )
 
-    # Delete associated image file from disk
-    if scan.image_path:
-        image_file = Path(settings.UPLOAD_DIR) / scan.image_path
-        if image_file.exists():
-            try:
-                image_file.unlink()
-                logger.info(f"Deleted image file: {image_file}")
-            except OSError as e:
-                logger.warning(f"Could not delete image file {image_file}: {e}")
+    recipe_prefetcher.discard_scan(scan.id)
 
+    image_paths = [image_scan.image_path for image_scan in [scan, *scan.children] if image_scan.image_path]
+    later_scans = scans_diffed_against(db, scan)
     db.delete(scan)
+    db.flush()
+    # Scans diffed against this one now follow the scan before it
+    for later in later_scans:
+        record_scan_diff(db, later)
     db.commit()
 
+    # Release the stored images; each is deleted once no other scan shares it
+    for image_path in image_paths:
+        await delete_image(db, image_path)
+
     return None
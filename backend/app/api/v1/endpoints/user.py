@@ -5,6 +5,8 @@ from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserPreferences, UserPreferencesUpdate
 from app.services.auth import get_current_user
+from app.services.groq_service import recipe_cache
+from app.services.prefetch import recipe_prefetcher
 
 router = APIRouter()
 
@@ -52,4 +54,8 @@ async def update_preferences(
     db.commit()
     db.refresh(current_user)
 
+    # Cached recipe drafts were generated for the old preferences
+    recipe_cache.invalidate_user(current_user.id)
+    recipe_prefetcher.discard_user(current_user.id)
+
     return UserPreferences(**new_prefs)
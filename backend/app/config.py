@@ -30,12 +30,125 @@ class Settings(BaseSettings):
 
     # AI Provider
     GROQ_API_KEY: str = ""
+    GROQ_BASE_URL: str = ""  # override to point at a local stub of the chat-completions API
+    # Model tiers per task, tried in order: "model:timeout_seconds,model:timeout_seconds"
+    GROQ_VISION_MODELS: str = "meta-llama/llama-4-scout-17b-16e-instruct:30"
+    GROQ_TEXT_MODELS: str = "llama-3.1-8b-instant:10,llama-3.3-70b-versatile:60"
+    GROQ_TIMEOUT_SECONDS: float = 60.0
+    GROQ_MAX_CONNECTIONS: int = 100  # per worker process
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept open
+    # "live", "record" (live + append to cassette) or "replay" (offline, from cassette)
+    GROQ_TRANSPORT_MODE: str = "live"
+    GROQ_CASSETTE_PATH: str = "./cassettes/groq.jsonl"
+    # Replay latency: none | recorded | fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA
+    GROQ_REPLAY_LATENCY: str = "recorded"
+    # "exact" request match, or "model" to fall back to any response for the same model
+    GROQ_REPLAY_MATCH: str = "exact"
+    # Per-call LLM usage records are batched into llm_usage_rollups
+    LLM_USAGE_FLUSH_SECONDS: float = 30.0  # 0 disables persistence (metrics only)
+    LLM_USAGE_MAX_PENDING: int = 10000  # oldest records dropped beyond this
+    # Adaptive (AIMD) concurrency limit for Groq calls, per worker process
+    GROQ_CONCURRENCY_INITIAL: int = 16
+    GROQ_CONCURRENCY_MIN: int = 2
+    GROQ_CONCURRENCY_MAX: int = 64
+    # Circuit breaker: open after N consecutive overload errors, probe again after M seconds
+    GROQ_BREAKER_FAILURE_THRESHOLD: int = 5
+    GROQ_BREAKER_RECOVERY_SECONDS: float = 30.0
+
+    # Image sent to the vision model: longest side, JPEG quality, and a cap on the
+    # base64 payload (Groq rejects base64 images over 4MB); quality then size drop to fit
+    VISION_IMAGE_MAX_DIMENSION: int = 1024
+    VISION_IMAGE_QUALITY: int = 80
+    VISION_IMAGE_MAX_PAYLOAD_BYTES: int = 3_500_000
+    # "tiled" also detects overlapping crops of the stored full-size image
+    # concurrently, so small items survive the downscale (1 + GRID^2 calls,
+    # plus 4 per low-confidence tile re-queried at higher zoom)
+    VISION_DETECTION_MODE: str = "single"  # single | tiled
+    VISION_TILE_GRID: int = 2
+    VISION_TILE_OVERLAP: float = 0.2  # share of a tile's size added around it
+    VISION_TILE_REQUERY_CONFIDENCE: float = 0.7  # re-query tiles whose mean confidence is lower
+
+    # Vision detection cache
+    DETECTION_CACHE_TTL_SECONDS: int = 6 * 60 * 60  # 6 hours
+    DETECTION_CACHE_MAX_ENTRIES: int = 1000  # 0 disables the cache
+    # Max differing bits (of 64) between perceptual hashes to reuse a result; 0 = exact only
+    DETECTION_CACHE_NEAR_DUPLICATE_DISTANCE: int = 0
+
+    # Recipe prompt building
+    RECIPE_PROMPT_TOKEN_BUDGET: int = 1000  # estimated tokens for the whole prompt
+    RECIPE_PROMPT_EXPIRY_HORIZON_DAYS: int = 7  # pantry items expiring within this are prioritized
+
+    # Split large recipe counts into concurrent smaller completions; 1 disables fan-out
+    RECIPE_FANOUT_WIDTH: int = 3
+    RECIPE_FANOUT_MIN_COUNT: int = 5  # counts below this use a single completion
+
+    # Recipe generation cache
+    RECIPE_CACHE_TTL_SECONDS: int = 30 * 60  # 30 minutes
+    RECIPE_CACHE_MAX_ENTRIES: int = 2000  # 0 disables the cache
+
+    # Opt-in: start generating recipes as soon as a signed-in user's scan completes
+    RECIPE_PREFETCH_ENABLED: bool = False
+    RECIPE_PREFETCH_COUNT: int = 3  # must match the client's count to be picked up
+    RECIPE_PREFETCH_MAX_INFLIGHT: int = 50  # per worker process
+
+    # Near-duplicate generated recipes (vs. the user's library):
+    # "merge" returns the existing recipe, "skip" drops the draft,
+    # "replace" asks the model for different recipes, "off" saves everything (opt-in)
+    RECIPE_DEDUP_MODE: str = "off"
+    RECIPE_DEDUP_THRESHOLD: float = 0.75  # estimated Jaccard similarity of title/ingredient shingles
+    RECIPE_DEDUP_INDEX_MAX_USERS: int = 1000  # per-user indexes kept in memory
+
+    # Shared recipe catalog: serve anonymized recipes generated for other users
+    # whose required ingredients the fridge covers, and only ask Groq for the rest
+    RECIPE_CATALOG_ENABLED: bool = False
+    RECIPE_CATALOG_MIN_COVERAGE: float = 0.8  # share of required ingredients on hand
+
+    # Scan processing: POST /scans returns 202 and detection runs on an
+    # in-process worker pool (0 workers = detect inline and return 201)
+    SCAN_WORKERS: int = 4  # per worker process
+    SCAN_QUEUE_MAX_DEPTH: int = 100  # beyond this, new scans get 503 + Retry-After
+    SCAN_DETECTION_MAX_ATTEMPTS: int = 3
+    SCAN_RETRY_BACKOFF_SECONDS: float = 2.0  # doubles each attempt
+    SCAN_RETRY_BACKOFF_MAX_SECONDS: float = 60.0
+    # POST /scans/batch: images per request, and detections run at once per batch
+    SCAN_BATCH_MAX_IMAGES: int = 6
+    SCAN_BATCH_CONCURRENCY: int = 4
+
+    # Durable job queue (jobs table, drained by `python -m app.worker`). When
+    # enabled, scan detection is enqueued there instead of the in-process pool
+    JOB_QUEUE_ENABLED: bool = False
+    JOB_LEASE_SECONDS: int = 60  # jobs of a worker that stops heartbeating are requeued after this
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_WORKER_CONCURRENCY: int = 8  # jobs in flight per worker process
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 2.0  # doubles each attempt
+    JOB_RETRY_BACKOFF_MAX_SECONDS: float = 120.0
 
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024  # uploads are streamed to disk this many bytes at a time
+    IMAGE_PROCESS_WORKERS: int = 2  # processes for resizing uploads (0 = a thread in the API process)
     ALLOWED_EXTENSIONS: list[str] = ["jpg", "jpeg", "png", "heic", "webp"]
 
+    # Upload storage: "local" (UPLOAD_DIR) or "s3" (any S3-compatible object store)
+    STORAGE_BACKEND: str = "local"
+    S3_ENDPOINT_URL: str = ""
+    S3_BUCKET: str = ""
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_TIMEOUT_SECONDS: float = 30.0
+
+    # Resized/re-encoded variants served from /uploads/{key}?size=&format=
+    IMAGE_DERIVATIVE_SIZES: list[int] = [160, 320, 640, 1280]
+    IMAGE_DERIVATIVE_QUALITY: int = 80
+    IMAGE_DERIVATIVE_CACHE_DIR: str = ""  # default: UPLOAD_DIR/.derivatives
+
+    # Comma-separated emails of users allowed to read operator endpoints (e.g. LLM spend)
+    ADMIN_EMAILS: str = ""
+
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
     # Allow local dev on any port and FridgeChef Vercel deployment URLs.
@@ -56,6 +169,11 @@ class Settings(BaseSettings):
         """Convert comma-separated origins to list."""
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def admin_emails_list(self) -> list[str]:
+        """Convert comma-separated admin emails to a lowercase list."""
+        return [email.strip().lower() for email in self.ADMIN_EMAILS.split(",") if email.strip()]
+
 
 settings = Settings()
 
@@ -0,0 +1,74 @@
+import threading
+from collections import defaultdict, deque
+
+# In-process metrics registry.
+# Counters are per worker process; scrape /api/v1/health/metrics on each worker.
+
+# Observations kept per summary; percentiles describe this recent window
+SUMMARY_WINDOW = 1000
+
+
+def percentile(ordered: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """Thread-safe named counters and rolling-window summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._summaries: dict[str, deque[float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (e.g. a latency) in a rolling summary."""
+        with self._lock:
+            window = self._summaries.get(name)
+            if window is None:
+                window = self._summaries[name] = deque(maxlen=SUMMARY_WINDOW)
+            window.append(value)
+
+    def get(self, name: str) -> float:
+        """Read a single counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def summary(self, name: str) -> dict:
+        """Count and p50/p95/p99 of a summary's recent observations."""
+        with self._lock:
+            ordered = sorted(self._summaries.get(name, ()))
+        return {
+            "count": len(ordered),
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+        }
+
+    def snapshot(self) -> dict:
+        """Return a copy of all counters and summaries."""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._summaries)
+        return {
+            "counters": counters,
+            "summaries": {name: self.summary(name) for name in names},
+        }
+
+    def reset(self) -> None:
+        """Clear all counters and summaries (used by tests)."""
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+# Shared registry instance — import this wherever metrics are recorded
+metrics = MetricsRegistry()
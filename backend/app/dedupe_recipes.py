@@ -0,0 +1,155 @@
+"""
+Deduplicate existing recipe libraries.
+
+Streams each user's recipes oldest first in keyset-paginated batches, fills
+in missing MinHash signatures and folds near-duplicates into the earliest
+copy: favorite status and times-made counts are kept, and shopping lists
+pointing at a removed duplicate are re-pointed at the kept recipe.
+
+Usage (from backend/):
+    python -m app.dedupe_recipes --dry-run
+    python -m app.dedupe_recipes --batch-size 500 --threshold 0.8 [--user USER_ID]
+"""
+import argparse
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.recipe import Recipe
+from app.models.shopping_list import ShoppingList
+from app.models.user import User
+from app.services.recipe_dedup import RecipeIndex, recipe_signature
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class DedupeStats:
+    users: int = 0
+    scanned: int = 0
+    signed: int = 0
+    removed: int = 0
+
+
+def iter_user_ids(db: Session, batch_size: int) -> Iterator[str]:
+    last_id = ""
+    while True:
+        ids: list[str] = [
+            row.id for row in
+            db.query(User.id).filter(User.id > last_id).order_by(User.id).limit(batch_size)
+        ]
+        if not ids:
+            return
+        yield from ids
+        last_id = ids[-1]
+
+
+def iter_recipe_batches(db: Session, user_id: str, batch_size: int) -> Iterator[list[Recipe]]:
+    """A user's recipes, oldest first, ``batch_size`` rows per query (keyset pagination)."""
+    last = None
+    while True:
+        query = db.query(Recipe).filter(Recipe.user_id == user_id)
+        if last is not None:
+            created_at, recipe_id = last
+            query = query.filter(or_(
+                Recipe.created_at > created_at,
+                and_(Recipe.created_at == created_at, Recipe.id > recipe_id),
+            ))
+        batch = query.order_by(Recipe.created_at, Recipe.id).limit(batch_size).all()
+        if not batch:
+            return
+        last = (batch[-1].created_at, batch[-1].id)
+        yield batch
+
+
+def dedupe_user(
+    db: Session,
+    user_id: str,
+    threshold: float,
+    batch_size: int = 500,
+    dry_run: bool = False,
+) -> DedupeStats:
+    """Fold one user's near-duplicate recipes into their earliest copy."""
+    stats = DedupeStats(users=1)
+    index = RecipeIndex()
+
+    for batch in iter_recipe_batches(db, user_id, batch_size):
+        for recipe in batch:
+            stats.scanned += 1
+            signature = recipe.minhash or recipe_signature(recipe)
+            if recipe.minhash is None:
+                recipe.minhash = signature
+                stats.signed += 1
+
+            match = index.find_similar(signature, threshold)
+            keeper = db.get(Recipe, match[0]) if match else None
+            if keeper is None:
+                index.add(recipe.id, signature)
+                continue
+
+            logger.debug(f"'{recipe.title}' ({recipe.id}) duplicates '{keeper.title}' ({keeper.id})")
+            keeper.is_favorite = bool(keeper.is_favorite or recipe.is_favorite)
+            keeper.times_made = (keeper.times_made or 0) + (recipe.times_made or 0)
+            db.query(ShoppingList).filter(ShoppingList.recipe_id == recipe.id).update(
+                {ShoppingList.recipe_id: keeper.id}, synchronize_session=False
+            )
+            db.delete(recipe)
+            stats.removed += 1
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+
+    return stats
+
+
+def dedupe_all(
+    db: Session,
+    threshold: float,
+    batch_size: int = 500,
+    dry_run: bool = False,
+    user_id: str | None = None,
+) -> DedupeStats:
+    total = DedupeStats()
+    user_ids = [user_id] if user_id else iter_user_ids(db, batch_size)
+    for uid in user_ids:
+        stats = dedupe_user(db, uid, threshold, batch_size, dry_run)
+        total.users += 1
+        total.scanned += stats.scanned
+        total.signed += stats.signed
+        total.removed += stats.removed
+        if stats.removed:
+            logger.info(f"User {uid}: {stats.removed} of {stats.scanned} recipes were near-duplicates")
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=settings.RECIPE_DEDUP_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--user", help="only deduplicate this user's library")
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        stats = dedupe_all(db, args.threshold, args.batch_size, args.dry_run, args.user)
+    finally:
+        db.close()
+
+    verb = "would remove" if args.dry_run else "removed"
+    print(
+        f"{stats.users} users, {stats.scanned} recipes scanned, {stats.signed} signatures added, "
+        f"{verb} {stats.removed} near-duplicates"
+    )
+
+
+if __name__ == "__main__":
+    main()
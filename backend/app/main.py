@@ -1,14 +1,22 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+from app.api.v1.endpoints import images
 from app.api.v1.router import api_router
 from app.config import settings
 from app.database import Base, engine
+from app.services import groq_service, llm_usage
+from app.services.image_pool import image_pool
+from app.services.prefetch import recipe_prefetcher
+from app.services.resilience import ServiceUnavailableError
+from app.services.scan_jobs import scan_workers
+from app.services.storage import image_store
 
 # Import all models to ensure tables are created
 from app.utils.logger import setup_logger
@@ -24,11 +32,34 @@ if not settings.is_production:
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 logger.info(f"Uploads directory: {os.path.abspath(settings.UPLOAD_DIR)}")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own process-wide resources: the shared Groq connection pool, usage flusher, scan workers and image processes."""
+    await groq_service.init_client()
+    flusher = None
+    if settings.LLM_USAGE_FLUSH_SECONDS > 0:
+        flusher = asyncio.create_task(llm_usage.run_flusher(settings.LLM_USAGE_FLUSH_SECONDS))
+    try:
+        yield
+    finally:
+        await scan_workers.shutdown()
+        await recipe_prefetcher.shutdown()
+        image_pool.shutdown()
+        await image_store.close()
+        if flusher is not None:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            await llm_usage.flush_pending()
+        await groq_service.close_client()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="FridgeChef API",
     description="Backend API for FridgeChef - Your personal recipe assistant",
-    version="1.3.0"
+    version="1.3.0",
+    lifespan=lifespan,
 )
 
 # Rate limiter (shared singleton)
@@ -38,9 +69,11 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.middleware.body_limit import BodySizeLimitMiddleware
 from app.middleware.exception_handlers import (
     database_exception_handler,
     generic_exception_handler,
+    service_unavailable_exception_handler,
     validation_exception_handler,
 )
 from app.middleware.logging import RequestLoggingMiddleware, SecurityHeadersMiddleware
@@ -48,6 +81,10 @@ from app.middleware.logging import RequestLoggingMiddleware, SecurityHeadersMidd
 app.add_exception_handler(Exception, generic_exception_handler)
 app.add_exception_handler(SQLAlchemyError, database_exception_handler)
 app.add_exception_handler(ValueError, validation_exception_handler)
+app.add_exception_handler(ServiceUnavailableError, service_unavailable_exception_handler)
+
+# Refuse oversized uploads before they are read (inside CORS, so the 413 is readable)
+app.add_middleware(BodySizeLimitMiddleware)
 
 # CORS middleware
 # Using explicit allowed origins is required for allow_credentials=True
@@ -66,8 +103,8 @@ app.add_middleware(
 app.add_middleware(RequestLoggingMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
 
-# Mount uploads directory for serving images
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Stored images and their resized variants
+app.include_router(images.router, prefix="/uploads", tags=["images"])
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
@@ -0,0 +1,64 @@
+"""
+Cap request body size before the body is parsed.
+
+Starlette spools a whole multipart body to memory/disk before an endpoint
+sees its UploadFile, so the per-file check in ``save_upload_file`` cannot
+stop an oversized upload from being received. This middleware refuses a
+request whose Content-Length is over the limit without reading it, and cuts
+off a body sent without one (chunked) as soon as it passes the limit.
+"""
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.metrics import metrics
+
+# Multipart boundaries, part headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_body_size(path: str) -> int:
+    """Largest body accepted for a request: one upload, or a full batch of them."""
+    if path.rstrip("/").endswith("/scans/batch"):
+        return settings.MAX_UPLOAD_SIZE * settings.SCAN_BATCH_MAX_IMAGES + MULTIPART_OVERHEAD
+    return settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
+
+def _detail() -> str:
+    return f"Request too large. Maximum upload size: {settings.MAX_UPLOAD_SIZE / (1024 * 1024)}MB"
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware, so the body is never buffered on the way through."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_body_size(scope["path"])
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            metrics.incr("requests.rejected_too_large")
+            response = JSONResponse({"detail": _detail()}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.incr("requests.rejected_too_large")
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -2,6 +2,7 @@ from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.services.resilience import ServiceUnavailableError
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -36,3 +37,15 @@ async def validation_exception_handler(request: Request, exc: ValueError):
             "detail": str(exc)
         }
     )
+
+async def service_unavailable_exception_handler(request: Request, exc: ServiceUnavailableError):
+    """Fail fast with a retry hint while an upstream dependency is unavailable."""
+    logger.warning(f"Service unavailable: {exc} (retry after {exc.retry_after}s)")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": "Recipe AI is busy right now. Please try again shortly.",
+            "retry_after": exc.retry_after
+        },
+        headers={"Retry-After": str(exc.retry_after)}
+    )
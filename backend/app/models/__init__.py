@@ -1,7 +1,12 @@
+from app.models.job import Job
+from app.models.llm_usage import LLMUsageRollup
 from app.models.pantry import PantryItem
 from app.models.recipe import Recipe
+from app.models.recipe_catalog import CatalogIngredient, CatalogRecipe
 from app.models.scan import Scan
 from app.models.shopping_list import ShoppingList
+from app.models.stored_image import StoredImage
 from app.models.user import User
 
-__all__ = ["User", "Scan", "Recipe", "ShoppingList", "PantryItem"]
+__all__ = ["User", "Scan", "Recipe", "ShoppingList", "PantryItem", "LLMUsageRollup",
+           "CatalogRecipe", "CatalogIngredient", "Job", "StoredImage"]
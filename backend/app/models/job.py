@@ -0,0 +1,43 @@
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+
+from app.database import Base
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class Job(Base):
+    """A unit of background work, claimed and run by ``python -m app.worker`` processes."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim query: oldest runnable queued job
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+        # Lease reaper: running jobs whose lease expired
+        Index("ix_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String(50), nullable=False)  # scan.detect, recipes.generate
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    # Not a foreign key: guest scans are queued under "guest-demo"
+    user_id = Column(String(36), index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=utcnow)
+    locked_by = Column(String(200))
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    finished_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} - {self.status}>"
@@ -0,0 +1,37 @@
+import uuid
+
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, String, UniqueConstraint
+
+from app.database import Base
+
+
+class LLMUsageRollup(Base):
+    """Hourly rollup of LLM calls per endpoint, user, model and outcome."""
+
+    __tablename__ = "llm_usage_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_start", "endpoint", "user_id", "model", "outcome",
+            name="uq_llm_usage_rollups_bucket",
+        ),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    endpoint = Column(String(100), nullable=False)
+    # Not a foreign key: guest scans record usage under "guest-demo"
+    user_id = Column(String(36), nullable=False, index=True)
+    model = Column(String(200), nullable=False)
+    outcome = Column(String(50), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0.0)
+    queue_wait_seconds = Column(Float, nullable=False, default=0.0)
+    ttfb_seconds = Column(Float, nullable=False, default=0.0)
+    latency_seconds = Column(Float, nullable=False, default=0.0)
+    # Call counts per LATENCY_BUCKETS bound (see app.services.llm_usage)
+    latency_histogram = Column(JSON, nullable=False, default=list)
+
+    def __repr__(self):
+        return f"<LLMUsageRollup {self.bucket_start} {self.endpoint} {self.model} x{self.calls}>"
@@ -23,6 +23,8 @@ class Recipe(Base):
     instructions = Column(JSON, nullable=False)
     is_favorite = Column(Boolean, default=False)
     times_made = Column(Integer, default=0)
+    # MinHash signature of title + ingredient names, for near-duplicate detection
+    minhash = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=func.now())
 
     def __repr__(self):
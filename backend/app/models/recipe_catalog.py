@@ -0,0 +1,46 @@
+import uuid
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class CatalogRecipe(Base):
+    """
+    An anonymized generated recipe shared across users. Carries no user or
+    scan reference; it is found by the canonical ingredients it requires.
+    """
+
+    __tablename__ = "recipe_catalog"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # SHA-256 of the normalized title and required ingredients
+    fingerprint = Column(String(64), nullable=False, unique=True)
+    title = Column(String(300), nullable=False)
+    description = Column(Text)
+    cook_time = Column(Integer)  # in minutes
+    difficulty = Column(String(50))
+    servings = Column(Integer)
+    ingredients = Column(JSON, nullable=False)
+    instructions = Column(JSON, nullable=False)
+    # Canonical names of the non-staple ingredients a fridge must cover
+    required_ingredients = Column(JSON, nullable=False)
+    required_count = Column(Integer, nullable=False)
+    contributions = Column(Integer, nullable=False, default=1)
+    times_served = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<CatalogRecipe {self.title}>"
+
+
+class CatalogIngredient(Base):
+    """One required ingredient of a catalog recipe, indexed for coverage lookups."""
+
+    __tablename__ = "recipe_catalog_ingredients"
+
+    catalog_id = Column(
+        String(36), ForeignKey("recipe_catalog.id", ondelete="CASCADE"), primary_key=True
+    )
+    name = Column(String(200), primary_key=True, index=True)
@@ -1,6 +1,7 @@
 import uuid
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, String
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.database import Base
@@ -16,7 +17,21 @@ class Scan(Base):
     image_path = Column(String(500), nullable=False)
     status = Column(String(50), default="processing")  # processing, completed, failed
     ingredients = Column(JSON, default=[])
+    # Progress while processing: queued, detecting, retrying, completed, failed
+    stage = Column(String(50), default="queued")
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    # Batch scans: a parent holds the merged ingredients of one child scan per image
+    parent_id = Column(String(36), ForeignKey("scans.id", ondelete="CASCADE"), nullable=True, index=True)
+    # What changed since the user's previous completed scan (see app.services.fridge_state)
+    previous_scan_id = Column(String(36), ForeignKey("scans.id", ondelete="SET NULL"), nullable=True)
+    diff = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    children = relationship(
+        "Scan", foreign_keys=[parent_id], order_by="Scan.created_at", cascade="all, delete-orphan", lazy="selectin"
+    )
 
     def __repr__(self):
         return f"<Scan {self.id} - {self.status}>"
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class StoredImage(Base):
+    """
+    A content-addressed image in upload storage, shared by every scan that
+    uploaded the same photo. The object is deleted when the last reference goes.
+    """
+
+    __tablename__ = "stored_images"
+
+    key = Column(String(200), primary_key=True)  # ab/cd/<sha256>.jpg
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<StoredImage {self.key} x{self.refcount}>"
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    """Schema for a background job's status and result."""
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
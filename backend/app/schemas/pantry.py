@@ -53,6 +53,23 @@ class PantryItemBulkCreate(BaseModel):
     items: list[PantryItemCreate]
 
 
+class PantrySyncRequest(BaseModel):
+    """Schema for syncing the pantry from a scan's changes."""
+    scan_id: str
+    # Also delete pantry items the scan no longer shows
+    remove_missing: bool = False
+    # Reconcile every ingredient of the scan, not just what changed since the previous one
+    full: bool = False
+
+
+class PantrySyncResponse(BaseModel):
+    """What a scan sync changed in the pantry."""
+    added: list[PantryItemResponse]
+    updated: list[PantryItemResponse]
+    removed: list[str]
+    unchanged: int
+
+
 class PantryResponse(BaseModel):
     """Schema for pantry response with items grouped by category."""
     items: list[PantryItemResponse]
@@ -15,14 +15,52 @@ class ScanCreate(BaseModel):
     pass
 
 
+class IngredientChange(BaseModel):
+    """An ingredient whose quantity changed since the previous scan."""
+    name: str
+    quantity: str | None = None
+    previous_quantity: str | None = None
+
+
+class ScanDiff(BaseModel):
+    """What changed since the user's previous completed scan."""
+    added: list[dict]
+    removed: list[dict]
+    changed: list[IngredientChange]
+    unchanged: int
+
+
+class ScanImageResponse(BaseModel):
+    """One image of a batch scan and what was detected in it."""
+    id: str
+    image_path: str
+    status: str
+    stage: str | None = None
+    error: str | None = None
+    ingredients: list[dict]
+
+    class Config:
+        from_attributes = True
+
+
 class ScanResponse(BaseModel):
     """Schema for scan response."""
     id: str
     user_id: str
     image_path: str
     status: str
+    stage: str | None = None
+    attempts: int | None = None
+    error: str | None = None
     ingredients: list[dict]
+    parent_id: str | None = None
+    # Batch scans: the per-image scans whose ingredients were merged
+    children: list[ScanImageResponse] = []
+    # Fridge-state diff against previous_scan_id (None for guests and unfinished scans)
+    previous_scan_id: str | None = None
+    diff: ScanDiff | None = None
     created_at: datetime
+    updated_at: datetime | None = None
 
     class Config:
         from_attributes = True
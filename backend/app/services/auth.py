@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.core.security import (
     decode_access_token,
     get_password_hash,
@@ -94,6 +95,16 @@ async def get_current_user(
     return user
 
 
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Require an authenticated user listed in ADMIN_EMAILS."""
+    if current_user.email.lower() not in settings.admin_emails_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
+
+
 async def get_optional_user(
     db: Session = Depends(get_db),
     token: Optional[HTTPAuthorizationCredentials] = Depends(security)
@@ -0,0 +1,192 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator
+from typing import Any, Generic, TypeVar
+
+from app.core.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TTLCache(Generic[K]):
+    """
+    Size-bounded LRU cache with per-entry time-to-live.
+
+    Values are deep-copied on the way in and out so callers can mutate
+    what they get back without corrupting the cache.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            metrics.incr(f"cache.{self.name}.hits")
+        else:
+            self.misses += 1
+            metrics.incr(f"cache.{self.name}.misses")
+
+    def get(self, key: K) -> Any | None:
+        """Return a cached value, or None on miss/expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._record(hit=False)
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._record(hit=False)
+                return None
+
+            self._entries.move_to_end(key)
+            self._record(hit=True)
+            return copy.deepcopy(value)
+
+    def set(self, key: K, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr(f"cache.{self.name}.evictions")
+
+    def delete(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self) -> list[K]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __iter__(self) -> Iterator[K]:
+        """Iterate over a snapshot of the keys, so entries can be deleted while looping."""
+        return iter(self.keys())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key: K) -> bool:
+        """Whether a live entry exists, without touching LRU order or hit counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class DetectionCache(TTLCache[str]):
+    """
+    Cache of vision detection results keyed by image content hash.
+
+    When a perceptual hash is supplied and ``max_distance`` > 0, a miss on the
+    exact hash falls back to the closest near-duplicate image within
+    ``max_distance`` bits.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_distance: int = 0):
+        super().__init__("detection", max_entries, ttl_seconds)
+        self.max_distance = max_distance
+        self.near_hits = 0
+        self._phashes: dict[str, int] = {}
+
+    def lookup(self, digest: str, phash: int | None = None) -> list[dict] | None:
+        result = self.get(digest)
+        if result is not None or phash is None or self.max_distance <= 0:
+            return result
+
+        with self._lock:
+            live = {k: v for k, v in self._phashes.items() if k in self._entries}
+            self._phashes = live
+        candidates = sorted(
+            (hamming_distance(phash, other), key) for key, other in live.items()
+        )
+        for distance, key in candidates:
+            if distance > self.max_distance:
+                break
+            result = self.get(key)
+            if result is not None:
+                # The exact-hash lookup above already counted a miss; reclassify it.
+                with self._lock:
+                    self.misses -= 1
+                    self.near_hits += 1
+                metrics.incr("cache.detection.misses", -1)
+                metrics.incr("cache.detection.near_hits")
+                return result
+        return None
+
+    def store(self, digest: str, ingredients: list[dict], phash: int | None = None) -> None:
+        self.set(digest, ingredients)
+        if phash is not None:
+            with self._lock:
+                self._phashes[digest] = phash
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._phashes.clear()
+            self.near_hits = 0
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["near_hits"] = self.near_hits
+        stats["near_duplicate_max_distance"] = self.max_distance
+        return stats
+
+
+class RecipeCache(TTLCache[tuple[str, str]]):
+    """
+    Cache of generated recipe drafts keyed by ``(user_id, input digest)``.
+
+    The digest already covers preferences, so a preference change can never
+    serve stale drafts; ``invalidate_user`` just frees the dead entries early.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__("recipes", max_entries, ttl_seconds)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached entry for a user. Returns the number removed."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
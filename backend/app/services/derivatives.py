@@ -0,0 +1,128 @@
+import hashlib
+import io
+import shutil
+from pathlib import Path
+
+from PIL import Image
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.image import _to_rgb
+from app.services.image_pool import image_pool
+from app.services.singleflight import SingleFlight
+from app.services.storage import CONTENT_KEY_PATTERN, LocalStorage, StorageError, image_store
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# format parameter -> (file extension, Pillow format, media type)
+DERIVATIVE_FORMATS = {
+    "jpeg": ("jpg", "JPEG", "image/jpeg"),
+    "webp": ("webp", "WEBP", "image/webp"),
+}
+
+render_flight = SingleFlight("derivatives")
+
+
+def render_derivative(data: bytes, size: int | None, fmt: str, quality: int) -> bytes:
+    """
+    Re-encode an image as ``fmt``, fitted within ``size`` x ``size`` (never
+    upscaled). Runs on the image process pool.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if size and img.format == "JPEG" and max(img.size) > size:
+            scale = size / max(img.size)
+            img.draft(img.mode, (round(img.size[0] * scale), round(img.size[1] * scale)))
+        rgb = _to_rgb(img)
+        if size and max(rgb.size) > size:
+            rgb.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        options = {"method": 4} if fmt == "webp" else {"optimize": True}
+        rgb.save(buffer, format=DERIVATIVE_FORMATS[fmt][1], quality=quality, **options)
+        return buffer.getvalue()
+
+
+def source_id(key: str) -> str:
+    """
+    Stable id of a stored image's content: the hash in a content-addressed
+    key, or a hash of an older upload's (never rewritten) filename.
+    """
+    if CONTENT_KEY_PATTERN.match(key):
+        return key.rsplit("/", 1)[1].split(".")[0]
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def variant_name(size: int | None, fmt: str | None) -> str:
+    if fmt is None:
+        return "original"
+    return f"{size or 'full'}.{DERIVATIVE_FORMATS[fmt][0]}"
+
+
+def etag(key: str, size: int | None, fmt: str | None) -> str:
+    """Strong ETag: the source content hash plus the rendering parameters."""
+    return f'"{source_id(key)[:32]}-{variant_name(size, fmt)}"'
+
+
+class DerivativeCache:
+    """
+    Lazily rendered image variants, cached on local disk.
+
+    Files are keyed by source content hash and parameters, so a cached
+    variant never goes stale; concurrent requests for a missing variant
+    share one render. Stored originals on a remote backend are cached here
+    too, so every response is served from local disk.
+    """
+
+    def __init__(self, root: str | None = None):
+        self._root = root
+        self.hits = 0
+        self.renders = 0
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.IMAGE_DERIVATIVE_CACHE_DIR or Path(settings.UPLOAD_DIR) / ".derivatives")
+
+    def _relative(self, key: str, name: str) -> str:
+        sid = source_id(key)
+        return f"{sid[:2]}/{sid}/{name}"
+
+    async def get(self, key: str, size: int | None, fmt: str | None) -> Path:
+        """Local path of the variant, rendering it on first request. Raises StorageError if the source is gone."""
+        backend = image_store.backend
+        if fmt is None and isinstance(backend, LocalStorage):
+            path = backend.path(key)
+            if not path.exists():
+                raise StorageError(f"No such object: {key}")
+            return path
+
+        cache = LocalStorage(str(self.root))
+        relative = self._relative(key, variant_name(size, fmt))
+        path = cache.path(relative)
+        if path.exists():
+            self.hits += 1
+            metrics.incr("derivatives.hits")
+            return path
+
+        async def render() -> Path:
+            data = await image_store.read(key)
+            if fmt is not None:
+                data = await image_pool.run(render_derivative, data, size, fmt, settings.IMAGE_DERIVATIVE_QUALITY)
+            await cache.put(relative, data)
+            self.renders += 1
+            metrics.incr("derivatives.renders")
+            logger.info(f"Rendered {relative} ({len(data) / 1024:.0f} KiB)")
+            return path
+
+        return await render_flight.do(relative, render)
+
+    def purge(self, key: str) -> None:
+        """Drop every cached variant of a deleted image."""
+        sid = source_id(key)
+        shutil.rmtree(self.root / sid[:2] / sid, ignore_errors=True)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "renders": self.renders, "coalesced": render_flight.coalesced}
+
+
+derivative_cache = DerivativeCache()
@@ -0,0 +1,103 @@
+"""
+Per-user fridge state: what changed since the user's previous scan.
+
+Each completed scan is diffed against the same user's previous completed
+scan into added, removed and changed items (a quantity counts as changed
+only when it moves to another bucket, so "6" vs "5" eggs is noise). The
+diff is stored on the scan, so pantry sync and recipe prompts can work
+from what changed instead of the whole list.
+"""
+from sqlalchemy.orm import Session
+
+from app.models.scan import Scan
+from app.services.groq_service import bucket_quantity
+from app.services.recipe_dedup import canonical_ingredient
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Guest scans all share one user id but come from different fridges
+GUEST_USER_ID = "guest-demo"
+
+
+def _by_name(ingredients: list[dict]) -> dict[str, dict]:
+    named = {}
+    for ingredient in ingredients or []:
+        key = canonical_ingredient(ingredient.get("name", ""))
+        if key and key not in named:
+            named[key] = ingredient
+    return named
+
+
+def _quantity(ingredient: dict) -> str | None:
+    quantity = ingredient.get("quantity")
+    return None if quantity is None else str(quantity)
+
+
+def diff_ingredients(previous: list[dict], current: list[dict]) -> dict:
+    """Diff two ingredient lists by canonical name."""
+    before, after = _by_name(previous), _by_name(current)
+    added = [after[key] for key in after if key not in before]
+    removed = [before[key] for key in before if key not in after]
+    changed = []
+    unchanged = 0
+    for key in after.keys() & before.keys():
+        if bucket_quantity(after[key].get("quantity")) == bucket_quantity(before[key].get("quantity")):
+            unchanged += 1
+        else:
+            changed.append({
+                "name": after[key]["name"],
+                "quantity": _quantity(after[key]),
+                "previous_quantity": _quantity(before[key]),
+            })
+    changed.sort(key=lambda change: change["name"].lower())
+    return {"added": added, "removed": removed, "changed": changed, "unchanged": unchanged}
+
+
+def previous_scan(db: Session, scan: Scan) -> Scan | None:
+    """The user's latest completed scan taken before ``scan`` (batch parents count, their images don't)."""
+    return (
+        db.query(Scan)
+        .filter(
+            Scan.user_id == scan.user_id,
+            Scan.status == "completed",
+            Scan.parent_id.is_(None),
+            Scan.id != scan.id,
+            Scan.created_at <= scan.created_at,
+        )
+        .order_by(Scan.created_at.desc())
+        .first()
+    )
+
+
+def scans_diffed_against(db: Session, scan: Scan) -> list[Scan]:
+    """The scans whose stored diff was taken against ``scan``; re-diff them when it changes or goes."""
+    return db.query(Scan).filter(Scan.previous_scan_id == scan.id).all()
+
+
+def record_scan_diff(db: Session, scan: Scan) -> None:
+    """Diff a completed scan against the user's previous one and store it on the scan; the caller commits."""
+    if scan.user_id == GUEST_USER_ID or scan.parent_id is not None:
+        return
+    if scan.created_at is None:
+        db.flush()
+        db.refresh(scan, ["created_at"])
+
+    previous = previous_scan(db, scan)
+    scan.previous_scan_id = previous.id if previous else None
+    scan.diff = diff_ingredients(previous.ingredients if previous else [], scan.ingredients)
+    logger.info(
+        f"Scan {scan.id} vs {scan.previous_scan_id or 'nothing'}: {len(scan.diff['added'])} added, "
+        f"{len(scan.diff['removed'])} removed, {len(scan.diff['changed'])} changed"
+    )
+
+
+def mark_new_ingredients(ingredients: list[dict], diff: dict | None) -> list[dict]:
+    """Flag the ingredients a scan added or changed with ``new``, for prompts to put first."""
+    if not diff:
+        return ingredients
+    fresh = {canonical_ingredient(i.get("name", "")) for i in diff["added"] + diff["changed"]}
+    return [
+        {**ingredient, "new": True} if canonical_ingredient(ingredient.get("name", "")) in fresh else ingredient
+        for ingredient in ingredients
+    ]
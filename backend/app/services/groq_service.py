@@ -1,8 +1,42 @@
-import json
+import asyncio
 import base64
-from pathlib import Path
-from groq import Groq
+import functools
+import hashlib
+import json
+import re
+from collections.abc import AsyncIterator
+
+import httpx
+from groq import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncGroq,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
+
 from app.config import settings
+from app.core.metrics import metrics
+from app.services.cache import DetectionCache, RecipeCache, content_hash
+from app.services.image import perceptual_hash
+from app.services import llm_usage
+from app.services.llm_transport import LatencyModel, RecordingTransport, ReplayTransport
+from app.services.model_router import ModelRouter, ModelTier, parse_model_tiers
+from app.services.prompt_builder import (
+    estimate_tokens,
+    format_ingredient,
+    rank_ingredients,
+    select_within_budget,
+)
+from app.services.resilience import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    ServiceUnavailableError,
+    parse_duration,
+)
+from app.services.singleflight import SingleFlight
+from app.services.tiled_detection import detect_tiled
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -13,99 +47,338 @@ if not settings.GROQ_API_KEY:
 else:
     logger.info(f"Groq API key configured (length: {len(settings.GROQ_API_KEY)})")
 
-# Initialize Groq client
-client = None
-if settings.GROQ_API_KEY:
-    client = Groq(api_key=settings.GROQ_API_KEY)
+# Shared async Groq client. One keep-alive connection pool per worker process,
+# created and closed by the FastAPI lifespan (see app.main).
+client: AsyncGroq | None = None
+
+
+def _build_transport() -> httpx.AsyncBaseTransport:
+    """Live transport, optionally wrapped to record to / replay from a cassette."""
+    mode = settings.GROQ_TRANSPORT_MODE
+    if mode == "replay":
+        logger.info(f"Groq calls replayed from cassette {settings.GROQ_CASSETTE_PATH}")
+        return ReplayTransport(
+            settings.GROQ_CASSETTE_PATH,
+            latency=LatencyModel(settings.GROQ_REPLAY_LATENCY),
+            match=settings.GROQ_REPLAY_MATCH,
+        )
+
+    live = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=settings.GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+        ),
+    )
+    if mode == "record":
+        logger.info(f"Recording Groq calls to cassette {settings.GROQ_CASSETTE_PATH}")
+        return RecordingTransport(live, settings.GROQ_CASSETTE_PATH)
+    return live
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return DefaultAsyncHttpxClient(
+        transport=_build_transport(),
+        timeout=httpx.Timeout(settings.GROQ_TIMEOUT_SECONDS, connect=5.0),
+    )
+
+
+async def init_client(http_client: httpx.AsyncClient | None = None) -> AsyncGroq | None:
+    """Create the shared AsyncGroq client. Called once on application startup."""
+    global client
+    if client is not None:
+        return client
+    if not settings.GROQ_API_KEY:
+        return None
+
+    http_client = http_client or _build_http_client()
+    # Timestamp response headers for per-call time-to-first-byte
+    hooks = http_client.event_hooks
+    http_client.event_hooks = {**hooks, "response": [*hooks["response"], llm_usage.mark_first_byte]}
+
+    client = AsyncGroq(
+        api_key=settings.GROQ_API_KEY,
+        base_url=settings.GROQ_BASE_URL or None,
+        http_client=http_client,
+    )
+    logger.info(
+        f"Groq async client ready (max_connections={settings.GROQ_MAX_CONNECTIONS}, "
+        f"keepalive={settings.GROQ_MAX_KEEPALIVE_CONNECTIONS})"
+    )
+    return client
+
+
+async def close_client() -> None:
+    """Close the shared client and its connection pool. Called on application shutdown."""
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+        logger.info("Groq async client closed")
+
+
+async def get_client() -> AsyncGroq:
+    """Return the shared client, creating it lazily outside of the app lifespan (scripts, tests)."""
+    if client is None:
+        await init_client()
+    if client is None:
+        raise Exception("GROQ_API_KEY is not set. Please add it to your .env file.")
+    return client
+
+
+# Vision results keyed by image content hash (plus optional perceptual hash)
+detection_cache = DetectionCache(
+    max_entries=settings.DETECTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.DETECTION_CACHE_TTL_SECONDS,
+    max_distance=settings.DETECTION_CACHE_NEAR_DUPLICATE_DISTANCE,
+)
+
+# Pace Groq calls: AIMD concurrency limit + fail-fast circuit breaker
+groq_limiter = AdaptiveLimiter(
+    "groq",
+    initial_limit=settings.GROQ_CONCURRENCY_INITIAL,
+    min_limit=settings.GROQ_CONCURRENCY_MIN,
+    max_limit=settings.GROQ_CONCURRENCY_MAX,
+)
+groq_breaker = CircuitBreaker(
+    "groq",
+    failure_threshold=settings.GROQ_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=settings.GROQ_BREAKER_RECOVERY_SECONDS,
+)
+
+
+def _record_groq_timeout(tier: ModelTier) -> None:
+    """A tier missed its latency SLO: a slow upstream is an overloaded one."""
+    groq_limiter.on_overload()
+    groq_breaker.record_failure()
+
+
+# Ordered model tiers per task: fast model first, escalate on SLO miss or bad output
+vision_router = ModelRouter(
+    "vision", parse_model_tiers(settings.GROQ_VISION_MODELS), on_timeout=_record_groq_timeout
+)
+text_router = ModelRouter(
+    "text", parse_model_tiers(settings.GROQ_TEXT_MODELS), on_timeout=_record_groq_timeout
+)
+
+# Coalesce identical in-flight vision/text requests
+vision_flight = SingleFlight("vision")
+text_flight = SingleFlight("text")
+
+# Generated recipe drafts keyed by (user_id, canonical input digest)
+recipe_cache = RecipeCache(
+    max_entries=settings.RECIPE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RECIPE_CACHE_TTL_SECONDS,
+)
+
+
+def _record_groq_failure(exc: Exception) -> None:
+    """Feed an error into the limiter/breaker. Only upstream overload counts as failure."""
+    if isinstance(exc, RateLimitError):
+        groq_limiter.observe_headers(exc.response.headers)
+        groq_limiter.on_overload()
+        groq_breaker.record_failure(parse_duration(exc.response.headers.get("retry-after")))
+    elif isinstance(exc, (APIConnectionError, InternalServerError, asyncio.TimeoutError)):
+        groq_limiter.on_overload()
+        groq_breaker.record_failure()
+    else:
+        # Bad requests and malformed output say nothing about upstream health:
+        # neither a failure nor a successful probe
+        groq_breaker.release_probe()
+
+
+def _failure_outcome(exc: Exception) -> str:
+    if isinstance(exc, RateLimitError):
+        return "rate_limited"
+    if isinstance(exc, (APITimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(exc, APIConnectionError):
+        return "connection_error"
+    if isinstance(exc, InternalServerError):
+        return "server_error"
+    return "error"
+
+
+async def create_completion(task: str = "text", **kwargs):
+    """
+    Call chat.completions.create behind the circuit breaker and adaptive limiter.
+
+    Raises ServiceUnavailableError without calling Groq while the breaker is open.
+    For streamed completions the concurrency slot is held until the response starts.
+    Every call is timed and its token usage recorded under ``task`` (see llm_usage).
+    """
+    with llm_usage.track_call(task, kwargs.get("model")) as call:
+        try:
+            groq_breaker.before_call()
+        except ServiceUnavailableError:
+            call.finish("rejected")
+            raise
+
+        try:
+            call.queue_wait = await groq_limiter.acquire()
+        except BaseException:
+            groq_breaker.release_probe()
+            raise
+        try:
+            groq_client = await get_client()
+            raw = await groq_client.chat.completions.with_raw_response.create(**kwargs)
+            call.mark_first_byte()
+            groq_limiter.observe_headers(raw.headers)
+            completion = await raw.parse()
+        except Exception as e:
+            _record_groq_failure(e)
+            call.finish(_failure_outcome(e))
+            raise
+        except BaseException:
+            # Cancelled (client gone, SLO timeout): says nothing about upstream health,
+            # but a half-open probe must not stay claimed forever
+            groq_breaker.release_probe()
+            raise
+        else:
+            groq_breaker.record_success()
+            groq_limiter.on_success()
+        finally:
+            groq_limiter.release()
+
+        if kwargs.get("stream"):
+            prompt_text = " ".join(
+                m["content"] for m in kwargs.get("messages", []) if isinstance(m.get("content"), str)
+            )
+            return llm_usage.InstrumentedStream(completion, call, estimate_tokens(prompt_text))
+
+        usage = completion.usage
+        call.finish(
+            "ok",
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0,
+        )
+        return completion
 
-def encode_image(image_path: Path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
 
-def detect_ingredients_from_image(image_path: str) -> list[dict]:
+async def detect_ingredients_from_image(image_bytes: bytes, source: bytes | None = None) -> list[dict]:
     """
     Detect ingredients from a fridge/pantry image using Llama 4 Scout Vision on Groq.
+
+    ``image_bytes`` is the JPEG prepared for the model by the upload pipeline
+    (see ``app.services.image.save_upload_file`` / ``load_vision_image``);
+    it is sent as-is. With VISION_DETECTION_MODE=tiled, overlapping crops of
+    ``source`` (the stored full-size image, if given) are detected alongside
+    it and merged (see ``app.services.tiled_detection``).
     """
     if not settings.GROQ_API_KEY:
         raise Exception("GROQ_API_KEY is not set. Please add it to your .env file.")
 
     try:
-        full_path = Path(settings.UPLOAD_DIR) / image_path
-        base64_image = encode_image(full_path)
+        if settings.VISION_DETECTION_MODE == "tiled":
+            # Crops of one photo look alike; only reuse results for identical crops
+            exact = functools.partial(_detect_cached, near_duplicates=False)
+            return await detect_tiled(image_bytes, exact, source=source)
+        return await _detect_cached(image_bytes)
 
-        # Using meta-llama/llama-4-scout-17b-16e-instruct (Production Vision Model)
-        model_name = "meta-llama/llama-4-scout-17b-16e-instruct"
-        
-        prompt = """
-        Look at this refrigerator/pantry photo carefully. List all visible food items and ingredients.
-
-        Return your response as a JSON array with this exact format:
-        [
-            {"name": "eggs", "quantity": "6", "confidence": 0.95},
-            {"name": "cheddar cheese", "quantity": "1 block", "confidence": 0.90},
-            {"name": "milk", "quantity": "1 carton", "confidence": 0.85}
-        ]
-
-        Guidelines:
-        - Only include items you're reasonably confident about (confidence > 0.60)
-        - Be specific: "cheddar cheese" not just "cheese"
-        - Estimate quantities when visible
-        - Confidence should be between 0 and 1
-        - Return ONLY the JSON array, no other text or explanation.
-        """
+    except ServiceUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in Groq vision detection: {e}")
+        raise Exception(f"Failed to detect ingredients: {str(e)}")
+
+
+async def _detect_cached(image_bytes: bytes, near_duplicates: bool = True) -> list[dict]:
+    """Detect one prepared image, through the detection cache and single-flight."""
+    # Serve re-uploads of the same (or a near-identical) photo from cache
+    digest = content_hash(image_bytes)
+    phash = None
+    if near_duplicates and detection_cache.max_distance > 0:
+        phash = await asyncio.to_thread(perceptual_hash, image_bytes)
+    cached = detection_cache.lookup(digest, phash)
+    if cached is not None:
+        logger.info(f"Detection cache hit for image {digest[:12]}")
+        return cached
+
+    # Concurrent uploads of the same photo share one vision call
+    ingredients = await vision_flight.do(digest, lambda: _detect_ingredients(image_bytes))
 
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}",
-                            },
+    detection_cache.store(digest, ingredients, phash)
+    return ingredients
+
+
+async def _detect_ingredients(image_bytes: bytes) -> list[dict]:
+    """Run the vision model tiers on prepared image bytes, escalating on timeout or bad output."""
+    base64_image = base64.b64encode(image_bytes).decode("ascii")
+    return await vision_router.run(
+        lambda tier: _detect_with_model(tier.name, base64_image),
+        validate=bool,
+    )
+
+
+async def _detect_with_model(model_name: str, base64_image: str) -> list[dict]:
+    """Run one vision model and normalize its output."""
+    prompt = """
+    Look at this refrigerator/pantry photo carefully. List all visible food items and ingredients.
+
+    Return your response as a JSON array with this exact format:
+    [
+        {"name": "eggs", "quantity": "6", "confidence": 0.95},
+        {"name": "cheddar cheese", "quantity": "1 block", "confidence": 0.90},
+        {"name": "milk", "quantity": "1 carton", "confidence": 0.85}
+    ]
+
+    Guidelines:
+    - Only include items you're reasonably confident about (confidence > 0.60)
+    - Be specific: "cheddar cheese" not just "cheese"
+    - Estimate quantities when visible
+    - Confidence should be between 0 and 1
+    - Return ONLY the JSON array, no other text or explanation.
+    """
+
+    completion = await create_completion(
+        task="vision",
+        model=model_name,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
                         },
-                    ],
-                }
-            ],
-            temperature=0.1,
-            max_tokens=1024,
-            top_p=1,
-            stream=False,
-            response_format={"type": "json_object"}
-        )
+                    },
+                ],
+            }
+        ],
+        temperature=0.1,
+        max_tokens=1024,
+        top_p=1,
+        stream=False,
+        response_format={"type": "json_object"}
+    )
 
-        response_text = completion.choices[0].message.content.strip()
-        logger.debug(f"Groq raw response: {response_text}")
+    response_text = completion.choices[0].message.content.strip()
+    logger.debug(f"Groq raw response: {response_text}")
 
-        data = json.loads(response_text)
-        
-        if isinstance(data, dict):
-            for key in data:
-                if isinstance(data[key], list):
-                    ingredients = data[key]
-                    break
-            else:
-                ingredients = []
+    data = json.loads(response_text)
+    
+    if isinstance(data, dict):
+        for key in data:
+            if isinstance(data[key], list):
+                ingredients = data[key]
+                break
         else:
-            ingredients = data
-
-        cleaned_ingredients = []
-        for item in ingredients:
-            if isinstance(item, dict) and "name" in item:
-                cleaned_ingredients.append({
-                    "name": item.get("name", "").strip(),
-                    "quantity": str(item.get("quantity", "some")).strip(),
-                    "confidence": float(item.get("confidence", 0.75))
-                })
+            ingredients = []
+    else:
+        ingredients = data
 
-        return cleaned_ingredients
+    cleaned_ingredients = []
+    for item in ingredients:
+        if isinstance(item, dict) and "name" in item:
+            cleaned_ingredients.append({
+                "name": item.get("name", "").strip(),
+                "quantity": str(item.get("quantity", "some")).strip(),
+                "confidence": float(item.get("confidence", 0.75))
+            })
+    return cleaned_ingredients
 
-    except Exception as e:
-        logger.error(f"Error in Groq vision detection: {e}")
-        raise Exception(f"Failed to detect ingredients: {str(e)}")
 
 def merge_ingredients(scan_ingredients: list[dict], pantry_ingredients: list[dict]) -> list[dict]:
     merged = {}
@@ -116,7 +389,9 @@ def merge_ingredients(scan_ingredients: list[dict], pantry_ingredients: list[dic
                 'name': ing.get('name', '').strip(),
                 'quantity': ing.get('quantity', 'some'),
                 'confidence': 1.0,
-                'source': 'pantry'
+                'source': 'pantry',
+                'category': ing.get('category'),
+                'expiry_date': ing.get('expiry_date'),
             }
     for ing in scan_ingredients:
         name_lower = ing.get('name', '').lower().strip()
@@ -127,43 +402,117 @@ def merge_ingredients(scan_ingredients: list[dict], pantry_ingredients: list[dic
                 'confidence': ing.get('confidence', 0.8),
                 'source': 'scan'
             }
+            if ing.get('new'):
+                merged[name_lower]['new'] = True
     return list(merged.values())
 
-def generate_recipes(
+# Preference fields that change the generated recipes
+RECIPE_PREFERENCE_FIELDS = ("dietary", "allergies", "cuisines", "skill_level", "max_cook_time", "servings")
+
+_QUANTITY_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def bucket_quantity(quantity) -> str:
+    """
+    Coarsen a free-text quantity so "6 eggs" and "5" share a cache key.
+
+    Numbers fall into power-of-two buckets; anything else becomes "some".
+    """
+    match = _QUANTITY_NUMBER.search(str(quantity or ""))
+    if not match:
+        return "some"
+    value = float(match.group())
+    if value <= 1:
+        return "1"
+    bucket = 1
+    while bucket < value:
+        bucket *= 2
+    return f"<={bucket}"
+
+
+def recipe_cache_key(
+    user_id: str,
+    available_ingredients: list[dict],
+    preferences: dict | None,
+    count: int,
+    pantry_ingredients: list[dict] | None = None,
+) -> tuple[str, str]:
+    """
+    Build a canonical ``(user_id, digest)`` key for a recipe generation request.
+    Ingredients flagged ``new`` (see ``mark_new_ingredients``) lead the prompt,
+    so the flag is part of the key: a re-diffed scan gets fresh recipes.
+    """
+    all_ingredients = available_ingredients
+    if pantry_ingredients:
+        all_ingredients = merge_ingredients(available_ingredients, pantry_ingredients)
+
+    canonical_ingredients = sorted(
+        (ing.get("name", "").lower().strip(), bucket_quantity(ing.get("quantity")), bool(ing.get("new")))
+        for ing in all_ingredients
+        if ing.get("name", "").strip()
+    )
+
+    prefs = preferences or {}
+    canonical_prefs = {}
+    for field in RECIPE_PREFERENCE_FIELDS:
+        value = prefs.get(field)
+        if isinstance(value, list):
+            value = sorted(str(v).lower().strip() for v in value)
+        canonical_prefs[field] = value
+
+    payload = json.dumps(
+        {"ingredients": canonical_ingredients, "preferences": canonical_prefs, "count": count},
+        sort_keys=True,
+    )
+    return user_id, hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_recipe_prompt(
     available_ingredients: list[dict],
     preferences: dict | None = None,
     count: int = 3,
-    pantry_ingredients: list[dict] | None = None
-) -> list[dict]:
-    try:
-        all_ingredients = available_ingredients
-        if pantry_ingredients:
-            all_ingredients = merge_ingredients(available_ingredients, pantry_ingredients)
-
-        ingredients_list = [f"{ing['name']} ({ing.get('quantity', 'some')})" for ing in all_ingredients]
-        ingredients_str = ", ".join(ingredients_list)
-
-        prefs_str = ""
-        if preferences:
-            dietary = preferences.get("dietary", [])
-            allergies = preferences.get("allergies", [])
-            cuisines = preferences.get("cuisines", [])
-            skill_level = preferences.get("skill_level", "intermediate")
-            max_cook_time = preferences.get("max_cook_time", 60)
-            servings = preferences.get("servings", 2)
-            
-            prefs_str = f"""
-            User Preferences:
-            - Dietary: {', '.join(dietary) if dietary else 'None'}
-            - Allergies (AVOID): {', '.join(allergies) if allergies else 'None'}
-            - Cuisine: {', '.join(cuisines) if cuisines else 'Any'}
-            - Skill: {skill_level}
-            - Time: {max_cook_time} mins
-            - Servings: {servings}
-            """
-
-        prompt = f"""
+    pantry_ingredients: list[dict] | None = None,
+    diversity_hint: str | None = None,
+    avoid_titles: list[str] | None = None,
+) -> str:
+    """
+    Build the recipe generation prompt from scan/pantry ingredients and preferences.
+
+    Ingredients are ranked (scan items, then expiring pantry items, then a
+    category-diverse mix) and truncated so the prompt stays within
+    RECIPE_PROMPT_TOKEN_BUDGET, which bounds generation latency for large pantries.
+    """
+    all_ingredients = [{**ing, 'source': ing.get('source', 'scan')} for ing in available_ingredients]
+    if pantry_ingredients:
+        all_ingredients = merge_ingredients(available_ingredients, pantry_ingredients)
+
+    prefs_str = ""
+    if preferences:
+        dietary = preferences.get("dietary", [])
+        allergies = preferences.get("allergies", [])
+        cuisines = preferences.get("cuisines", [])
+        skill_level = preferences.get("skill_level", "intermediate")
+        max_cook_time = preferences.get("max_cook_time", 60)
+        servings = preferences.get("servings", 2)
+        
+        prefs_str = f"""
+        User Preferences:
+        - Dietary: {', '.join(dietary) if dietary else 'None'}
+        - Allergies (AVOID): {', '.join(allergies) if allergies else 'None'}
+        - Cuisine: {', '.join(cuisines) if cuisines else 'Any'}
+        - Skill: {skill_level}
+        - Time: {max_cook_time} mins
+        - Servings: {servings}
+        """
+
+    focus_str = f"Focus on {diversity_hint}." if diversity_hint else ""
+    if avoid_titles:
+        focus_str += f" Do not suggest these recipes or close variations of them: {'; '.join(avoid_titles)}."
+
+    def render(ingredients_str: str) -> str:
+        return f"""
         Create {count} diverse recipes using: {ingredients_str}.
+        {focus_str}
         {prefs_str}
 
         Return as a JSON array of objects with this format:
@@ -181,27 +530,288 @@ def generate_recipes(
         Return ONLY the JSON array.
         """
 
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
+    # Spend whatever the fixed parts of the prompt leave on ingredients
+    budget = settings.RECIPE_PROMPT_TOKEN_BUDGET
+    ingredient_budget = max(0, budget - estimate_tokens(render("")))
+    ranked = rank_ingredients(all_ingredients, expiry_horizon_days=settings.RECIPE_PROMPT_EXPIRY_HORIZON_DAYS)
+    selected = select_within_budget(ranked, ingredient_budget)
 
-        response_text = completion.choices[0].message.content.strip()
-        data = json.loads(response_text)
-        
-        recipes = []
-        if isinstance(data, list):
-            recipes = data
-        elif isinstance(data, dict):
-            for key in data:
-                if isinstance(data[key], list):
-                    recipes = data[key]
-                    break
+    prompt = render(", ".join(format_ingredient(ing) for ing in selected))
+    prompt_tokens = estimate_tokens(prompt)
+    dropped = len(ranked) - len(selected)
+    metrics.incr("prompt.recipes.built")
+    metrics.incr("prompt.recipes.estimated_tokens", prompt_tokens)
+    if dropped:
+        metrics.incr("prompt.recipes.truncated")
+    logger.info(
+        f"Recipe prompt: ~{prompt_tokens} tokens, {len(selected)}/{len(ranked)} ingredients "
+        f"(budget {budget}, {dropped} truncated)"
+    )
+    return prompt
+
+
+# Steer each fan-out completion toward a different part of the recipe space
+FANOUT_DIVERSITY_HINTS = [
+    "a different world cuisine for each recipe",
+    "quick stovetop or one-pan techniques",
+    "baked, roasted or slow-cooked dishes",
+    "fresh, no-cook or minimal-cook dishes",
+    "soups, stews and braises",
+    "comfort food and family-style classics",
+]
+
+
+def split_count(count: int, width: int) -> list[int]:
+    """Split ``count`` recipes into at most ``width`` near-equal batches."""
+    width = max(1, min(width, count))
+    base, extra = divmod(count, width)
+    return [base + (1 if i < extra else 0) for i in range(width)]
 
-        return recipes[:count]
 
+def dedupe_recipes(recipes: list[dict]) -> list[dict]:
+    """Drop recipes whose normalized title was already seen."""
+    seen = set()
+    unique = []
+    for recipe in recipes:
+        title = " ".join(str(recipe.get("title", "")).lower().split())
+        if title in seen:
+            continue
+        seen.add(title)
+        unique.append(recipe)
+    return unique
+
+
+async def generate_recipes(
+    available_ingredients: list[dict],
+    preferences: dict | None = None,
+    count: int = 3,
+    pantry_ingredients: list[dict] | None = None,
+    avoid_titles: list[str] | None = None,
+) -> list[dict]:
+    try:
+        width = settings.RECIPE_FANOUT_WIDTH
+        if width > 1 and count >= settings.RECIPE_FANOUT_MIN_COUNT:
+            return await _generate_recipes_fanout(
+                available_ingredients, preferences, count, pantry_ingredients, width, avoid_titles
+            )
+
+        prompt = build_recipe_prompt(
+            available_ingredients, preferences, count, pantry_ingredients, avoid_titles=avoid_titles
+        )
+
+        # Identical concurrent requests (double taps, client retries) share one completion
+        key = hashlib.sha256(f"{count}:{prompt}".encode()).hexdigest()
+        return await text_flight.do(key, lambda: _complete_recipes(prompt, count))
+
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error generating recipes with Groq: {e}")
         raise Exception(f"Failed to generate recipes: {str(e)}")
+
+
+async def _generate_recipes_fanout(
+    available_ingredients: list[dict],
+    preferences: dict | None,
+    count: int,
+    pantry_ingredients: list[dict] | None,
+    width: int,
+    avoid_titles: list[str] | None = None,
+) -> list[dict]:
+    """
+    Generate a large batch as several concurrent smaller completions.
+
+    Output tokens are produced serially, so N completions of count/N recipes
+    finish in roughly 1/N of the time of one big completion. Each batch gets
+    a different diversity hint; results are merged and deduplicated by title.
+    """
+    batches = split_count(count, width)
+    calls = []
+    for i, batch_count in enumerate(batches):
+        hint = FANOUT_DIVERSITY_HINTS[i % len(FANOUT_DIVERSITY_HINTS)]
+        prompt = build_recipe_prompt(
+            available_ingredients, preferences, batch_count, pantry_ingredients,
+            diversity_hint=hint, avoid_titles=avoid_titles,
+        )
+        key = hashlib.sha256(f"{batch_count}:{prompt}".encode()).hexdigest()
+        calls.append(
+            text_flight.do(key, functools.partial(_complete_recipes, prompt, batch_count))
+        )
+
+    logger.info(f"Fanning out {count} recipes as {len(batches)} concurrent completions: {batches}")
+    results = await asyncio.gather(*calls, return_exceptions=True)
+
+    recipes = []
+    errors = []
+    for result in results:
+        if isinstance(result, BaseException):
+            errors.append(result)
+        else:
+            recipes.extend(result)
+
+    if errors and not recipes:
+        raise errors[0]
+    if errors:
+        metrics.incr("fanout.recipes.partial_failures", len(errors))
+        logger.warning(f"{len(errors)} of {len(batches)} fan-out completions failed: {errors[0]}")
+
+    unique = dedupe_recipes(recipes)
+    metrics.incr("fanout.recipes.duplicates_dropped", len(recipes) - len(unique))
+    return unique[:count]
+
+
+def recipes_look_complete(recipes: list[dict], count: int) -> bool:
+    """Quality gate for the model router: enough recipes, each with a title and steps."""
+    complete = [
+        r for r in recipes
+        if isinstance(r, dict) and r.get("title") and r.get("instructions")
+    ]
+    return len(complete) >= count
+
+
+async def _complete_recipes(prompt: str, count: int) -> list[dict]:
+    """Run the text model tiers on a recipe prompt, escalating on timeout or bad output."""
+    return await text_router.run(
+        lambda tier: _complete_recipes_with_model(tier.name, prompt, count),
+        validate=lambda recipes: recipes_look_complete(recipes, count),
+    )
+
+
+async def _complete_recipes_with_model(model_name: str, prompt: str, count: int) -> list[dict]:
+    """Run one text model on a recipe prompt and extract the recipe list."""
+    completion = await create_completion(
+        model=model_name,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+    response_text = completion.choices[0].message.content.strip()
+    data = json.loads(response_text)
+    
+    recipes = []
+    if isinstance(data, list):
+        recipes = data
+    elif isinstance(data, dict):
+        for key in data:
+            if isinstance(data[key], list):
+                recipes = data[key]
+                break
+
+    return recipes[:count]
+
+
+class RecipeStreamParser:
+    """
+    Incrementally extract recipe objects from a streamed JSON completion.
+
+    Each object that is a direct element of the first JSON array in the
+    stream is emitted as soon as its closing brace arrives, whether the
+    model wraps the array (``{"recipes": [...]}``) or returns it bare.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._array_depth: int | None = None
+        self._object_start: int | None = None
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume a chunk of text and return any recipe objects it completed."""
+        self._buffer += text
+        completed = []
+
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if (
+                    char == "{"
+                    and self._array_depth is not None
+                    and len(self._stack) == self._array_depth
+                ):
+                    self._object_start = self._pos
+                self._stack.append(char)
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = len(self._stack)
+            elif char in "]}" and self._stack:
+                self._stack.pop()
+                if (
+                    char == "}"
+                    and self._object_start is not None
+                    and len(self._stack) == self._array_depth
+                ):
+                    raw = self._buffer[self._object_start:self._pos + 1]
+                    self._object_start = None
+                    try:
+                        item = json.loads(raw)
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping malformed recipe object in stream")
+                    else:
+                        if isinstance(item, dict):
+                            completed.append(item)
+
+            self._pos += 1
+
+        return completed
+
+
+async def stream_recipes(
+    available_ingredients: list[dict],
+    preferences: dict | None = None,
+    count: int = 3,
+    pantry_ingredients: list[dict] | None = None
+) -> AsyncIterator[dict]:
+    """
+    Generate recipes with a streamed completion, yielding each recipe as soon
+    as its JSON object is complete instead of waiting for the whole batch.
+    """
+    try:
+        prompt = build_recipe_prompt(available_ingredients, preferences, count, pantry_ingredients)
+
+        # A stream can't be retried on another model once it has started
+        # emitting, so go straight to the most capable tier
+        stream = await create_completion(
+            model=text_router.tiers[-1].name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            stream=True,
+        )
+
+        parser = RecipeStreamParser()
+        emitted = 0
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                for recipe in parser.feed(delta):
+                    yield recipe
+                    emitted += 1
+                    if emitted >= count:
+                        await stream.close()
+                        return
+        finally:
+            # Our consumer may stop early too; its usage is still recorded
+            await stream.abandon()
+
+    except ServiceUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming recipes from Groq: {e}")
+        raise Exception(f"Failed to generate recipes: {str(e)}") from e
@@ -1,11 +1,22 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
+import io
 import re
-import uuid
+import tempfile
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from pathlib import Path
 
 from fastapi import HTTPException, UploadFile, status
 from PIL import Image
+from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.core.metrics import metrics
+from app.services.image_pool import image_pool
+from app.services.storage import content_key, image_store
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -14,138 +25,378 @@ logger = setup_logger(__name__)
 def validate_image_path(image_path: str) -> bool:
     """
     Validate that an image path is safe (no directory traversal).
-    Only allows UUID-like filenames with valid image extensions.
+    Only allows content-addressed storage keys, or the UUID-like filenames
+    of older uploads, with valid image extensions.
     """
-    # Only allow UUID-like filenames with valid extensions
-    pattern = r'^[a-f0-9\-]+\.(jpg|jpeg|png|gif|webp)$'
+    # ab/cd/<sha256>.ext, or <uuid>.ext
+    pattern = r'^([a-f0-9]{2}/[a-f0-9]{2}/[a-f0-9]{64}|[a-f0-9\-]+)\.(jpg|jpeg|png|gif|webp|heic)$'
     return bool(re.match(pattern, image_path, re.IGNORECASE))
 
 
-def validate_image(file: UploadFile) -> None:
-    """Validate uploaded image file."""
-    logger.debug(f"Validating image: {file.filename}")
+# ISO-BMFF brands of HEIC/HEIF photos (what iPhones upload)
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"}
 
-    # Check if filename exists
-    if not file.filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No filename provided"
-        )
 
-    # Check file extension
-    file_ext = file.filename.split(".")[-1].lower()
-    logger.debug(f"File extension: {file_ext}")
+def sniff_image_type(header: bytes) -> str | None:
+    """Identify an image format from its leading bytes; returns its file extension."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIF_BRANDS:
+        return "heic"
+    return None
 
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type '{file_ext}'. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
-        )
 
-    # Check content type
-    logger.debug(f"Content type: {file.content_type}")
-    if not file.content_type or not file.content_type.startswith("image/"):
+def validate_image(header: bytes) -> str:
+    """
+    Validate an upload from its first bytes, whatever its filename or
+    declared content type claim. Returns the extension to store it under.
+    """
+    file_ext = sniff_image_type(header)
+    logger.debug(f"Sniffed image type: {file_ext}")
+
+    if file_ext is None or file_ext not in settings.ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File must be an image"
+            detail=f"File must be an image. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
         )
 
-    logger.debug("Image validation passed!")
+    return file_ext
+
 
+@dataclass
+class SavedUpload:
+    """
+    An upload, decoded once into the stored derivative (``data``) and the
+    vision payload.
 
-async def save_upload_file(file: UploadFile) -> str:
+    ``vision`` is the JPEG to send to the vision model. ``data`` is written
+    to storage under ``key`` in the background; await ``stored()`` before
+    anything else needs to read it. The scan's reference to it is counted
+    when the scan is committed (see ``commit_with_uploads``).
     """
-    Save uploaded file to disk.
-    Returns the relative path to the saved file.
+    key: str
+    size: int
+    sha256: str
+    vision: bytes
+    data: bytes
+    write: asyncio.Task | None = None
+
+    async def stored(self) -> None:
+        if self.write is not None:
+            await self.write
+
+
+async def commit_with_uploads(db: Session, *uploads: SavedUpload) -> None:
     """
-    logger.info(f"Starting file upload for: {file.filename}")
+    Commit new scans together with their references to their uploads.
+
+    Each upload is written first and its reference counted in the scans'
+    own transaction, so a failed write or commit leaves no reference
+    behind. A first reference re-checks its object once committed: the
+    last scan sharing that photo may have been deleted meanwhile.
+    """
+    await asyncio.gather(*(upload.stored() for upload in uploads))
+    first = [upload for upload in uploads if image_store.retain(db, upload.key, len(upload.data))]
+    db.commit()
+    for upload in first:
+        await image_store.write(upload.key, upload.data)
+
+
+async def discard_uploads(db: Session, *uploads: SavedUpload) -> None:
+    """Delete uploads whose scans were never committed, once their writes have finished."""
+    for upload in uploads:
+        with contextlib.suppress(Exception):
+            await upload.stored()
+        await image_store.discard(db, upload.key)
+
 
-    # Validate file
-    validate_image(file)
+@contextlib.asynccontextmanager
+async def discard_on_failure(db: Session, *uploads: SavedUpload) -> AsyncIterator[None]:
+    """Discard the uploads if the block fails before ``commit_with_uploads`` has counted them."""
+    try:
+        yield
+    except Exception:
+        db.rollback()
+        await discard_uploads(db, *uploads)
+        raise
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE / (1024 * 1024)}MB"
+    )
+
+
+async def save_upload_file(file: UploadFile) -> SavedUpload:
+    """
+    Stream an uploaded image in, decode it once and store its derivative.
+
+    The request body was already capped before parsing (see
+    ``app.middleware.body_limit``); here the spooled upload is read
+    ``UPLOAD_CHUNK_SIZE`` bytes at a time into a temp file and hashed as it
+    goes. Non-images are rejected from their first chunk and files over
+    ``MAX_UPLOAD_SIZE`` as soon as they pass it, before anything is decoded
+    or stored. A single decode on the image pool then produces both the
+    resized JPEG that is stored and the vision payload, which is returned
+    in memory. The stored copy is
+    content-addressed and written in the background, unless the same photo
+    is already stored. Nothing is counted against it until the scan that
+    holds it is committed.
+    """
+    logger.info(f"Starting file upload for: {file.filename}")
 
     # Create uploads directory if it doesn't exist
     upload_dir = Path(settings.UPLOAD_DIR)
     upload_dir.mkdir(parents=True, exist_ok=True)
-    logger.debug(f"Upload directory: {upload_dir.absolute()}")
 
-    # Generate unique filename
-    file_ext = file.filename.split(".")[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = upload_dir / unique_filename
-    logger.info(f"Saving to: {file_path}")
+    chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+    file_ext = validate_image(chunk)
 
-    # Read file content
-    content = await file.read()
-    logger.debug(f"Read {len(content)} bytes")
+    digest = hashlib.sha256()
+    size = 0
+    # Removed on exit; the image pool reopens it by name meanwhile
+    with tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", suffix=".part") as tmp:
+        while chunk:
+            size += len(chunk)
+            if size > settings.MAX_UPLOAD_SIZE:
+                metrics.incr("uploads.rejected_too_large")
+                raise _too_large()
+            digest.update(chunk)
+            tmp.write(chunk)
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        tmp.flush()
+        tmp_path = Path(tmp.name)
 
-    # Check file size
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE / (1024 * 1024)}MB"
-        )
+        # Decode once, in a worker process; it's CPU-bound and would hold the GIL
+        processed = await image_pool.run(process_image, tmp_path)
+        if processed.derivative is None:
+            # Couldn't decode it (e.g. HEIC without a plugin): keep the upload as it came
+            data, ext = await asyncio.to_thread(tmp_path.read_bytes), file_ext
+        else:
+            data, ext = processed.derivative, "jpg"
 
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
-    logger.info("File saved successfully!")
+    metrics.observe("uploads.bytes", size)
+    record_vision_payload(processed.vision, size)
 
-    # Optimize/compress image in a thread to avoid blocking the event loop
-    try:
-        import asyncio
-        await asyncio.to_thread(optimize_image, file_path)
-        logger.debug("Image optimized successfully!")
-    except Exception as e:
-        logger.warning(f"Could not optimize image: {e}")
+    key = content_key(data, ext)
+    write = asyncio.create_task(image_store.write(key, data))
+    logger.info(f"Saved {size} bytes as {key} (upload sha256 {digest.hexdigest()[:12]})")
+
+    return SavedUpload(
+        key=key,
+        size=size,
+        sha256=digest.hexdigest(),
+        vision=processed.vision.jpeg,
+        data=data,
+        write=write,
+    )
 
-    # Return relative path (just the filename)
-    return unique_filename
 
+@dataclass(frozen=True)
+class ProcessedImage:
+    """What one decode of an upload yields: the JPEG to store (None if undecodable) and the vision payload."""
+    derivative: bytes | None
+    vision: "VisionPayload"
 
-def optimize_image(file_path: Path, max_size: tuple = (1920, 1920), quality: int = 85) -> None:
+
+def _decode_for_display(img: Image.Image, max_size: tuple, draft: bool) -> Image.Image:
+    scale = min(max_size[0] / img.size[0], max_size[1] / img.size[1])
+    if draft and img.format == "JPEG" and scale < 1:
+        # Ask for the thumbnail's own size, not the bounding box, or a
+        # portrait photo never qualifies for a smaller DCT scale
+        img.draft(img.mode, (round(img.size[0] * scale), round(img.size[1] * scale)))
+
+    img = _to_rgb(img)
+    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img
+
+
+def process_image(
+    source_path: Path, max_size: tuple = (1920, 1920), quality: int = 85, draft: bool = True
+) -> ProcessedImage:
     """
-    Optimize image by resizing and compressing.
+    Decode an upload once and derive everything from that decode: the resized
+    JPEG to store and the smaller JPEG for the vision model.
+
+    JPEGs are decoded with ``Image.draft`` at the smallest DCT scale that is
+    still at least the target size, so a 12MP phone photo is decoded at 1/2
+    or 1/4 resolution instead of in full before resampling. Runs on the image
+    process pool.
     """
     try:
-        with Image.open(file_path) as img:
-            # Convert RGBA to RGB if necessary
-            if img.mode in ("RGBA", "LA", "P"):
-                background = Image.new("RGB", img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-                img = background
-
-            # Resize if larger than max_size
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-            # Save with optimization
-            img.save(file_path, optimize=True, quality=quality)
+        with Image.open(source_path) as img:
+            display = _decode_for_display(img, max_size, draft)
+            buffer = io.BytesIO()
+            display.save(buffer, format="JPEG", quality=quality, optimize=True)
+            return ProcessedImage(derivative=buffer.getvalue(), vision=prepare_vision_image(display))
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing image: {str(e)}"
-        ) from e
+        logger.warning(f"Could not decode image, storing and sending it as uploaded: {e}")
+        return ProcessedImage(derivative=None, vision=raw_vision_payload(source_path.read_bytes()))
+
+
+async def load_vision_image(image_path: str) -> bytes:
+    """Prepare a stored upload for the vision model (retries, and workers in other processes)."""
+    data = await image_store.read(image_path)
+    payload = await image_pool.run(prepare_vision_payload, data)
+    record_vision_payload(payload, len(data))
+    return payload.jpeg
 
 
-def delete_image(file_path: str) -> None:
-    """Delete an image file safely."""
+async def delete_image(db: Session, image_path: str) -> None:
+    """Drop a scan's reference to its stored image, and commit."""
     try:
         # Validate path to prevent directory traversal attacks
-        if not validate_image_path(file_path):
-            logger.warning(f"Invalid image path rejected: {file_path}")
+        if not validate_image_path(image_path):
+            logger.warning(f"Invalid image path rejected: {image_path}")
             return
 
-        full_path = Path(settings.UPLOAD_DIR) / file_path
+        if await image_store.release(db, image_path):
+            from app.services.derivatives import derivative_cache
+            derivative_cache.purge(image_path)
+        logger.info(f"Released image: {image_path}")
+    except Exception as e:
+        logger.warning(f"Could not delete image {image_path}: {e}")
 
-        # Additional security: ensure resolved path is still within upload directory
-        upload_dir = Path(settings.UPLOAD_DIR).resolve()
-        resolved_path = full_path.resolve()
-        if not str(resolved_path).startswith(str(upload_dir)):
-            logger.warning(f"Path traversal attempt blocked: {file_path}")
-            return
 
-        if resolved_path.exists():
-            resolved_path.unlink()
-            logger.info(f"Deleted image: {file_path}")
+def perceptual_hash(image_bytes: bytes, hash_size: int = 8) -> int | None:
+    """
+    Compute a 64-bit difference hash (dHash) of an image.
+
+    Visually similar images (re-encoded, slightly shifted, resized) produce
+    hashes that differ in only a few bits. Returns None if the image can't be decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+            pixels = small.tobytes()
     except Exception as e:
-        logger.warning(f"Could not delete image {file_path}: {e}")
+        logger.warning(f"Could not compute perceptual hash: {e}")
+        return None
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+@dataclass(frozen=True)
+class VisionPayload:
+    """A JPEG prepared for the vision model."""
+    jpeg: bytes
+    width: int
+    height: int
+    quality: int
+
+    @property
+    def base64_image(self) -> str:
+        return base64.b64encode(self.jpeg).decode("ascii")
+
+    @property
+    def jpeg_bytes(self) -> int:
+        return len(self.jpeg)
+
+    @property
+    def payload_bytes(self) -> int:
+        return base64_length(len(self.jpeg))
+
+
+def base64_length(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def prepare_vision_image(
+    img: Image.Image,
+    max_dimension: int | None = None,
+    quality: int | None = None,
+    max_payload_bytes: int | None = None,
+) -> VisionPayload:
+    """
+    Downscale and JPEG-encode a decoded image for the vision model, in memory.
+
+    Starts at ``max_dimension``/``quality`` and, while the base64 payload is
+    over ``max_payload_bytes``, lowers quality (down to 50) and then resolution.
+    """
+    max_dimension = max_dimension or settings.VISION_IMAGE_MAX_DIMENSION
+    quality = quality or settings.VISION_IMAGE_QUALITY
+    max_payload_bytes = max_payload_bytes or settings.VISION_IMAGE_MAX_PAYLOAD_BYTES
+
+    rgb = _to_rgb(img)
+    while True:
+        scaled = rgb
+        if max(rgb.size) > max_dimension:
+            scaled = rgb.copy()
+            scaled.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        scaled.save(buffer, format="JPEG", quality=quality, optimize=True)
+        jpeg = buffer.getvalue()
+
+        if base64_length(len(jpeg)) <= max_payload_bytes or max_dimension <= 256:
+            return VisionPayload(jpeg=jpeg, width=scaled.width, height=scaled.height, quality=quality)
+        if quality > 50:
+            quality = max(50, quality - 10)
+        else:
+            max_dimension = int(max_dimension * 0.75)
+
+
+def raw_vision_payload(image_bytes: bytes) -> VisionPayload:
+    """Bytes Pillow can't decode, sent to the model as they are."""
+    return VisionPayload(jpeg=image_bytes, width=0, height=0, quality=0)
+
+
+def prepare_vision_payload(image_bytes: bytes) -> VisionPayload:
+    """Decode image bytes and prepare them for the vision model. Undecodable bytes are sent as-is."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return prepare_vision_image(img)
+    except Exception as e:
+        logger.warning(f"Could not prepare image for vision model, sending original: {e}")
+        return raw_vision_payload(image_bytes)
+
+
+def crop_vision_payloads(image_bytes: bytes, boxes: list[tuple[float, float, float, float]]) -> list[VisionPayload]:
+    """
+    Cut regions out of an image, decoded once, and prepare each for the
+    vision model. Boxes are (left, top, right, bottom) as fractions of the
+    image size. Runs on the image process pool.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        rgb = _to_rgb(img)
+        width, height = rgb.size
+        return [
+            prepare_vision_image(rgb.crop((
+                round(left * width), round(top * height), round(right * width), round(bottom * height)
+            )))
+            for left, top, right, bottom in boxes
+        ]
+
+
+def record_vision_payload(payload: VisionPayload, source_bytes: int) -> None:
+    """Record the payload size (in the API process; the payload may come from a pool worker)."""
+    metrics.observe("vision.payload_bytes", payload.payload_bytes)
+    metrics.incr("vision.source_bytes", source_bytes)
+    metrics.incr("vision.sent_bytes", payload.jpeg_bytes)
+    logger.info(
+        f"Vision payload {payload.width}x{payload.height} q{payload.quality}: "
+        f"{payload.payload_bytes / 1024:.0f} KiB base64 (source {source_bytes / 1024:.0f} KiB)"
+    )
@@ -0,0 +1,82 @@
+import asyncio
+import multiprocessing
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ImageProcessPool:
+    """
+    Worker processes for CPU-bound image work (decode, resample, encode).
+
+    Pillow releases the GIL for only part of that work, so on threads
+    concurrent uploads largely take turns on one core. With
+    IMAGE_PROCESS_WORKERS > 0 the work runs in that many processes, started
+    lazily on first use and stopped by the application lifespan; with 0 it
+    falls back to a thread. Functions and arguments must be picklable.
+    """
+
+    def __init__(self):
+        self._executor: ProcessPoolExecutor | None = None
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.IMAGE_PROCESS_WORKERS > 0
+
+    def _ensure_started(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the server process has threads (and an event loop) that must not be copied
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started image process pool ({settings.IMAGE_PROCESS_WORKERS} workers)")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            if self.enabled:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._ensure_started(), fn, *args)
+            else:
+                result = await asyncio.to_thread(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a decompression bomb); start fresh next time
+            logger.error("Image process pool broke; restarting it on next use")
+            self.shutdown()
+            self.failed += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.completed += 1
+        metrics.observe("images.process_seconds", time.perf_counter() - start)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": settings.IMAGE_PROCESS_WORKERS,
+            "running": self._executor is not None,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+image_pool = ImageProcessPool()
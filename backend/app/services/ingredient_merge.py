@@ -0,0 +1,54 @@
+from collections.abc import Iterable
+
+from app.services.recipe_dedup import canonical_ingredient
+
+
+def merge_ingredients(detections: Iterable[list[dict]]) -> list[dict]:
+    """
+    Merge ingredient lists detected in several images of one fridge.
+
+    Ingredients are matched by canonical name ("Tomatoes" == "tomato"). Each
+    keeps its most confident detection's name and quantity, and counts the
+    images it was seen in as ``sources``. Ordered by confidence.
+    """
+    merged: dict[str, dict] = {}
+    for ingredients in detections:
+        seen = set()
+        for ingredient in ingredients or []:
+            key = canonical_ingredient(ingredient.get("name", ""))
+            if not key:
+                continue
+            best = merged.get(key)
+            # Listed twice in one image still counts as one source
+            sources = (best["sources"] if best else 0) + (key not in seen)
+            seen.add(key)
+            if best is None or (ingredient.get("confidence") or 0) > (best.get("confidence") or 0):
+                best = ingredient
+            merged[key] = {**best, "sources": sources}
+
+    return sorted(merged.values(), key=lambda i: i.get("confidence") or 0, reverse=True)
+
+
+def combine_crop_detections(detections: Iterable[list[dict]]) -> list[dict]:
+    """
+    Combine ingredient lists detected in overlapping crops of one image.
+
+    Ingredients are matched by canonical name and keep the most confident
+    detection's name and quantity. Their confidence is aggregated across
+    crops as a noisy-OR (1 - prod(1 - c)), so an item several crops agree on
+    outranks one glimpsed once. Ordered by confidence.
+    """
+    best: dict[str, dict] = {}
+    missed: dict[str, float] = {}
+    for ingredients in detections:
+        for ingredient in ingredients or []:
+            key = canonical_ingredient(ingredient.get("name", ""))
+            if not key:
+                continue
+            confidence = min(max(ingredient.get("confidence") or 0.0, 0.0), 1.0)
+            missed[key] = missed.get(key, 1.0) * (1.0 - confidence)
+            if key not in best or confidence > (best[key].get("confidence") or 0):
+                best[key] = ingredient
+
+    combined = [{**best[key], "confidence": round(1.0 - missed[key], 3)} for key in best]
+    return sorted(combined, key=lambda i: i["confidence"], reverse=True)
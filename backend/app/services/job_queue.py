@@ -0,0 +1,210 @@
+from collections.abc import Callable, Coroutine, Iterable
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Query, Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.job import Job, utcnow
+from app.services.resilience import backoff_delay
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PermanentJobError(Exception):
+    """A job that can never succeed (e.g. its inputs were deleted); fail it without retrying."""
+
+
+# Job kind -> coroutine run by the worker; returns the job's JSON result
+JobHandler = Callable[[Session, Job], Coroutine[Any, Any, dict | None]]
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of ``kind``."""
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def get_handler(kind: str) -> JobHandler | None:
+    return _handlers.get(kind)
+
+
+def registered_kinds() -> list[str]:
+    return sorted(_handlers)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    user_id: str | None = None,
+    max_attempts: int | None = None,
+) -> Job:
+    """
+    Add a job to the session. It becomes visible to workers when the
+    caller commits, so it lands atomically with the rows it refers to.
+    """
+    job = Job(
+        kind=kind,
+        status="queued",
+        user_id=user_id,
+        payload=payload,
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=utcnow(),
+    )
+    db.add(job)
+    metrics.incr(f"jobs.enqueued.{kind}")
+    return job
+
+
+def claim_query(db: Session, kinds: Iterable[str]) -> Query:
+    """
+    The oldest runnable queued job, row-locked with SKIP LOCKED so concurrent
+    workers each get a different job instead of blocking on the same row.
+    """
+    return (
+        db.query(Job)
+        .filter(Job.status == "queued", Job.run_after <= utcnow(), Job.kind.in_(list(kinds)))
+        .order_by(Job.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def claim(db: Session, worker_id: str, kinds: Iterable[str], lease_seconds: float) -> Job | None:
+    """Lease the next runnable job to ``worker_id``; None if there is none."""
+    job = claim_query(db, kinds).first()
+    if job is None:
+        db.rollback()
+        return None
+
+    now = utcnow()
+    job.status = "running"
+    job.locked_by = worker_id
+    job.attempts += 1
+    job.heartbeat_at = now
+    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+    db.commit()
+    metrics.observe("jobs.claim_delay_seconds", (now - job.run_after).total_seconds())
+    return job
+
+
+def _owned(job_id: str, worker_id: str):
+    return and_(Job.id == job_id, Job.status == "running", Job.locked_by == worker_id)
+
+
+def heartbeat(db: Session, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """Extend a running job's lease. False if the worker no longer owns it."""
+    now = utcnow()
+    updated = (
+        db.query(Job)
+        .filter(_owned(job_id, worker_id))
+        .update(
+            {Job.heartbeat_at: now, Job.lease_expires_at: now + timedelta(seconds=lease_seconds)},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return bool(updated)
+
+
+def complete(db: Session, job_id: str, worker_id: str, result: dict | None) -> bool:
+    """Record success. False if the lease was lost and the job belongs to someone else now."""
+    now = utcnow()
+    updated = (
+        db.query(Job)
+        .filter(_owned(job_id, worker_id))
+        .update(
+            {
+                Job.status: "succeeded",
+                Job.result: result,
+                Job.error: None,
+                Job.locked_by: None,
+                Job.lease_expires_at: None,
+                Job.finished_at: now,
+                Job.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return bool(updated)
+
+
+def fail(
+    db: Session,
+    job_id: str,
+    worker_id: str,
+    error: str,
+    attempts: int,
+    max_attempts: int,
+    retry_after: float | None = None,
+) -> bool:
+    """Requeue a failed job with backoff, or mark it failed once its attempts are used up."""
+    now = utcnow()
+    values = {
+        Job.error: error,
+        Job.locked_by: None,
+        Job.lease_expires_at: None,
+        Job.updated_at: now,
+    }
+    if attempts < max_attempts:
+        delay = backoff_delay(
+            attempts, settings.JOB_RETRY_BACKOFF_SECONDS, settings.JOB_RETRY_BACKOFF_MAX_SECONDS, retry_after
+        )
+        values.update({Job.status: "queued", Job.run_after: now + timedelta(seconds=delay)})
+    else:
+        values.update({Job.status: "failed", Job.finished_at: now})
+
+    updated = db.query(Job).filter(_owned(job_id, worker_id)).update(values, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def requeue_expired(db: Session) -> int:
+    """
+    Return jobs whose worker stopped heartbeating (crashed, partitioned or
+    killed) to the queue; jobs already out of attempts are failed instead.
+    """
+    now = utcnow()
+    expired = and_(Job.status == "running", Job.lease_expires_at < now)
+    failed = (
+        db.query(Job)
+        .filter(expired, Job.attempts >= Job.max_attempts)
+        .update(
+            {
+                Job.status: "failed",
+                Job.error: "Worker lease expired",
+                Job.locked_by: None,
+                Job.finished_at: now,
+                Job.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    requeued = (
+        db.query(Job)
+        .filter(expired)
+        .update(
+            {
+                Job.status: "queued",
+                Job.locked_by: None,
+                Job.lease_expires_at: None,
+                Job.run_after: now,
+                Job.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if failed or requeued:
+        metrics.incr("jobs.lease_expired", failed + requeued)
+        logger.warning(f"Expired job leases: {requeued} requeued, {failed} failed")
+    return requeued
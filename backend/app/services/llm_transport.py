@@ -0,0 +1,203 @@
+"""
+Record/replay HTTP transports for the Groq client.
+
+GROQ_TRANSPORT_MODE=record forwards calls to Groq and appends every
+request/response pair to a JSONL cassette. GROQ_TRANSPORT_MODE=replay serves
+responses from that cassette without network access, with a configurable
+synthetic latency, so the scan -> recipes pipeline can be load-tested offline.
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Response headers worth keeping in a cassette (rate-limit pacing reads these)
+RECORDED_HEADERS = ("content-type", "retry-after")
+RECORDED_HEADER_PREFIX = "x-ratelimit-"
+
+
+def request_key(request: httpx.Request) -> str:
+    """Stable key for a request: method, path and canonicalized JSON body."""
+    body = request.content or b""
+    with contextlib.suppress(ValueError):
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.url.path.encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def request_model(request: httpx.Request) -> str | None:
+    try:
+        return json.loads(request.content or b"{}").get("model")
+    except ValueError:
+        return None
+
+
+class LatencyModel:
+    """
+    Synthetic latency distribution for replayed responses.
+
+    Spec strings:
+        "none"                     no added latency
+        "recorded"                 the latency measured when the cassette was recorded
+        "fixed:0.8"                always 0.8s
+        "uniform:0.5:2.0"          uniform between 0.5s and 2.0s
+        "lognormal:1.2:0.4"        median 1.2s, sigma 0.4 (long right tail, like production)
+    """
+
+    def __init__(self, spec: str = "recorded", seed: int | None = None):
+        self.spec = spec
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self._random = random.Random(seed)
+
+        expected = {"none": 0, "recorded": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid replay latency spec '{spec}'")
+
+    def sample(self, recorded: float | None = None) -> float:
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "recorded":
+            return recorded or 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._random.uniform(*self.params)
+        median, sigma = self.params
+        return self._random.lognormvariate(math.log(median), sigma)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forward requests to a real transport and append each exchange to a cassette."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, cassette_path: str | Path):
+        self.inner = inner
+        self.cassette_path = Path(cassette_path)
+        self.cassette_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        body = await response.aread()
+        latency = time.perf_counter() - start
+
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name in RECORDED_HEADERS or name.startswith(RECORDED_HEADER_PREFIX)
+        }
+        entry = {
+            "key": request_key(request),
+            "method": request.method,
+            "path": request.url.path,
+            "model": request_model(request),
+            "status": response.status_code,
+            "headers": headers,
+            "body": body.decode("utf-8", errors="replace"),
+            "latency": round(latency, 4),
+        }
+        await asyncio.to_thread(self._append, entry)
+
+        # The body is already decoded, so drop headers describing the wire encoding
+        passthrough_headers = [
+            (name, value) for name, value in response.headers.items()
+            if name not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=passthrough_headers,
+            content=body,
+            request=request,
+        )
+
+    def _append(self, entry: dict) -> None:
+        with self._lock, open(self.cassette_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serve responses from a cassette.
+
+    Requests are matched by exact key first. With ``match="model"`` a miss
+    falls back to any recorded response for the same model and path, cycling
+    through them, which lets a benchmark send fresh images/prompts.
+    """
+
+    def __init__(
+        self,
+        cassette_path: str | Path,
+        latency: LatencyModel | None = None,
+        match: str = "exact",
+    ):
+        self.latency = latency or LatencyModel("recorded")
+        self.match = match
+        self._by_key: dict[str, list[dict]] = {}
+        self._by_model: dict[tuple, list[dict]] = {}
+        self._cursor: dict[object, int] = {}
+        self.hits = 0
+        self.fallbacks = 0
+
+        with open(cassette_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._by_key.setdefault(entry["key"], []).append(entry)
+                self._by_model.setdefault((entry.get("model"), entry["path"]), []).append(entry)
+        logger.info(f"Loaded {sum(len(v) for v in self._by_key.values())} cassette entries from {cassette_path}")
+
+    def _next(self, bucket_key, entries: list[dict]) -> dict:
+        index = self._cursor.get(bucket_key, 0)
+        self._cursor[bucket_key] = index + 1
+        return entries[index % len(entries)]
+
+    def _lookup(self, request: httpx.Request) -> dict | None:
+        key = request_key(request)
+        if key in self._by_key:
+            self.hits += 1
+            return self._next(key, self._by_key[key])
+        if self.match == "model":
+            bucket = (request_model(request), request.url.path)
+            if bucket in self._by_model:
+                self.fallbacks += 1
+                return self._next(bucket, self._by_model[bucket])
+        return None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self._lookup(request)
+        if entry is None:
+            return httpx.Response(
+                404,
+                json={"error": {"message": "No cassette entry for request", "type": "replay_miss"}},
+                request=request,
+            )
+
+        delay = self.latency.sample(entry.get("latency"))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        return httpx.Response(
+            status_code=entry["status"],
+            headers=entry.get("headers", {}),
+            content=entry["body"].encode("utf-8"),
+            request=request,
+        )
@@ -0,0 +1,411 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+import httpx
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.llm_usage import LLMUsageRollup
+from app.services.prompt_builder import CHARS_PER_TOKEN
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# USD per million tokens (input, output), from Groq's published on-demand pricing
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    "meta-llama/llama-4-maverick-17b-128e-instruct": (0.20, 0.60),
+}
+
+# Upper bounds (seconds) of the latency histogram stored in each rollup row
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, float("inf"))
+
+# (endpoint, user_id) the current request's LLM calls are attributed to
+_call_context: contextvars.ContextVar[tuple[str, str]] = contextvars.ContextVar(
+    "llm_call_context", default=("unknown", "system")
+)
+# The LLM call in flight in this task, so the HTTP response hook can timestamp it
+_current_call: contextvars.ContextVar["LLMCall | None"] = contextvars.ContextVar(
+    "llm_current_call", default=None
+)
+
+
+def bind_call_context(endpoint: str, user_id: str | None) -> None:
+    """Attribute LLM calls made by the current request to an endpoint and user."""
+    _call_context.set((endpoint, user_id or "system"))
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call; 0 for models without a known price."""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def latency_bucket(seconds: float) -> int:
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(LATENCY_BUCKETS) - 1
+
+
+@dataclass
+class LLMCallRecord:
+    task: str
+    model: str
+    endpoint: str
+    user_id: str
+    outcome: str
+    queue_wait: float
+    ttfb: float
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    at: datetime
+
+
+@dataclass
+class LLMCall:
+    """Timing and token accounting for one completion, finished exactly once."""
+    task: str
+    model: str
+    endpoint: str
+    user_id: str
+    started: float = field(default_factory=time.monotonic)
+    queue_wait: float = 0.0
+    first_byte: float | None = None
+    record: LLMCallRecord | None = None
+
+    def mark_first_byte(self) -> None:
+        if self.first_byte is None:
+            self.first_byte = time.monotonic()
+
+    def finish(self, outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        if self.record is not None:
+            return
+        now = time.monotonic()
+        self.record = LLMCallRecord(
+            task=self.task,
+            model=self.model,
+            endpoint=self.endpoint,
+            user_id=self.user_id,
+            outcome=outcome,
+            queue_wait=self.queue_wait,
+            ttfb=(self.first_byte or now) - self.started - self.queue_wait,
+            latency=now - self.started,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(self.model, prompt_tokens, completion_tokens),
+            at=datetime.now(UTC).replace(tzinfo=None),
+        )
+        usage_recorder.record(self.record)
+
+
+@contextmanager
+def track_call(task: str, model: str) -> Iterator[LLMCall]:
+    """
+    Time one LLM call. The caller finishes it with an outcome and token
+    counts; a call left unfinished by an exception is recorded as an error.
+    """
+    endpoint, user_id = _call_context.get()
+    call = LLMCall(task=task, model=model or "unknown", endpoint=endpoint, user_id=user_id)
+    token = _current_call.set(call)
+    try:
+        yield call
+    except asyncio.CancelledError:
+        call.finish("cancelled")
+        raise
+    except Exception:
+        call.finish("error")
+        raise
+    finally:
+        _current_call.reset(token)
+
+
+async def mark_first_byte(response: httpx.Response) -> None:
+    """httpx response hook: response headers have arrived for the call in flight."""
+    call = _current_call.get()
+    if call is not None:
+        call.mark_first_byte()
+
+
+class InstrumentedStream:
+    """
+    Wrap a streamed completion and finish its LLMCall when the stream ends or
+    is closed. Token counts come from the final chunk's usage when Groq sends
+    it, otherwise they are estimated from the streamed text.
+    """
+
+    def __init__(self, stream, call: LLMCall, prompt_tokens_estimate: int):
+        self._stream = stream
+        self._call = call
+        self._prompt_tokens_estimate = prompt_tokens_estimate
+        self._streamed_chars = 0
+        self._usage = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Cancelled, or closed before the end because the consumer went away
+        outcome = "cancelled"
+        try:
+            async for chunk in self._stream:
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+                if usage is not None:
+                    self._usage = usage
+                for choice in chunk.choices or []:
+                    self._streamed_chars += len(getattr(choice.delta, "content", None) or "")
+                yield chunk
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self._finish(outcome)
+
+    def _finish(self, outcome: str) -> None:
+        if self._usage is not None:
+            self._call.finish(outcome, self._usage.prompt_tokens or 0, self._usage.completion_tokens or 0)
+        else:
+            self._call.finish(
+                outcome,
+                self._prompt_tokens_estimate,
+                math.ceil(self._streamed_chars / CHARS_PER_TOKEN),
+            )
+
+    async def close(self) -> None:
+        # Closing early (enough recipes received) is a normal, successful end
+        self._finish("ok")
+        await self._stream.close()
+
+    async def abandon(self) -> None:
+        """Close a stream nobody reads any more (e.g. client disconnected mid-SSE); a no-op once finished."""
+        self._finish("cancelled")
+        await self._stream.close()
+
+
+class UsageRecorder:
+    """
+    Collects finished LLM calls: updates in-process metrics immediately and
+    buffers records for batched persistence to ``llm_usage_rollups``.
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        self._lock = threading.Lock()
+        self._pending: deque[LLMCallRecord] = deque()
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.flushed = 0
+
+    def record(self, rec: LLMCallRecord) -> None:
+        metrics.incr(f"llm.calls.{rec.task}.{rec.outcome}")
+        metrics.incr("llm.tokens.prompt", rec.prompt_tokens)
+        metrics.incr("llm.tokens.completion", rec.completion_tokens)
+        metrics.incr("llm.cost_usd", rec.cost_usd)
+        metrics.observe(f"llm.{rec.task}.latency", rec.latency)
+        metrics.observe(f"llm.{rec.task}.queue_wait", rec.queue_wait)
+        metrics.observe(f"llm.{rec.task}.ttfb", rec.ttfb)
+        logger.debug(
+            f"LLM {rec.task} call model={rec.model} outcome={rec.outcome} "
+            f"queue={rec.queue_wait:.3f}s ttfb={rec.ttfb:.3f}s total={rec.latency:.3f}s "
+            f"tokens={rec.prompt_tokens}+{rec.completion_tokens} cost=${rec.cost_usd:.6f}"
+        )
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(rec)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _drain(self) -> list[LLMCallRecord]:
+        with self._lock:
+            records = list(self._pending)
+            self._pending.clear()
+        return records
+
+    def _requeue(self, records: list[LLMCallRecord]) -> None:
+        """Put records back after a failed flush, dropping the oldest beyond max_pending."""
+        with self._lock:
+            merged = records + list(self._pending)
+            overflow = max(0, len(merged) - self.max_pending)
+            self.dropped += overflow
+            self._pending = deque(merged[overflow:])
+
+    def flush(self, db: Session) -> int:
+        """Fold buffered records into hourly rollup rows. Returns the number of calls written."""
+        records = self._drain()
+        if not records:
+            return 0
+
+        groups: dict[tuple, list[LLMCallRecord]] = {}
+        for rec in records:
+            bucket = rec.at.replace(minute=0, second=0, microsecond=0)
+            groups.setdefault((bucket, rec.endpoint, rec.user_id, rec.model, rec.outcome), []).append(rec)
+
+        try:
+            # A concurrent insert of the same bucket by another worker loses the
+            # unique-constraint race; retry once and it becomes an update.
+            for attempt in range(2):
+                try:
+                    self._upsert(db, groups)
+                    db.commit()
+                    break
+                except IntegrityError:
+                    db.rollback()
+                    if attempt:
+                        raise
+        except Exception:
+            db.rollback()
+            self._requeue(records)
+            raise
+
+        self.flushed += len(records)
+        return len(records)
+
+    @staticmethod
+    def _upsert(db: Session, groups: dict[tuple, list[LLMCallRecord]]) -> None:
+        for (bucket, endpoint, user_id, model, outcome), recs in groups.items():
+            row = (
+                db.query(LLMUsageRollup)
+                .filter(
+                    LLMUsageRollup.bucket_start == bucket,
+                    LLMUsageRollup.endpoint == endpoint,
+                    LLMUsageRollup.user_id == user_id,
+                    LLMUsageRollup.model == model,
+                    LLMUsageRollup.outcome == outcome,
+                )
+                .first()
+            )
+            if row is None:
+                row = LLMUsageRollup(
+                    bucket_start=bucket, endpoint=endpoint, user_id=user_id,
+                    model=model, outcome=outcome, calls=0, prompt_tokens=0,
+                    completion_tokens=0, cost_usd=0.0, queue_wait_seconds=0.0,
+                    ttfb_seconds=0.0, latency_seconds=0.0,
+                    latency_histogram=[0] * len(LATENCY_BUCKETS),
+                )
+                db.add(row)
+
+            histogram = list(row.latency_histogram or [0] * len(LATENCY_BUCKETS))
+            for rec in recs:
+                histogram[latency_bucket(rec.latency)] += 1
+            row.latency_histogram = histogram
+            row.calls += len(recs)
+            row.prompt_tokens += sum(r.prompt_tokens for r in recs)
+            row.completion_tokens += sum(r.completion_tokens for r in recs)
+            row.cost_usd += sum(r.cost_usd for r in recs)
+            row.queue_wait_seconds += sum(r.queue_wait for r in recs)
+            row.ttfb_seconds += sum(r.ttfb for r in recs)
+            row.latency_seconds += sum(r.latency for r in recs)
+        db.flush()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "flushed": self.flushed, "dropped": self.dropped}
+
+
+def histogram_percentile(histogram: list[int], pct: float) -> float | None:
+    """Upper bound of the latency bucket holding the pct-th percentile call."""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = max(1, round(pct / 100 * total))
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            bound = LATENCY_BUCKETS[index]
+            # Report the overflow bucket by its lower edge rather than infinity
+            return bound if bound != float("inf") else LATENCY_BUCKETS[-2]
+    return None
+
+
+def usage_summary(db: Session, group_by: str = "endpoint", hours: int = 24) -> list[dict]:
+    """Cost and latency percentiles per endpoint, user or model over the last ``hours``."""
+    if group_by not in ("endpoint", "user_id", "model"):
+        raise ValueError(f"Cannot group LLM usage by '{group_by}'")
+
+    since = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=hours)
+    rows = db.query(LLMUsageRollup).filter(LLMUsageRollup.bucket_start >= since).all()
+
+    summaries: dict[str, dict] = {}
+    for row in rows:
+        key = getattr(row, group_by)
+        summary = summaries.setdefault(key, {
+            group_by: key, "calls": 0, "errors": 0, "prompt_tokens": 0,
+            "completion_tokens": 0, "cost_usd": 0.0, "_queue_wait": 0.0,
+            "_ttfb": 0.0, "_latency": 0.0, "_histogram": [0] * len(LATENCY_BUCKETS),
+        })
+        summary["calls"] += row.calls
+        if row.outcome != "ok":
+            summary["errors"] += row.calls
+        summary["prompt_tokens"] += row.prompt_tokens
+        summary["completion_tokens"] += row.completion_tokens
+        summary["cost_usd"] += row.cost_usd
+        summary["_queue_wait"] += row.queue_wait_seconds
+        summary["_ttfb"] += row.ttfb_seconds
+        summary["_latency"] += row.latency_seconds
+        for index, count in enumerate(row.latency_histogram or []):
+            summary["_histogram"][index] += count
+
+    results = []
+    for summary in summaries.values():
+        calls = summary["calls"] or 1
+        histogram = summary.pop("_histogram")
+        summary["cost_usd"] = round(summary["cost_usd"], 6)
+        summary["avg_queue_wait"] = round(summary.pop("_queue_wait") / calls, 3)
+        summary["avg_ttfb"] = round(summary.pop("_ttfb") / calls, 3)
+        summary["avg_latency"] = round(summary.pop("_latency") / calls, 3)
+        summary["p50"] = histogram_percentile(histogram, 50)
+        summary["p95"] = histogram_percentile(histogram, 95)
+        summary["p99"] = histogram_percentile(histogram, 99)
+        results.append(summary)
+    results.sort(key=lambda s: s["cost_usd"], reverse=True)
+    return results
+
+
+def _flush_with_new_session() -> int:
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return usage_recorder.flush(db)
+    finally:
+        db.close()
+
+
+async def flush_pending() -> None:
+    """Persist buffered records, logging (not raising) on failure."""
+    if not usage_recorder.pending():
+        return
+    try:
+        written = await asyncio.to_thread(_flush_with_new_session)
+        logger.debug(f"Flushed {written} LLM usage records")
+    except Exception as e:
+        logger.warning(f"Failed to flush LLM usage records: {e}")
+
+
+async def run_flusher(interval: float) -> None:
+    """Background task: flush buffered usage records every ``interval`` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        await flush_pending()
+
+
+# Shared recorder instance
+usage_recorder = UsageRecorder(max_pending=settings.LLM_USAGE_MAX_PENDING)
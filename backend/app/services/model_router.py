@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar, cast
+
+from app.core.metrics import metrics, percentile
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """A model to try, and how long it may take before we escalate."""
+    name: str
+    timeout: float
+
+
+def parse_model_tiers(spec: str) -> list[ModelTier]:
+    """
+    Parse a tier list such as "llama-3.1-8b-instant:10,llama-3.3-70b-versatile:60".
+    Model names may contain colons; the timeout is taken after the last one.
+    """
+    tiers = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, timeout = part.rpartition(":")
+        if not sep:
+            raise ValueError(f"Model tier '{part}' must be in 'model:timeout_seconds' form")
+        tiers.append(ModelTier(name=name.strip(), timeout=float(timeout)))
+    if not tiers:
+        raise ValueError("At least one model tier is required")
+    return tiers
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile summaries."""
+
+    def __init__(self, window: int = 500):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        return percentile(sorted(self._samples), pct)
+
+    def summary(self) -> dict:
+        ordered = sorted(self._samples)
+        return {
+            "samples": len(ordered),
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+        }
+
+
+class ModelRouter:
+    """
+    Try models in order, escalating to the next tier when one times out
+    (exceeds its latency SLO), returns malformed JSON, or fails validation.
+
+    Other errors (rate limits, open circuit, auth) propagate immediately:
+    a bigger model would not fix them. ``on_timeout`` is told about every
+    SLO miss, so a slow upstream can be reported as overloaded.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        tiers: list[ModelTier],
+        on_timeout: Callable[[ModelTier], None] | None = None,
+    ):
+        self.task = task
+        self.tiers = tiers
+        self.on_timeout = on_timeout
+        self.latency: dict[str, LatencyTracker] = {tier.name: LatencyTracker() for tier in tiers}
+        self.decisions: dict[str, int] = {}
+
+    def _record(self, tier: ModelTier, outcome: str, elapsed: float) -> None:
+        self.latency.setdefault(tier.name, LatencyTracker()).record(elapsed)
+        key = f"{tier.name}:{outcome}"
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        metrics.incr(f"router.{self.task}.{outcome}")
+
+    async def run(
+        self,
+        call: Callable[[ModelTier], Awaitable[T]],
+        validate: Callable[[T], bool] | None = None,
+    ) -> T:
+        last_error: Exception | None = None
+        low_quality_result: T | None = None
+        has_low_quality_result = False
+
+        for position, tier in enumerate(self.tiers):
+            is_last = position == len(self.tiers) - 1
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call(tier), timeout=tier.timeout)
+            except TimeoutError:
+                self._record(tier, "timeout", time.monotonic() - start)
+                if self.on_timeout is not None:
+                    self.on_timeout(tier)
+                last_error = TimeoutError(f"{tier.name} exceeded its {tier.timeout:.0f}s SLO")
+                logger.warning(f"[{self.task}] {last_error}; escalating")
+                continue
+            except json.JSONDecodeError as e:
+                self._record(tier, "malformed", time.monotonic() - start)
+                last_error = e
+                logger.warning(f"[{self.task}] {tier.name} returned malformed output; escalating")
+                continue
+
+            elapsed = time.monotonic() - start
+            if validate is not None and not validate(result) and not is_last:
+                self._record(tier, "low_quality", elapsed)
+                low_quality_result, has_low_quality_result = result, True
+                logger.info(f"[{self.task}] {tier.name} output failed quality check; escalating")
+                continue
+
+            self._record(tier, "ok", elapsed)
+            if position > 0:
+                logger.info(f"[{self.task}] served by fallback tier {tier.name}")
+            return result
+
+        # Every tier failed; a low-quality answer beats no answer
+        if has_low_quality_result:
+            return cast(T, low_quality_result)
+        raise last_error or RuntimeError(f"No model tiers configured for {self.task}")
+
+    def stats(self) -> dict:
+        return {
+            "tiers": [{"model": t.name, "timeout": t.timeout} for t in self.tiers],
+            "latency": {name: tracker.summary() for name, tracker in self.latency.items()},
+            "decisions": dict(self.decisions),
+        }
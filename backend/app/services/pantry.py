@@ -0,0 +1,74 @@
+from sqlalchemy.orm import Session, load_only
+
+from app.models.pantry import PantryItem
+from app.services.categorization import categorize_ingredient
+from app.services.recipe_dedup import canonical_ingredient
+
+
+def load_pantry_ingredients(db: Session, user_id: str) -> list[dict]:
+    """The user's pantry in the ingredient format used for recipe generation."""
+    pantry_items = (
+        db.query(PantryItem)
+        .options(
+            load_only(
+                PantryItem.name,
+                PantryItem.quantity,
+                PantryItem.category,
+                PantryItem.expiry_date,
+            )
+        )
+        .filter(PantryItem.user_id == user_id)
+        .all()
+    )
+
+    return [
+        {
+            'name': item.name,
+            'quantity': item.quantity,
+            'category': item.category,
+            'expiry_date': item.expiry_date.isoformat() if item.expiry_date else None,
+        }
+        for item in pantry_items
+    ]
+
+
+def apply_scan_diff(
+    db: Session, user_id: str, diff: dict, remove_missing: bool = False
+) -> tuple[list[PantryItem], list[PantryItem], list[str]]:
+    """
+    Apply a scan's fridge-state diff to the user's pantry; the caller commits.
+
+    Added and changed items are created, or update the quantity of the
+    pantry item with the same canonical name. Removed items are deleted only
+    with ``remove_missing``, since the pantry also holds things no photo
+    shows. Unchanged items aren't touched. Returns (added, updated, removed names).
+    """
+    pantry = {}
+    for item in db.query(PantryItem).filter(PantryItem.user_id == user_id):
+        pantry.setdefault(canonical_ingredient(item.name), item)
+
+    added, updated, removed = [], [], []
+    for ingredient in diff["added"] + diff["changed"]:
+        name = ingredient.get("name", "").strip()
+        key = canonical_ingredient(name)
+        if not key:
+            continue
+        quantity = str(ingredient.get("quantity") or "some")
+        item = pantry.get(key)
+        if item is None:
+            item = PantryItem(user_id=user_id, name=name, quantity=quantity, category=categorize_ingredient(name))
+            db.add(item)
+            pantry[key] = item
+            added.append(item)
+        elif item.quantity != quantity:
+            item.quantity = quantity
+            updated.append(item)
+
+    if remove_missing:
+        for ingredient in diff["removed"]:
+            item = pantry.pop(canonical_ingredient(ingredient.get("name", "")), None)
+            if item is not None:
+                db.delete(item)
+                removed.append(item.name)
+
+    return added, updated, removed
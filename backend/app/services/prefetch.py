@@ -0,0 +1,167 @@
+import asyncio
+from collections.abc import Hashable
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services import groq_service
+from app.services.cache import TTLCache
+from app.services.llm_usage import bind_call_context
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class RecipePrefetcher:
+    """
+    Speculatively generate recipes as soon as a scan completes.
+
+    Results land in the shared recipe cache under the same key the generate
+    endpoint computes, so a later "generate" click is served instantly; a
+    click that arrives while the prefetch is still running joins it instead
+    of starting a second completion. Editing the scan or the user's
+    preferences discards the prefetch.
+    """
+
+    def __init__(self, max_inflight: int, ttl_seconds: float):
+        self.max_inflight = max_inflight
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # scan_id -> (user_id, cache key) of its prefetch, kept as long as the cached result
+        self._keys_by_scan: TTLCache[str] = TTLCache(
+            "prefetch_keys", max_entries=10000, ttl_seconds=ttl_seconds
+        )
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.joined = 0
+        self.discarded = 0
+
+    def schedule(
+        self,
+        scan_id: str,
+        user_id: str,
+        ingredients: list[dict],
+        preferences: dict | None,
+        pantry_ingredients: list[dict],
+        count: int,
+    ) -> bool:
+        """Start a background generation for a completed scan. Returns False if skipped."""
+        cache_key = groq_service.recipe_cache_key(user_id, ingredients, preferences, count, pantry_ingredients)
+        if cache_key in self._inflight or cache_key in groq_service.recipe_cache:
+            return False
+        if len(self._inflight) >= self.max_inflight:
+            metrics.incr("prefetch.skipped")
+            return False
+
+        task = asyncio.create_task(
+            self._run(scan_id, user_id, cache_key, ingredients, preferences, pantry_ingredients, count)
+        )
+        self._inflight[cache_key] = task
+        self._keys_by_scan.set(scan_id, cache_key)
+        task.add_done_callback(lambda t: self._forget(cache_key, t))
+        self.scheduled += 1
+        metrics.incr("prefetch.scheduled")
+        return True
+
+    def _forget(self, cache_key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+
+    async def _run(
+        self,
+        scan_id: str,
+        user_id: str,
+        cache_key: Hashable,
+        ingredients: list[dict],
+        preferences: dict | None,
+        pantry_ingredients: list[dict],
+        count: int,
+    ) -> list[dict] | None:
+        bind_call_context("scans.prefetch", user_id)
+        try:
+            recipes = await groq_service.generate_recipes(
+                available_ingredients=ingredients,
+                preferences=preferences,
+                count=count,
+                pantry_ingredients=pantry_ingredients,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            metrics.incr("prefetch.failed")
+            logger.warning(f"Recipe prefetch for scan {scan_id} failed: {e}")
+            return None
+
+        if recipes:
+            groq_service.recipe_cache.set(cache_key, recipes)
+        self.completed += 1
+        metrics.incr("prefetch.completed")
+        logger.info(f"Prefetched {len(recipes)} recipes for scan {scan_id}")
+        return recipes
+
+    async def join(self, cache_key: Hashable) -> list[dict] | None:
+        """Wait for an in-flight prefetch of exactly these inputs, if there is one."""
+        task = self._inflight.get(cache_key)
+        if task is None:
+            return None
+        try:
+            # Shielded: a client disconnecting must not cancel the shared work
+            recipes = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None  # discarded while we waited
+            raise
+        if recipes:
+            self.joined += 1
+            metrics.incr("prefetch.joined")
+        return recipes
+
+    def discard_scan(self, scan_id: str) -> None:
+        """Drop the prefetch for a scan whose ingredients changed or that was deleted."""
+        cache_key = self._keys_by_scan.get(scan_id)
+        if cache_key is None:
+            return
+        self._keys_by_scan.delete(scan_id)
+        self._discard(cache_key)
+
+    def discard_user(self, user_id: str) -> None:
+        """Drop every prefetch for a user, e.g. after a preference change."""
+        for scan_id in self._keys_by_scan:
+            cache_key = self._keys_by_scan.get(scan_id)
+            if cache_key is not None and cache_key[0] == user_id:
+                self._keys_by_scan.delete(scan_id)
+                self._discard(cache_key)
+
+    def _discard(self, cache_key: Hashable) -> None:
+        task = self._inflight.pop(cache_key, None)
+        if task is not None:
+            task.cancel()
+        groq_service.recipe_cache.delete(cache_key)
+        self.discarded += 1
+        metrics.incr("prefetch.discarded")
+
+    async def shutdown(self) -> None:
+        """Cancel in-flight prefetches (application shutdown)."""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.RECIPE_PREFETCH_ENABLED,
+            "in_flight": len(self._inflight),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "joined": self.joined,
+            "discarded": self.discarded,
+        }
+
+
+# Shared prefetcher instance
+recipe_prefetcher = RecipePrefetcher(
+    max_inflight=settings.RECIPE_PREFETCH_MAX_INFLIGHT,
+    ttl_seconds=settings.RECIPE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,85 @@
+import math
+from collections import OrderedDict
+from datetime import date, timedelta
+
+# Rough chars-per-token ratio for Llama-family tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate; good enough to keep prompts within a budget."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _as_date(value) -> date | None:
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def rank_ingredients(
+    ingredients: list[dict],
+    today: date | None = None,
+    expiry_horizon_days: int = 7,
+) -> list[dict]:
+    """
+    Order merged ingredients by how much they should shape the recipes.
+
+    1. Scan items (what the user just photographed): those new or changed
+       since their previous scan first, then most confident first
+    2. Pantry items expiring within ``expiry_horizon_days``, soonest first
+    3. Remaining pantry items, round-robin across categories for diversity
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=expiry_horizon_days)
+
+    scan_items = [ing for ing in ingredients if ing.get("source") != "pantry"]
+    scan_items.sort(key=lambda ing: (not ing.get("new"), -float(ing.get("confidence") or 0)))
+
+    expiring = []
+    by_category: OrderedDict[str, list[dict]] = OrderedDict()
+    for ing in ingredients:
+        if ing.get("source") != "pantry":
+            continue
+        expiry = _as_date(ing.get("expiry_date"))
+        if expiry is not None and expiry <= horizon:
+            expiring.append((expiry, ing))
+        else:
+            by_category.setdefault(ing.get("category") or "Other", []).append(ing)
+    expiring.sort(key=lambda pair: pair[0])
+
+    diverse = []
+    queues = list(by_category.values())
+    while queues:
+        for queue in queues:
+            diverse.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+
+    return scan_items + [ing for _, ing in expiring] + diverse
+
+
+def format_ingredient(ing: dict) -> str:
+    return f"{ing['name']} ({ing.get('quantity', 'some')})"
+
+
+def select_within_budget(ranked: list[dict], token_budget: int) -> list[dict]:
+    """
+    Keep ingredients in rank order until the comma-joined list would exceed
+    ``token_budget`` tokens. Always keeps at least one ingredient.
+    """
+    selected = []
+    used = 0
+    for ing in ranked:
+        cost = estimate_tokens(format_ingredient(ing) + ", ")
+        if selected and used + cost > token_budget:
+            break
+        selected.append(ing)
+        used += cost
+    return selected
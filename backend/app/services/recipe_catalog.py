@@ -0,0 +1,307 @@
+import hashlib
+import json
+import threading
+from collections.abc import Callable
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.recipe_catalog import CatalogIngredient, CatalogRecipe
+from app.services.categorization import categorize_ingredient
+from app.services.llm_usage import estimate_cost
+from app.services.prompt_builder import estimate_tokens
+from app.services.recipe_dedup import canonical_ingredient
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Assumed to be in every kitchen, so never required for coverage
+STAPLES = {
+    "salt", "pepper", "black pepper", "salt and pepper", "oil", "olive oil", "vegetable oil",
+    "cooking oil", "cooking spray", "water", "sugar", "ice",
+}
+
+# Preparation words that don't change what must be in the fridge
+DESCRIPTORS = {
+    "fresh", "large", "small", "medium", "chopped", "diced", "sliced", "minced", "grated",
+    "shredded", "whole", "optional", "raw", "cooked", "leftover", "boneless", "skinless",
+}
+
+# Allergy preference -> ingredient words that contain it
+ALLERGEN_TERMS = {
+    "dairy": {"milk", "cheese", "butter", "cream", "yogurt", "ghee", "whey"},
+    "lactose": {"milk", "cheese", "butter", "cream", "yogurt"},
+    "gluten": {"wheat", "flour", "bread", "pasta", "noodle", "couscous", "barley", "breadcrumb", "tortilla"},
+    "wheat": {"wheat", "flour", "bread", "pasta", "noodle", "couscous", "breadcrumb", "tortilla"},
+    "egg": {"egg", "mayonnaise"},
+    "nut": {"almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "nut"},
+    "tree nut": {"almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia"},
+    "peanut": {"peanut"},
+    "shellfish": {"shrimp", "prawn", "crab", "lobster", "scallop", "mussel", "clam", "oyster"},
+    "fish": {"fish", "salmon", "tuna", "cod", "anchovy", "sardine", "tilapia"},
+    "soy": {"soy", "tofu", "edamame", "tempeh", "miso"},
+    "sesame": {"sesame", "tahini"},
+}
+
+# Dietary preferences the catalog can check; any other restriction bypasses the catalog
+DIETARY_EXCLUDED_CATEGORIES = {
+    "vegetarian": {"Meat & Seafood"},
+    "vegan": {"Meat & Seafood", "Dairy & Eggs"},
+}
+DIETARY_EXCLUDED_WORDS = {"vegan": {"honey", "gelatin"}, "vegetarian": {"gelatin"}}
+
+# Candidates fetched per requested recipe, to survive allergen and duplicate filtering
+CANDIDATES_PER_RECIPE = 4
+
+
+def ingredient_key(name: str) -> str:
+    """Canonical name without preparation words: "Large Eggs" -> "egg"."""
+    return " ".join(w for w in canonical_ingredient(name).split() if w not in DESCRIPTORS)
+
+
+def available_keys(ingredients: list[dict]) -> set[str]:
+    """
+    Keys an ingredient list covers. Each ingredient also covers its last word,
+    so "cheddar cheese" satisfies a recipe that only requires "cheese".
+    """
+    keys = set()
+    for ing in ingredients:
+        key = ingredient_key(ing.get("name", ""))
+        if key:
+            keys.add(key)
+            keys.add(key.split()[-1])
+    return keys
+
+
+def required_keys(recipe: dict) -> list[str]:
+    keys = set()
+    for ing in recipe.get("ingredients") or []:
+        name = ing.get("name", "") if isinstance(ing, dict) else str(ing)
+        key = ingredient_key(name)
+        if key and key not in STAPLES:
+            keys.add(key)
+    return sorted(keys)
+
+
+def recipe_fingerprint(title: str, required: list[str]) -> str:
+    payload = json.dumps({"title": canonical_ingredient(title), "required": required})
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def excluded_terms(preferences: dict | None) -> tuple[set[str], set[str]] | None:
+    """
+    Ingredient words and categories the user's allergies and diet rule out,
+    or None if the diet includes a restriction the catalog can't verify.
+    """
+    prefs = preferences or {}
+    words, categories = set(), set()
+    for allergy in prefs.get("allergies") or []:
+        key = ingredient_key(str(allergy))
+        if key:
+            words |= ALLERGEN_TERMS.get(key, set()) | {key}
+    for diet in prefs.get("dietary") or []:
+        diet = str(diet).lower().strip()
+        if diet not in DIETARY_EXCLUDED_CATEGORIES:
+            return None
+        categories |= DIETARY_EXCLUDED_CATEGORIES[diet]
+        words |= DIETARY_EXCLUDED_WORDS.get(diet, set())
+    return words, categories
+
+
+def is_allowed(recipe: CatalogRecipe, words: set[str], categories: set[str]) -> bool:
+    names = [canonical_ingredient(recipe.title)]
+    names += [
+        canonical_ingredient(ing.get("name", "") if isinstance(ing, dict) else str(ing))
+        for ing in recipe.ingredients or []
+    ]
+    for name in names:
+        if any(term in name.split() or (" " in term and term in name) for term in words):
+            return False
+    if categories:
+        for name in names[1:]:
+            if categorize_ingredient(name) in categories:
+                return False
+    return True
+
+
+def estimated_generation_cost(recipe: dict, batch_size: int) -> float:
+    """
+    What generating this recipe would have cost: its share of a recipe prompt
+    plus its own JSON as completion tokens, priced at the top text tier.
+    """
+    from app.services.groq_service import text_router
+
+    completion_tokens = estimate_tokens(json.dumps(recipe))
+    prompt_tokens = settings.RECIPE_PROMPT_TOKEN_BUDGET // max(1, batch_size)
+    return estimate_cost(text_router.tiers[-1].name, prompt_tokens, completion_tokens)
+
+
+class RecipeCatalog:
+    """
+    Cross-user catalog of generated recipes, looked up by how much of each
+    recipe's required ingredients a fridge covers. Entries carry no user data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.served = 0
+        self.contributed = 0
+        self.saved_usd = 0.0
+
+    def lookup(
+        self,
+        db: Session,
+        ingredients: list[dict],
+        preferences: dict | None,
+        count: int,
+        exclude: Callable[[dict], bool] | None = None,
+    ) -> list[dict]:
+        """
+        Up to ``count`` catalog recipes whose required ingredients the given
+        ingredients cover (at least RECIPE_CATALOG_MIN_COVERAGE), best covered
+        first, that respect the user's allergies, diet and time limit.
+        """
+        with self._lock:
+            self.requested += count
+        metrics.incr("catalog.recipes_requested", count)
+
+        keys = available_keys(ingredients)
+        exclusions = excluded_terms(preferences)
+        if not keys or count <= 0 or exclusions is None:
+            return []
+        words, categories = exclusions
+
+        matched = (
+            db.query(CatalogIngredient.catalog_id, func.count().label("matched"))
+            .filter(CatalogIngredient.name.in_(keys))
+            .group_by(CatalogIngredient.catalog_id)
+            .subquery()
+        )
+        coverage = matched.c.matched * 1.0 / CatalogRecipe.required_count
+        query = (
+            db.query(CatalogRecipe)
+            .join(matched, CatalogRecipe.id == matched.c.catalog_id)
+            .filter(coverage >= settings.RECIPE_CATALOG_MIN_COVERAGE)
+        )
+        max_cook_time = (preferences or {}).get("max_cook_time")
+        if max_cook_time:
+            query = query.filter(or_(CatalogRecipe.cook_time.is_(None), CatalogRecipe.cook_time <= max_cook_time))
+        candidates = (
+            query.order_by(coverage.desc(), CatalogRecipe.times_served.desc(), CatalogRecipe.id)
+            .limit(count * CANDIDATES_PER_RECIPE)
+            .all()
+        )
+
+        hits = []
+        for entry in candidates:
+            if not is_allowed(entry, words, categories):
+                continue
+            draft = self._draft(entry, keys)
+            if exclude is not None and exclude(draft):
+                continue
+            entry.times_served = (entry.times_served or 0) + 1
+            hits.append(draft)
+            if len(hits) == count:
+                break
+
+        saved = sum(estimated_generation_cost(draft, count) for draft in hits)
+        with self._lock:
+            self.served += len(hits)
+            self.saved_usd += saved
+        metrics.incr("catalog.recipes_served", len(hits))
+        metrics.incr("catalog.saved_usd", saved)
+        if hits:
+            logger.info(f"Recipe catalog served {len(hits)}/{count} recipes (~${saved:.5f} saved)")
+        return hits
+
+    @staticmethod
+    def _draft(entry: CatalogRecipe, keys: set[str]) -> dict:
+        """A recipe draft for this fridge, with availability flags recomputed."""
+        ingredients = []
+        for ing in entry.ingredients or []:
+            ing = dict(ing) if isinstance(ing, dict) else {"name": str(ing)}
+            key = ingredient_key(ing.get("name", ""))
+            ing["available"] = key in keys or key in STAPLES
+            ingredients.append(ing)
+        return {
+            "title": entry.title,
+            "description": entry.description,
+            "cook_time": entry.cook_time,
+            "difficulty": entry.difficulty,
+            "servings": entry.servings,
+            "ingredients": ingredients,
+            "instructions": entry.instructions,
+        }
+
+    def contribute(self, db: Session, recipes: list[dict]) -> int:
+        """
+        Add freshly generated recipes to the catalog, stripped of anything
+        specific to the requesting user. Commits; returns the number added.
+        """
+        added = 0
+        for recipe in recipes:
+            required = required_keys(recipe)
+            if not required or not recipe.get("title") or not recipe.get("instructions"):
+                continue
+            fingerprint = recipe_fingerprint(recipe["title"], required)
+            existing = db.query(CatalogRecipe).filter(CatalogRecipe.fingerprint == fingerprint).first()
+            if existing is not None:
+                existing.contributions = (existing.contributions or 0) + 1
+                continue
+
+            entry = CatalogRecipe(
+                fingerprint=fingerprint,
+                title=recipe["title"],
+                description=recipe.get("description"),
+                cook_time=recipe.get("cook_time"),
+                difficulty=recipe.get("difficulty"),
+                servings=recipe.get("servings"),
+                # "available" describes the contributor's fridge
+                ingredients=[
+                    {k: v for k, v in ing.items() if k != "available"} if isinstance(ing, dict) else ing
+                    for ing in recipe.get("ingredients") or []
+                ],
+                instructions=recipe["instructions"],
+                required_ingredients=required,
+                required_count=len(required),
+            )
+            db.add(entry)
+            db.flush()
+            db.add_all(CatalogIngredient(catalog_id=entry.id, name=name) for name in required)
+            added += 1
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker added the same recipe first
+            db.rollback()
+            return 0
+
+        with self._lock:
+            self.contributed += added
+        metrics.incr("catalog.recipes_contributed", added)
+        return added
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.RECIPE_CATALOG_ENABLED,
+                "recipes_requested": self.requested,
+                "recipes_served": self.served,
+                "hit_rate": round(self.served / self.requested, 4) if self.requested else None,
+                "contributed": self.contributed,
+                "saved_usd": round(self.saved_usd, 6),
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requested = self.served = self.contributed = 0
+            self.saved_usd = 0.0
+
+
+# Shared catalog instance
+recipe_catalog = RecipeCatalog()
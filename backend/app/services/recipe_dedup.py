@@ -0,0 +1,198 @@
+import hashlib
+import random
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from itertools import pairwise
+
+from sqlalchemy.orm import Session, load_only
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.recipe import Recipe
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Signature length and LSH banding: 16 bands of 4 rows puts the 50% candidate
+# probability near Jaccard 0.5, so pairs at the 0.8 threshold are ~all found.
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1729)  # fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+]
+
+_STOPWORDS = {"a", "an", "and", "the", "with", "in", "of", "on", "style", "easy", "quick", "simple"}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _normalize_word(word: str) -> str:
+    # Crude singularization so "tomatoes"/"tomato" and "thighs"/"thigh" match
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _words(text: str) -> list[str]:
+    return [_normalize_word(w) for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def canonical_ingredient(name: str) -> str:
+    """Lowercase, singularized ingredient name: "Roma Tomatoes" -> "roma tomato"."""
+    return " ".join(_words(name))
+
+
+def recipe_shingles(title: str, ingredients: Iterable) -> set[str]:
+    """
+    Shingles describing a recipe: title words and word pairs, plus each
+    ingredient name. Ingredients may be dicts with a ``name`` or plain strings.
+    """
+    shingles = set()
+    title_words = _words(title or "")
+    shingles.update(f"t:{w}" for w in title_words)
+    shingles.update(f"t:{a}_{b}" for a, b in pairwise(title_words))
+    for ing in ingredients or []:
+        name = canonical_ingredient(ing.get("name", "") if isinstance(ing, dict) else str(ing))
+        if name:
+            shingles.add("i:" + name)
+    return shingles
+
+
+def minhash(shingles: set[str]) -> list[int]:
+    """MinHash signature (NUM_PERM 32-bit values) of a shingle set."""
+    if not shingles:
+        return [_MAX_HASH] * NUM_PERM
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in shingles
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def recipe_signature(recipe: dict | Recipe) -> list[int]:
+    if isinstance(recipe, Recipe):
+        return minhash(recipe_shingles(recipe.title, recipe.ingredients))
+    return minhash(recipe_shingles(recipe.get("title", ""), recipe.get("ingredients", [])))
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b, strict=True) if x == y) / NUM_PERM
+
+
+class RecipeIndex:
+    """LSH index of one user's recipe signatures."""
+
+    def __init__(self):
+        self._signatures: dict[str, list[int]] = {}
+        self._buckets: dict[tuple[int, tuple[int, ...]], set[str]] = {}
+
+    @staticmethod
+    def _bands(signature: list[int]):
+        for band in range(LSH_BANDS):
+            yield band, tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+
+    def add(self, recipe_id: str, signature: list[int]) -> None:
+        self.remove(recipe_id)
+        self._signatures[recipe_id] = signature
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(recipe_id)
+
+    def remove(self, recipe_id: str) -> None:
+        signature = self._signatures.pop(recipe_id, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(recipe_id)
+                if not bucket:
+                    del self._buckets[band]
+
+    def find_similar(self, signature: list[int], threshold: float) -> tuple[str, float] | None:
+        """Most similar indexed recipe at or above ``threshold``, if any."""
+        candidates = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get(band, set())
+
+        best = None
+        for recipe_id in candidates:
+            score = similarity(signature, self._signatures[recipe_id])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (recipe_id, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+class RecipeIndexRegistry:
+    """
+    Per-user recipe indexes, loaded from the database on first use and kept
+    up to date as recipes are inserted or deleted. Least recently used
+    indexes are evicted beyond ``max_users``.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, RecipeIndex] = OrderedDict()
+
+    def get(self, db: Session, user_id: str) -> RecipeIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self._load(db, user_id)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def _load(db: Session, user_id: str) -> RecipeIndex:
+        index = RecipeIndex()
+        rows = (
+            db.query(Recipe)
+            .options(load_only(Recipe.id, Recipe.title, Recipe.ingredients, Recipe.minhash))
+            .filter(Recipe.user_id == user_id)
+            .yield_per(500)
+        )
+        for recipe in rows:
+            index.add(recipe.id, recipe.minhash or recipe_signature(recipe))
+        metrics.incr("recipe_index.loads")
+        return index
+
+    def remove(self, user_id: str, recipe_id: str) -> None:
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(recipe_id)
+
+    def forget(self, user_id: str) -> None:
+        """Drop a user's index; it is rebuilt from the database on next use."""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+# Shared registry instance
+recipe_indexes = RecipeIndexRegistry(max_users=settings.RECIPE_DEDUP_INDEX_MAX_USERS)
@@ -0,0 +1,229 @@
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from collections.abc import Mapping
+
+from app.core.metrics import metrics
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class ServiceUnavailableError(Exception):
+    """An upstream dependency is unavailable; callers should retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def parse_duration(value: str | None) -> float | None:
+    """
+    Parse a rate-limit reset duration such as "7.66s", "2m59.56s" or "120ms".
+    Plain numbers are treated as seconds (Retry-After).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """
+    Jittered exponential delay before retrying after failed attempt ``attempt``
+    (1-based), never shorter than a Retry-After the upstream asked for.
+    """
+    delay = min(base * 2 ** (attempt - 1), cap) * random.uniform(0.8, 1.2)
+    return max(delay, retry_after or 0.0)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter.
+
+    The concurrency limit grows by roughly one slot per window of successful
+    calls (additive increase) and is multiplied by ``backoff_ratio`` whenever
+    the upstream signals overload (multiplicative decrease). Rate-limit
+    response headers pause new calls until the upstream window resets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_ratio: float = 0.5,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> float:
+        """Wait for a slot. Returns the time spent queued, in seconds."""
+        start = time.monotonic()
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self._has_capacity():
+                self.in_flight += 1
+                return time.monotonic() - start
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Woken and cancelled at once: pass the wake-up on to the next waiter
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / max(self.limit, 1))
+        self._wake()
+
+    def on_overload(self) -> None:
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        metrics.incr(f"limiter.{self.name}.backoffs")
+        logger.warning(f"{self.name} limiter backing off to {self.limit:.1f} concurrent calls")
+
+    def pause(self, seconds: float) -> None:
+        """Hold new calls for ``seconds`` (e.g. until a rate-limit window resets)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Pace calls from the upstream's rate-limit headers."""
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.pause(retry_after)
+            return
+
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                exhausted = int(float(remaining)) <= 0
+            except ValueError:
+                continue
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if exhausted and reset:
+                self.pause(reset)
+                metrics.incr(f"limiter.{self.name}.paused")
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``recovery_timeout`` seconds. It then lets a single
+    probe through (half-open); success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise ServiceUnavailableError if calls should fail fast right now."""
+        if self.state == self.CLOSED:
+            return
+
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now < self.opened_until:
+                metrics.incr(f"breaker.{self.name}.rejected")
+                raise ServiceUnavailableError(
+                    f"{self.name} is temporarily unavailable", self.opened_until - now
+                )
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self._probe_in_flight:
+            metrics.incr(f"breaker.{self.name}.rejected")
+            raise ServiceUnavailableError(f"{self.name} is recovering", self.recovery_timeout)
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """A call ended without a verdict (e.g. cancelled): let the next call probe instead."""
+        self._probe_in_flight = False
+
+    def record_failure(self, retry_after: float | None = None) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            open_for = max(self.recovery_timeout, retry_after or 0)
+            self.state = self.OPEN
+            self.opened_until = time.monotonic() + open_for
+            metrics.incr(f"breaker.{self.name}.opened")
+            logger.warning(f"{self.name} circuit opened for {open_for:.0f}s after {self.failures} failures")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after": round(max(0.0, self.opened_until - time.monotonic()), 2)
+            if self.state == self.OPEN else 0,
+        }
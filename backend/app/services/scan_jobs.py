@@ -0,0 +1,196 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field, replace
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.resilience import ServiceUnavailableError, backoff_delay
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Assumed duration of one detection until real ones have been measured
+DEFAULT_JOB_SECONDS = 5.0
+
+
+@dataclass
+class ScanJob:
+    scan_id: str
+    user_id: str
+    image_path: str
+    attempt: int = 1
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Vision-ready JPEG from the upload, so attempts don't reread it from disk
+    vision: bytes | None = field(default=None, repr=False)
+    # A batch parent: detect each of its child scans
+    batch: bool = False
+
+
+ScanHandler = Callable[[ScanJob], Awaitable[None]]
+
+
+class ScanWorkerPool:
+    """
+    Bounded in-process pool that runs scan detection off the request path.
+
+    Workers (SCAN_WORKERS) start lazily in the running event loop on the
+    first submit and are stopped by the application lifespan. The queue
+    holds at most SCAN_QUEUE_MAX_DEPTH jobs; beyond that, submissions are
+    refused with ServiceUnavailableError so the client backs off. Handlers
+    own their job's state and schedule retries with ``retry_later``.
+    """
+
+    def __init__(self, session_factory=None):
+        # Sessions for handlers; tests point this at their own database
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        self._busy = 0
+        self._mean_job_seconds = DEFAULT_JOB_SECONDS
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.retried = 0
+        self.crashed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SCAN_WORKERS > 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=settings.SCAN_QUEUE_MAX_DEPTH)
+            self._workers = [
+                asyncio.create_task(self._worker(i), name=f"scan-worker-{i}")
+                for i in range(settings.SCAN_WORKERS)
+            ]
+            logger.info(
+                f"Started {settings.SCAN_WORKERS} scan workers (queue depth {settings.SCAN_QUEUE_MAX_DEPTH})"
+            )
+        return self._queue
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def retry_after(self) -> float:
+        """Rough seconds until the queue has room again."""
+        workers = max(1, settings.SCAN_WORKERS)
+        return max(1.0, self._mean_job_seconds * (self.depth() + self._busy) / workers)
+
+    def check_capacity(self) -> None:
+        """Refuse new work up front, before an upload is persisted, when the queue is full."""
+        if self.depth() >= settings.SCAN_QUEUE_MAX_DEPTH:
+            self.rejected += 1
+            metrics.incr("scan_jobs.rejected")
+            raise ServiceUnavailableError("Too many scans in progress", retry_after=self.retry_after())
+
+    def submit(self, handler: ScanHandler, job: ScanJob) -> None:
+        queue = self._ensure_started()
+        try:
+            queue.put_nowait((handler, job))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            metrics.incr("scan_jobs.rejected")
+            raise ServiceUnavailableError(
+                "Too many scans in progress", retry_after=self.retry_after()
+            ) from None
+        self.submitted += 1
+        metrics.incr("scan_jobs.submitted")
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """
+        Delay before attempt ``attempt + 1``: exponential with jitter, at least
+        any Retry-After the upstream asked for. None once attempts are used up.
+        """
+        if attempt >= settings.SCAN_DETECTION_MAX_ATTEMPTS:
+            return None
+        return backoff_delay(
+            attempt, settings.SCAN_RETRY_BACKOFF_SECONDS, settings.SCAN_RETRY_BACKOFF_MAX_SECONDS, retry_after
+        )
+
+    def retry_later(self, handler: ScanHandler, job: ScanJob, delay: float) -> None:
+        """Queue the job's next attempt after ``delay`` seconds."""
+        retry = replace(job, attempt=job.attempt + 1)
+        task = asyncio.create_task(self._requeue(handler, retry, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+        self.retried += 1
+        metrics.incr("scan_jobs.retried")
+
+    async def _requeue(self, handler: ScanHandler, job: ScanJob, delay: float) -> None:
+        await asyncio.sleep(delay)
+        job.enqueued_at = time.monotonic()
+        # Retries wait for room rather than being refused
+        await self._ensure_started().put((handler, job))
+
+    async def _worker(self, number: int) -> None:
+        queue = self._queue
+        while True:
+            handler, job = await queue.get()
+            self._busy += 1
+            started = time.monotonic()
+            metrics.observe("scan_jobs.queue_wait_seconds", started - job.enqueued_at)
+            try:
+                await handler(job)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Handlers record their own failures; this is a bug in one
+                self.crashed += 1
+                metrics.incr("scan_jobs.crashed")
+                logger.error(f"Scan job {job.scan_id} crashed in worker {number}: {e}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                self._mean_job_seconds = 0.9 * self._mean_job_seconds + 0.1 * elapsed
+                metrics.observe("scan_jobs.run_seconds", elapsed)
+                self._busy -= 1
+                queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until queued jobs and pending retries are done (used by tests)."""
+        while self._queue is not None and (self._retries or self._queue.qsize() or self._busy):
+            await asyncio.sleep(0.01)
+
+    async def shutdown(self) -> None:
+        """Stop the workers (application shutdown). Queued jobs are dropped."""
+        dropped = self.depth() + len(self._retries)
+        tasks = self._workers + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if dropped:
+            logger.warning(f"Scan worker shutdown dropped {dropped} queued scans")
+        self._workers = []
+        self._retries.clear()
+        self._queue = None
+        self._busy = 0
+
+    def stats(self) -> dict:
+        return {
+            "workers": settings.SCAN_WORKERS,
+            "running": self._queue is not None,
+            "queue_depth": self.depth(),
+            "max_queue_depth": settings.SCAN_QUEUE_MAX_DEPTH,
+            "busy": self._busy,
+            "pending_retries": len(self._retries),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "retried": self.retried,
+            "crashed": self.crashed,
+            "mean_job_seconds": round(self._mean_job_seconds, 3),
+            "queue_wait_seconds": metrics.summary("scan_jobs.queue_wait_seconds"),
+        }
+
+
+def _default_session_factory():
+    from app.database import SessionLocal
+
+    return SessionLocal()
+
+
+# Shared pool instance
+scan_workers = ScanWorkerPool(session_factory=_default_session_factory)
@@ -0,0 +1,58 @@
+import asyncio
+import copy
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one.
+
+    The first caller for a key starts the work; callers that arrive while it
+    is still running await the same task instead of starting their own.
+    The work runs in its own task, so a cancelled caller (e.g. a client that
+    disconnected) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        else:
+            self.calls += 1
+            metrics.incr(f"singleflight.{self.name}.calls")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        result = await asyncio.shield(task)
+        # Each caller gets its own copy of the shared result
+        return copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+        }
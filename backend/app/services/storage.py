@@ -0,0 +1,344 @@
+"""
+Upload storage.
+
+Images are stored under content-addressed keys (``ab/cd/<sha256>.<ext>``), so
+identical photos are stored once however many scans upload them. A
+``stored_images`` row counts each key's references; the object is deleted
+with its last reference. Objects live on a pluggable backend: the local
+disk (UPLOAD_DIR) or any S3-compatible object store, which lets API pods
+scale out without shared disk.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import httpx
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.stored_image import StoredImage
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CONTENT_KEY_PATTERN = re.compile(r"^[a-f0-9]{2}/[a-f0-9]{2}/[a-f0-9]{64}\.[a-z0-9]+$")
+
+
+class StorageError(Exception):
+    """An object could not be read from or written to the storage backend."""
+
+
+def content_key(data: bytes, ext: str) -> str:
+    """Key for ``data``: its SHA-256, fanned out over two directory levels."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes: ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+class LocalStorage(StorageBackend):
+    """Objects as files under ``root`` (default UPLOAD_DIR), written atomically."""
+
+    def __init__(self, root: str | None = None):
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.UPLOAD_DIR)
+
+    def path(self, key: str) -> Path:
+        root = self.root.resolve()
+        path = (root / key).resolve()
+        if not path.is_relative_to(root):
+            raise StorageError(f"Key escapes storage root: {key}")
+        return path
+
+    async def put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+
+        def write() -> None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".put-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+
+        await asyncio.to_thread(write)
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return await asyncio.to_thread(self.path(key).read_bytes)
+        except FileNotFoundError as e:
+            raise StorageError(f"No such object: {key}") from e
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).exists)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.path(key).unlink, missing_ok=True)
+
+    async def close(self) -> None:
+        """Nothing to release: files are opened per call."""
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    headers: dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: datetime | None = None,
+    service: str = "s3",
+) -> dict[str, str]:
+    """
+    Sign a request with AWS Signature Version 4. Returns ``headers`` plus the
+    host, x-amz-date, x-amz-content-sha256 and Authorization headers. The
+    URL path must already be URI-encoded.
+    """
+    now = now or datetime.now(UTC)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    parts = urlsplit(url)
+
+    signed = {k.lower(): v.strip() for k, v in headers.items()}
+    signed.update({"host": parts.netloc, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+    names = sorted(signed)
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    canonical_request = "\n".join([
+        method,
+        parts.path or "/",
+        query,
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash,
+    ])
+
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = f"AWS4{secret_key}".encode()
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return signed
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, R2, ...), path-style addressing."""
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._client = http_client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=settings.S3_TIMEOUT_SECONDS)
+        return self._client
+
+    async def _request(self, method: str, key: str, body: bytes = b"", headers: dict | None = None) -> httpx.Response:
+        url = f"{self.endpoint_url}/{self.bucket}/{quote(key, safe='/')}"
+        signed = sign_v4(
+            method, url, headers or {}, hashlib.sha256(body).hexdigest(),
+            self.access_key, self.secret_key, self.region,
+        )
+        try:
+            return await self.client.request(method, url, content=body, headers=signed)
+        except httpx.HTTPError as e:
+            raise StorageError(f"{method} {key} failed: {e}") from e
+
+    @staticmethod
+    def _check(response: httpx.Response, key: str) -> None:
+        if response.status_code >= 300:
+            raise StorageError(f"{response.request.method} {key}: HTTP {response.status_code}")
+
+    async def put(self, key: str, data: bytes) -> None:
+        content_type = "image/jpeg" if key.endswith((".jpg", ".jpeg")) else "application/octet-stream"
+        self._check(await self._request("PUT", key, data, {"content-type": content_type}), key)
+
+    async def get(self, key: str) -> bytes:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            raise StorageError(f"No such object: {key}")
+        self._check(response, key)
+        return response.content
+
+    async def exists(self, key: str) -> bool:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return False
+        self._check(response, key)
+        return True
+
+    async def delete(self, key: str) -> None:
+        response = await self._request("DELETE", key)
+        if response.status_code != 404:
+            self._check(response, key)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def build_backend() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage()
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            settings.S3_ENDPOINT_URL,
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY,
+            settings.S3_SECRET_KEY,
+            settings.S3_REGION,
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND!r} (expected local or s3)")
+
+
+class ImageStore:
+    """Reference-counted, content-addressed image storage on a pluggable backend."""
+
+    def __init__(self, backend: StorageBackend | None = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> StorageBackend:
+        if self._backend is None:
+            self._backend = build_backend()
+        return self._backend
+
+    def retain(self, db: Session, key: str, size: int) -> bool:
+        """
+        Count a new reference to ``key`` in the caller's transaction. Call it
+        once the object is written, right before the commit that saves the
+        rows holding the reference, so a failed write or commit leaves no
+        reference behind. True if it is the first.
+        """
+        for _ in range(2):
+            updated = (
+                db.query(StoredImage)
+                .filter(StoredImage.key == key)
+                .update({StoredImage.refcount: StoredImage.refcount + 1}, synchronize_session=False)
+            )
+            if updated:
+                metrics.incr("storage.dedup_hits")
+                return False
+            try:
+                with db.begin_nested():
+                    db.add(StoredImage(key=key, size=size, refcount=1))
+                return True
+            except IntegrityError:
+                # Someone stored the same photo at the same moment; count ours on their row
+                pass
+        raise StorageError(f"Could not retain {key}")
+
+    async def write(self, key: str, data: bytes) -> None:
+        """Store ``data`` under ``key`` unless an identical copy is already there."""
+        if await self.backend.exists(key):
+            return
+        await self.backend.put(key, data)
+        metrics.incr("storage.bytes_written", len(data))
+
+    async def read(self, key: str) -> bytes:
+        return await self.backend.get(key)
+
+    async def release(self, db: Session, key: str) -> bool:
+        """
+        Drop one reference to ``key`` and commit. The last reference deletes
+        the row and commits before the object is deleted, so no row lock is
+        held across storage I/O. True if the object was deleted.
+        """
+        row = db.query(StoredImage).filter(StoredImage.key == key).with_for_update().first()
+        if row is None:
+            if CONTENT_KEY_PATTERN.match(key):
+                return False
+            # Uploads from before content addressing belong to a single scan
+            await self.backend.delete(key)
+            return True
+
+        row.refcount -= 1
+        if row.refcount > 0:
+            db.commit()
+            return False
+        db.delete(row)
+        db.commit()
+        return await self._delete_unreferenced(db, key)
+
+    async def discard(self, db: Session, key: str) -> bool:
+        """
+        Delete an object that was written for a scan that was never committed,
+        unless another scan references it by now. True if it was deleted.
+        """
+        if db.query(StoredImage.key).filter(StoredImage.key == key).first():
+            return False
+        return await self._delete_unreferenced(db, key)
+
+    async def _delete_unreferenced(self, db: Session, key: str) -> bool:
+        await self.backend.delete(key)
+        metrics.incr("storage.objects_deleted")
+        if db.query(StoredImage.key).filter(StoredImage.key == key).first():
+            # Stored again meanwhile. That upload re-puts the object if it finds
+            # it missing once committed, and so does any later upload of the
+            # same photo, as write() checks first
+            metrics.incr("storage.delete_races")
+            logger.warning(f"{key} was stored again while being deleted")
+            return False
+        return True
+
+    async def close(self) -> None:
+        if self._backend is not None:
+            await self._backend.close()
+
+
+image_store = ImageStore()
@@ -0,0 +1,118 @@
+"""
+Multi-crop ("tiled") ingredient detection.
+
+One vision call on a downscaled photo of a whole fridge misses small items.
+Tiled detection also sends overlapping crops of the full-size image, each
+prepared at the vision model's full resolution, and runs them concurrently
+alongside the usual full-frame call, so it costs about one round-trip more
+than single-shot detection rather than one per crop. Tiles whose detections
+come back low-confidence are re-queried once, split into four closer crops.
+Results are merged by canonical name with confidence aggregated across crops.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.image import crop_vision_payloads
+from app.services.image_pool import image_pool
+from app.services.ingredient_merge import combine_crop_detections
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# (left, top, right, bottom) as fractions of the image size
+Box = tuple[float, float, float, float]
+FULL_FRAME: Box = (0.0, 0.0, 1.0, 1.0)
+
+Detector = Callable[[bytes], Awaitable[list[dict]]]
+
+
+def tile_boxes(grid: int, overlap: float, region: Box = FULL_FRAME) -> list[Box]:
+    """
+    Split ``region`` into a ``grid`` x ``grid`` set of tiles, each grown by
+    ``overlap`` of its size (half on each side, clamped to the region) so
+    items on a seam appear whole in at least one tile.
+    """
+    left, top, right, bottom = region
+    width, height = (right - left) / grid, (bottom - top) / grid
+    pad_x, pad_y = width * overlap / 2, height * overlap / 2
+    return [
+        (
+            max(left, left + col * width - pad_x),
+            max(top, top + row * height - pad_y),
+            min(right, left + (col + 1) * width + pad_x),
+            min(bottom, top + (row + 1) * height + pad_y),
+        )
+        for row in range(grid)
+        for col in range(grid)
+    ]
+
+
+def is_low_confidence(ingredients: list[dict], threshold: float) -> bool:
+    """A crop is worth a closer look if what it found, it found unsurely. Empty crops are not."""
+    if not ingredients:
+        return False
+    confidences = [i.get("confidence") or 0.0 for i in ingredients]
+    return sum(confidences) / len(confidences) < threshold
+
+
+async def _detect_crops(image_bytes: bytes, boxes: list[Box], detect: Detector) -> list[list[dict] | BaseException]:
+    payloads = await image_pool.run(crop_vision_payloads, image_bytes, boxes)
+    for payload in payloads:
+        metrics.observe("vision.payload_bytes", payload.payload_bytes)
+    return await asyncio.gather(*(detect(payload.jpeg) for payload in payloads), return_exceptions=True)
+
+
+async def detect_tiled(
+    vision_bytes: bytes,
+    detect: Detector,
+    source: bytes | None = None,
+    grid: int | None = None,
+    overlap: float | None = None,
+    requery_below: float | None = None,
+) -> list[dict]:
+    """
+    Detect ingredients in the full frame (``vision_bytes``, the prepared
+    payload) and in overlapping crops of ``source`` (the full-size image;
+    defaults to ``vision_bytes``), all concurrently. Failed crops are
+    skipped; raises only if every call failed.
+    """
+    grid = grid or settings.VISION_TILE_GRID
+    overlap = settings.VISION_TILE_OVERLAP if overlap is None else overlap
+    requery_below = settings.VISION_TILE_REQUERY_CONFIDENCE if requery_below is None else requery_below
+    source = source or vision_bytes
+
+    boxes = tile_boxes(grid, overlap)
+    full_frame, tiles = await asyncio.gather(
+        detect(vision_bytes),
+        _detect_crops(source, boxes, detect),
+        return_exceptions=True,
+    )
+    if isinstance(tiles, BaseException):
+        # Couldn't decode the source: the full frame is all there is
+        logger.warning(f"Could not crop image for tiled detection: {tiles}")
+        boxes, tiles = [], []
+    results = [full_frame, *tiles]
+
+    low = [box for box, result in zip(boxes, tiles, strict=True) if not isinstance(result, BaseException)
+           and is_low_confidence(result, requery_below)]
+    if low:
+        closer = [sub for box in low for sub in tile_boxes(2, overlap, box)]
+        results += await _detect_crops(source, closer, detect)
+
+    detections = [result for result in results if not isinstance(result, BaseException)]
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if not detections:
+        raise failures[0]
+    if failures:
+        logger.warning(f"{len(failures)} of {len(results)} tiled detection calls failed: {failures[0]}")
+
+    metrics.incr("vision.tiled.calls", len(results))
+    metrics.incr("vision.tiled.requeried_tiles", len(low))
+    ingredients = combine_crop_detections(detections)
+    logger.info(
+        f"Tiled detection: {len(ingredients)} ingredients from {len(results)} calls "
+        f"({len(low)} tiles re-queried)"
+    )
+    return ingredients
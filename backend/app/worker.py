@@ -0,0 +1,227 @@
+"""
+Durable job worker.
+
+Claims queued jobs from the ``jobs`` table (SELECT ... FOR UPDATE SKIP LOCKED),
+runs them with a heartbeated lease and records the outcome. Any number of
+worker processes can run side by side; a job whose worker dies is handed to
+another once its lease expires.
+
+Usage (from backend/):
+    python -m app.worker
+    python -m app.worker --concurrency 16 --kinds scan.detect
+    python -m app.worker --once   # drain the queue, then exit
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import time
+import uuid
+from collections.abc import Callable
+from typing import cast
+
+from sqlalchemy.orm import Session
+
+# Endpoint modules register their job handlers on import
+import app.api.v1.endpoints.recipes  # noqa: F401
+import app.api.v1.endpoints.scans  # noqa: F401
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.job import Job
+from app.services import groq_service, llm_usage
+from app.services.job_queue import (
+    PermanentJobError,
+    claim,
+    complete,
+    fail,
+    get_handler,
+    heartbeat,
+    registered_kinds,
+    requeue_expired,
+)
+from app.services.resilience import ServiceUnavailableError
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _default_session_factory() -> Session:
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+class JobWorker:
+    """Runs up to ``concurrency`` jobs at a time from one process."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = _default_session_factory,
+        concurrency: int | None = None,
+        kinds: list[str] | None = None,
+        poll_interval: float | None = None,
+        lease_seconds: float | None = None,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.kinds = kinds or registered_kinds()
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; running ones are finished first."""
+        self._stop.set()
+
+    async def run_one(self) -> bool:
+        """Claim and run a single job. False if nothing was runnable."""
+        db = self.session_factory()
+        try:
+            job = claim(db, self.worker_id, self.kinds, self.lease_seconds)
+            if job is None:
+                return False
+            await self._execute(db, job)
+            return True
+        finally:
+            db.close()
+
+    async def run_until_idle(self) -> int:
+        """Run jobs one after another until none are runnable; returns how many ran."""
+        ran = 0
+        while await self.run_one():
+            ran += 1
+        return ran
+
+    async def run(self) -> None:
+        """Process jobs until stopped (SIGTERM/SIGINT)."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+
+        logger.info(
+            f"Worker {self.worker_id} started: concurrency={self.concurrency}, kinds={', '.join(self.kinds)}"
+        )
+        await asyncio.gather(*(self._slot() for _ in range(self.concurrency)), self._reaper())
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _execute(self, db: Session, job: Job) -> None:
+        job_id, kind = cast(str, job.id), cast(str, job.kind)
+        attempts, max_attempts = cast(int, job.attempts), cast(int, job.max_attempts)
+        handler = get_handler(kind)
+        if handler is None:
+            fail(db, job_id, self.worker_id, f"No handler for job kind {kind!r}", attempts, attempts)
+            return
+
+        started = time.monotonic()
+        task = asyncio.create_task(handler(db, job))
+        keep_alive = asyncio.create_task(self._keep_alive(job_id, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not keep_alive.done():
+                raise
+            # The lease was lost; whoever holds the job now owns its outcome
+            logger.warning(f"Job {job_id} ({kind}) abandoned after losing its lease")
+            metrics.incr("jobs.lease_lost")
+            return
+        except Exception as e:
+            db.rollback()
+            retry_after = e.retry_after if isinstance(e, ServiceUnavailableError) else None
+            limit = attempts if isinstance(e, PermanentJobError) else max_attempts
+            fail(db, job_id, self.worker_id, str(e), attempts, limit, retry_after)
+            if attempts < limit:
+                metrics.incr(f"jobs.retried.{kind}")
+                logger.warning(f"Job {job_id} ({kind}) attempt {attempts} failed, will retry: {e}")
+            else:
+                metrics.incr(f"jobs.failed.{kind}")
+                logger.error(f"Job {job_id} ({kind}) failed after {attempts} attempts: {e}")
+            return
+        finally:
+            keep_alive.cancel()
+            await asyncio.gather(keep_alive, return_exceptions=True)
+
+        if complete(db, job_id, self.worker_id, result):
+            metrics.incr(f"jobs.succeeded.{kind}")
+            metrics.observe(f"jobs.run_seconds.{kind}", time.monotonic() - started)
+        else:
+            logger.warning(f"Job {job_id} ({kind}) finished after its lease was taken over")
+
+    async def _keep_alive(self, job_id: str, task: asyncio.Task) -> None:
+        """Extend the lease while the job runs; cancel the job if another worker took it over."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            db = self.session_factory()
+            try:
+                owned = heartbeat(db, job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+                continue
+            finally:
+                db.close()
+            if not owned:
+                task.cancel()
+                return
+
+    async def _slot(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = await self.run_one()
+            except Exception as e:
+                logger.error(f"Worker slot error: {e}")
+                ran = False
+            if not ran:
+                await self._idle(self.poll_interval)
+
+    async def _reaper(self) -> None:
+        """Return jobs from dead workers to the queue."""
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                requeue_expired(db)
+            except Exception as e:
+                logger.error(f"Lease reaper error: {e}")
+            finally:
+                db.close()
+            await self._idle(self.lease_seconds / 2)
+
+    async def _idle(self, seconds: float) -> None:
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._stop.wait(), seconds)
+
+
+async def serve(worker: JobWorker, once: bool) -> None:
+    await groq_service.init_client()
+    flusher = None
+    if settings.LLM_USAGE_FLUSH_SECONDS > 0:
+        flusher = asyncio.create_task(llm_usage.run_flusher(settings.LLM_USAGE_FLUSH_SECONDS))
+    try:
+        if once:
+            ran = await worker.run_until_idle()
+            logger.info(f"Queue drained: {ran} jobs run")
+        else:
+            await worker.run()
+    finally:
+        if flusher is not None:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            await llm_usage.flush_pending()
+        await groq_service.close_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--kinds", help=f"comma-separated job kinds (default: {', '.join(registered_kinds())})")
+    parser.add_argument("--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="run until the queue is empty, then exit")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",")] if args.kinds else None
+    worker = JobWorker(concurrency=args.concurrency, kinds=kinds, poll_interval=args.poll_interval)
+    asyncio.run(serve(worker, args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: concurrent recipe generation through the old thread-pool path vs the
+native AsyncGroq path.
+
+Each concurrent call asks for recipes from different ingredients, so none
+are coalesced or served from the recipe cache; a last column shows the same
+number of identical calls, which single-flight collapses into one. The async
+path runs on a single model tier with a limiter slot per call, so every
+request is exactly one upstream call.
+
+No network access is needed - both clients talk to an in-process fake of the
+Groq chat-completions API that sleeps for a fixed latency before answering.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_groq_concurrency --concurrency 16 64 128 --latency 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+from collections.abc import Iterator
+
+import httpx
+from groq import Groq
+
+from app.services import groq_service
+from app.services.model_router import ModelTier
+from app.services.resilience import AdaptiveLimiter
+
+MODEL = "llama-3.3-70b-versatile"
+# Complete enough to pass the router's quality gate, so no call escalates
+FAKE_RECIPES = {
+    "recipes": [{
+        "title": "Benchmark Omelette",
+        "ingredients": ["eggs", "cheddar cheese"],
+        "instructions": ["Whisk the eggs.", "Cook with the cheese."],
+    }]
+}
+
+
+def fake_completion_body(model: str = MODEL) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(FAKE_RECIPES)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 200, "completion_tokens": 300, "total_tokens": 500},
+    }
+
+
+class SlowSyncTransport(httpx.BaseTransport):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return httpx.Response(200, json=fake_completion_body())
+
+
+class SlowAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        return httpx.Response(200, json=fake_completion_body())
+
+
+INGREDIENTS = [{"name": "eggs", "quantity": "6"}, {"name": "cheddar cheese", "quantity": "1 block"}]
+
+
+def distinct_ingredients(index: int) -> list[dict]:
+    """The base ingredients plus one unique to this call, so its cache key is its own."""
+    return [*INGREDIENTS, {"name": f"bench herb {index}", "quantity": "1 bunch"}]
+
+
+async def run_thread_path(concurrency: int, latency: float) -> float:
+    """Previous behaviour: sync client called through asyncio.to_thread."""
+    sync_client = Groq(api_key="bench", http_client=httpx.Client(transport=SlowSyncTransport(latency)))
+
+    def call():
+        return sync_client.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": "bench"}],
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(call) for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def one_call_per_request(concurrency: int) -> Iterator[None]:
+    """
+    Measure the client, not the router or the limiter: a single model tier,
+    and a limiter slot for every concurrent call.
+    """
+    tiers, limiter = groq_service.text_router.tiers, groq_service.groq_limiter
+    groq_service.text_router.tiers = [ModelTier(MODEL, timeout=60.0)]
+    groq_service.groq_limiter = AdaptiveLimiter("bench", initial_limit=concurrency, max_limit=concurrency)
+    try:
+        yield
+    finally:
+        groq_service.text_router.tiers, groq_service.groq_limiter = tiers, limiter
+
+
+async def run_async_path(concurrency: int, latency: float, identical: bool = False) -> float:
+    """
+    Current behaviour: shared AsyncGroq client awaited on the event loop.
+    With ``identical`` every call asks for the same recipes.
+    """
+    await groq_service.close_client()
+    await groq_service.init_client(
+        http_client=httpx.AsyncClient(transport=SlowAsyncTransport(latency))
+    )
+    groq_service.recipe_cache.clear()
+    try:
+        with one_call_per_request(concurrency):
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                groq_service.generate_recipes(INGREDIENTS if identical else distinct_ingredients(i), count=1)
+                for i in range(concurrency)
+            ))
+            return time.perf_counter() - start
+    finally:
+        await groq_service.close_client()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 64, 128])
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated Groq latency (s)")
+    args = parser.parse_args()
+
+    print(
+        f"{'concurrency':>12} {'thread path (s)':>16} {'async path (s)':>15} {'speedup':>8} "
+        f"{'identical (s)':>14}"
+    )
+    for concurrency in args.concurrency:
+        thread_time = await run_thread_path(concurrency, args.latency)
+        async_time = await run_async_path(concurrency, args.latency)
+        identical_time = await run_async_path(concurrency, args.latency, identical=True)
+        print(
+            f"{concurrency:>12} {thread_time:>16.2f} {async_time:>15.2f} "
+            f"{thread_time / async_time:>7.1f}x {identical_time:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
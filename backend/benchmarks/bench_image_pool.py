@@ -0,0 +1,84 @@
+"""
+Benchmark: upload decode/resize throughput, thread path vs process pool.
+
+Runs process_image (stored derivative + vision payload) over a batch of
+phone-sized JPEGs with N uploads in flight, three ways: on threads with a
+full-resolution decode, on threads with JPEG draft decoding, and on the
+image process pool with draft decoding. Reports images/second overall and per core used.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_image_pool --images 48 --concurrency 8 --workers 4 [photo.jpg ...]
+"""
+import argparse
+import asyncio
+import functools
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.services.image import process_image
+from app.services.image_pool import image_pool
+from benchmarks.bench_vision_payload import synthetic_photo
+
+
+async def run_batch(sources: list[bytes], workdir: Path, concurrency: int, draft: bool) -> float:
+    paths = []
+    for i, source in enumerate(sources):
+        path = workdir / f"{i}.jpg"
+        path.write_bytes(source)
+        paths.append(path)
+
+    gate = asyncio.Semaphore(concurrency)
+    process = functools.partial(process_image, draft=draft)
+
+    async def one(path: Path) -> None:
+        async with gate:
+            await image_pool.run(process, path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in paths))
+    return time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    photos = [path.read_bytes() for path in args.photos] or [synthetic_photo()]
+    sources = [photos[i % len(photos)] for i in range(args.images)]
+    cpus = os.cpu_count() or 1
+    print(f"{args.images} images ({len(sources[0]) / 1024:.0f} KiB), {args.concurrency} in flight, {cpus} CPUs")
+    print(f"{'path':<22} {'seconds':>8} {'img/s':>7} {'cores':>6} {'img/s/core':>11}")
+
+    paths = [
+        ("thread, full decode", 0, False),
+        ("thread, draft decode", 0, True),
+        (f"process x{args.workers}, draft", args.workers, True),
+    ]
+    for label, workers, draft in paths:
+        settings.IMAGE_PROCESS_WORKERS = workers
+        if workers:
+            # Don't charge process start-up to the first batch
+            await image_pool.run(str)
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed = await run_batch(sources, Path(tmp), args.concurrency, draft)
+        image_pool.shutdown()
+
+        # Threads mostly serialize on the GIL; processes use up to one core each
+        cores = min(workers, args.concurrency, cpus) if workers else 1
+        rate = args.images / elapsed
+        print(f"{label:<22} {elapsed:>8.2f} {rate:>7.1f} {cores:>6} {rate / cores:>11.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("photos", nargs="*", type=Path, help="JPEGs to use (default: one synthetic 12MP photo)")
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
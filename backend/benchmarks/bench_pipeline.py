@@ -0,0 +1,216 @@
+"""
+Benchmark: end-to-end scan -> recipes load test, fully offline.
+
+Groq is replaced by a ReplayTransport serving a cassette, so runs are
+repeatable and free. Record a cassette against the real API first:
+
+    GROQ_TRANSPORT_MODE=record GROQ_CASSETTE_PATH=cassettes/groq.jsonl uvicorn app.main:app
+    # ...exercise the app (upload a few fridge photos, generate recipes)...
+
+or pass --synthesize to write a small synthetic cassette. Every virtual user
+uploads a distinct image, so requests never match the cassette exactly;
+replay falls back to any recorded response for the same model.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_pipeline --synthesize --users 20 --latency lognormal:1.2:0.5
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.core.limiter import limiter
+from app.database import Base, get_db
+from app.main import app
+from app.services import groq_service
+from app.services.model_router import parse_model_tiers
+
+CHAT_PATH = "/openai/v1/chat/completions"
+
+
+def synthesize_cassette(path: Path, latency: float = 1.0) -> None:
+    """Write one canned detection and one canned recipe response per configured model."""
+    ingredients = {"ingredients": [
+        {"name": name, "quantity": "some", "confidence": 0.9}
+        for name in ("eggs", "spinach", "cheddar", "tomatoes", "chicken breast", "rice")
+    ]}
+    recipes = {"recipes": [
+        {
+            "title": f"Synthetic Recipe {i}",
+            "description": "Benchmark recipe",
+            "cook_time": 20,
+            "difficulty": "easy",
+            "servings": 2,
+            "ingredients": [{"name": "eggs", "amount": "2", "from_fridge": True}],
+            "instructions": ["Cook it."],
+        }
+        for i in range(10)
+    ]}
+
+    entries = []
+    for models, payload in (
+        (settings.GROQ_VISION_MODELS, ingredients),
+        (settings.GROQ_TEXT_MODELS, recipes),
+    ):
+        for tier in parse_model_tiers(models):
+            body = {
+                "id": "chatcmpl-synthetic",
+                "object": "chat.completion",
+                "created": 0,
+                "model": tier.name,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": json.dumps(payload)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 500, "completion_tokens": 800, "total_tokens": 1300},
+            }
+            entries.append({
+                "key": f"synthetic-{tier.name}",
+                "method": "POST",
+                "path": CHAT_PATH,
+                "model": tier.name,
+                "status": 200,
+                "headers": {"content-type": "application/json"},
+                "body": json.dumps(body),
+                "latency": latency,
+            })
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def random_image(seed: int) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(40):
+        x, y = rng.randrange(600), rng.randrange(440)
+        image.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 40, y + 40))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def run_user(client: httpx.AsyncClient, user: int, recipe_count: int) -> dict:
+    email = f"bench-{user}-{time.time_ns()}@example.com"
+    response = await client.post("/api/v1/auth/register", json={
+        "email": email, "password": "benchpass123", "name": f"Bench {user}",
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/v1/scans",
+        files={"file": (f"fridge-{user}.jpg", random_image(user), "image/jpeg")},
+        headers=headers,
+    )
+    scan_done = time.perf_counter()
+    if response.status_code >= 400:
+        return {"ok": False, "status": response.status_code}
+
+    response = await client.post(
+        "/api/v1/recipes/generate",
+        json={"scan_id": response.json()["id"], "count": recipe_count},
+        headers=headers,
+    )
+    end = time.perf_counter()
+    return {
+        "ok": response.status_code < 400,
+        "status": response.status_code,
+        "scan": scan_done - start,
+        "recipes": end - scan_done,
+        "total": end - start,
+    }
+
+
+def summarize(label: str, samples: list[float]) -> str:
+    if not samples:
+        return f"{label:>8}: no samples"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * len(ordered)) - 1)]
+    return (
+        f"{label:>8}: p50 {statistics.median(ordered):6.2f}s  p95 {p95:6.2f}s  "
+        f"max {ordered[-1]:6.2f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=settings.GROQ_CASSETTE_PATH)
+    parser.add_argument("--synthesize", action="store_true", help="write a synthetic cassette first")
+    parser.add_argument("--latency", default="recorded", help="replay latency spec (see LatencyModel)")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--recipes", type=int, default=3, help="recipes requested per scan")
+    args = parser.parse_args()
+
+    cassette = Path(args.cassette)
+    if args.synthesize:
+        synthesize_cassette(cassette)
+
+    settings.GROQ_TRANSPORT_MODE = "replay"
+    settings.GROQ_CASSETTE_PATH = str(cassette)
+    settings.GROQ_REPLAY_LATENCY = args.latency
+    settings.GROQ_REPLAY_MATCH = "model"
+    limiter.enabled = False
+    # Detect inline (201 with a completed scan): the worker pool would use the real
+    # database and the timings would stop at the 202
+    settings.SCAN_WORKERS = 0
+    settings.JOB_QUEUE_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.UPLOAD_DIR = str(Path(workdir) / "uploads")
+        engine = create_engine(
+            f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        await groq_service.init_client()
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300
+            ) as client:
+                start = time.perf_counter()
+                results = await asyncio.gather(
+                    *(run_user(client, user, args.recipes) for user in range(args.users))
+                )
+                wall = time.perf_counter() - start
+        finally:
+            await groq_service.close_client()
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+    ok = [r for r in results if r["ok"]]
+    failures = [r["status"] for r in results if not r["ok"]]
+    print(f"users {args.users}  latency {args.latency}  wall clock {wall:.2f}s  "
+          f"throughput {len(ok) / wall:.2f} pipelines/s")
+    print(summarize("scan", [r["scan"] for r in ok]))
+    print(summarize("recipes", [r["recipes"] for r in ok]))
+    print(summarize("total", [r["total"] for r in ok]))
+    if failures:
+        print(f"failures: {len(failures)} (status codes {sorted(set(failures))})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Benchmark: wall-clock latency of generating N recipes in one completion vs
+fanned out across concurrent smaller completions.
+
+The fake Groq API models serial output-token generation: each response takes
+``ttfb + recipes_requested * per_recipe`` seconds.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_recipe_fanout --counts 3 6 10 --widths 1 2 3 5
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import httpx
+
+from app.services import groq_service
+
+REQUESTED = re.compile(r"Create (\d+) diverse recipes")
+
+
+class SerialOutputTransport(httpx.AsyncBaseTransport):
+    def __init__(self, ttfb: float, per_recipe: float):
+        self.ttfb = ttfb
+        self.per_recipe = per_recipe
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        call_number = self.calls
+        body = json.loads(request.content)
+        prompt = body["messages"][0]["content"]
+        requested = int(REQUESTED.search(prompt).group(1))
+        await asyncio.sleep(self.ttfb + requested * self.per_recipe)
+
+        recipes = [
+            {"title": f"Recipe {call_number}-{i}", "ingredients": [], "instructions": []}
+            for i in range(requested)
+        ]
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"recipes": recipes})},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 300, "completion_tokens": 250 * requested, "total_tokens": 0},
+        })
+
+
+INGREDIENTS = [{"name": "chicken thighs", "quantity": "4"}, {"name": "rice", "quantity": "1 bag"}]
+
+
+async def time_generation(count: int, width: int, ttfb: float, per_recipe: float) -> tuple[float, int]:
+    groq_service.settings.RECIPE_FANOUT_WIDTH = width
+    transport = SerialOutputTransport(ttfb, per_recipe)
+    await groq_service.close_client()
+    await groq_service.init_client(http_client=httpx.AsyncClient(transport=transport))
+    try:
+        start = time.perf_counter()
+        recipes = await groq_service.generate_recipes(INGREDIENTS, count=count)
+        return time.perf_counter() - start, len(recipes)
+    finally:
+        await groq_service.close_client()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[3, 6, 10])
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--ttfb", type=float, default=0.3, help="simulated time to first token (s)")
+    parser.add_argument("--per-recipe", type=float, default=0.8, help="simulated output time per recipe (s)")
+    args = parser.parse_args()
+
+    groq_service.settings.RECIPE_FANOUT_MIN_COUNT = 2
+    print(f"{'count':>6} {'width':>6} {'wall clock (s)':>15} {'recipes':>8} {'vs single':>10}")
+    for count in args.counts:
+        single = None
+        for width in args.widths:
+            elapsed, produced = await time_generation(count, width, args.ttfb, args.per_recipe)
+            single = single or elapsed
+            print(f"{count:>6} {width:>6} {elapsed:>15.2f} {produced:>8} {single / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
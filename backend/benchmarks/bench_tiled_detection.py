@@ -0,0 +1,146 @@
+"""
+Benchmark: single-shot vs tiled (multi-crop) ingredient detection, in recall
+per second of wall-clock time.
+
+Fully offline. Each scene is a stored-size fridge photo (1920x1440) with
+items of widely varying size, each a distinct color. A simulated vision model
+shrinks whatever it is sent to its own input resolution and "sees" the items
+that still cover enough pixels there, more confidently the larger they are,
+after a lognormal network/inference delay. Single-shot sends the usual
+vision payload; tiled mode runs the real tiling, cropping, re-query and
+merge code against the same model.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_tiled_detection --scenes 20 --items 40 --latency 1.5
+"""
+import argparse
+import asyncio
+import colorsys
+import io
+import math
+import random
+import statistics
+import time
+
+from PIL import Image
+
+from app.config import settings
+from app.services.image import prepare_vision_payload
+from app.services.image_pool import image_pool
+from app.services.tiled_detection import detect_tiled
+
+SCENE_SIZE = (1920, 1440)
+BACKGROUND = (40, 40, 40)
+
+
+def item_palette(count: int) -> list[tuple[int, int, int]]:
+    """Well-separated colors: hues around the wheel at two brightness levels."""
+    colors = []
+    for i in range(count):
+        hue = (i // 2) / math.ceil(count / 2)
+        value = 1.0 if i % 2 else 0.6
+        r, g, b = colorsys.hsv_to_rgb(hue, 0.9, value)
+        colors.append((round(r * 255), round(g * 255), round(b * 255)))
+    return colors
+
+
+def scene(seed: int, items: int) -> bytes:
+    """A shelf scene: a few large items, many small ones (log-uniform sizes)."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", SCENE_SIZE, BACKGROUND)
+    cells = math.ceil(math.sqrt(items))
+    cell_w, cell_h = SCENE_SIZE[0] // cells, SCENE_SIZE[1] // cells
+    for i, color in enumerate(item_palette(items)):
+        side = round(math.exp(rng.uniform(math.log(10), math.log(min(cell_w, cell_h) * 0.9))))
+        x = (i % cells) * cell_w + rng.randrange(cell_w - side + 1)
+        y = (i // cells) * cell_h + rng.randrange(cell_h - side + 1)
+        img.paste(color, (x, y, x + side, y + side))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class SimulatedVisionModel:
+    """Sees items covering at least ``min_pixels`` at its input resolution."""
+
+    def __init__(self, items: int, resolution: int, min_pixels: int, latency: float, seed: int = 0):
+        self.palette = item_palette(items)
+        self.resolution = resolution
+        self.min_pixels = min_pixels
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.calls = 0
+        palette_image = Image.new("P", (1, 1))
+        flat = [c for color in [BACKGROUND, *self.palette] for c in color]
+        palette_image.putpalette(flat + flat[-3:] * (256 - len(flat) // 3))
+        self.palette_image = palette_image
+
+    def _see(self, image_bytes: bytes) -> list[dict]:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((self.resolution, self.resolution), Image.Resampling.BILINEAR)
+            counts = img.quantize(palette=self.palette_image, dither=Image.Dither.NONE).histogram()
+        seen = []
+        for index, pixels in enumerate(counts[1:len(self.palette) + 1]):
+            if pixels >= self.min_pixels:
+                confidence = min(0.98, 0.4 + 0.06 * math.sqrt(pixels))
+                seen.append({"name": f"item-{index}", "quantity": "1", "confidence": round(confidence, 2)})
+        return seen
+
+    async def __call__(self, image_bytes: bytes) -> list[dict]:
+        self.calls += 1
+        seen = await asyncio.to_thread(self._see, image_bytes)
+        await asyncio.sleep(self.latency * self.rng.lognormvariate(0, 0.35))
+        return seen
+
+
+async def run(args: argparse.Namespace) -> None:
+    settings.IMAGE_PROCESS_WORKERS = args.workers
+    if args.workers:
+        await image_pool.run(str)
+    truth = {f"item-{i}" for i in range(args.items)}
+    print(
+        f"{args.scenes} scenes x {args.items} items, model input {args.resolution}px, "
+        f"median latency {args.latency:.1f}s, {settings.VISION_TILE_GRID}x{settings.VISION_TILE_GRID} tiles"
+    )
+    print(f"{'mode':<8} {'recall':>7} {'precision':>10} {'calls':>6} {'seconds':>8} {'recall/s':>9}")
+
+    for mode in ("single", "tiled"):
+        model = SimulatedVisionModel(args.items, args.resolution, args.min_pixels, args.latency)
+        recalls, precisions, seconds = [], [], []
+        for seed in range(args.scenes):
+            source = scene(seed, args.items)
+            start = time.perf_counter()
+            vision = (await image_pool.run(prepare_vision_payload, source)).jpeg
+            if mode == "single":
+                found = await model(vision)
+            else:
+                found = await detect_tiled(vision, model, source=source)
+            seconds.append(time.perf_counter() - start)
+            names = {i["name"] for i in found}
+            recalls.append(len(names & truth) / len(truth))
+            precisions.append(len(names & truth) / len(names) if names else 1.0)
+
+        recall, wall = statistics.mean(recalls), statistics.mean(seconds)
+        print(
+            f"{mode:<8} {recall:>7.1%} {statistics.mean(precisions):>10.1%} "
+            f"{model.calls / args.scenes:>6.1f} {wall:>8.2f} {recall / wall:>9.3f}"
+        )
+    image_pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--resolution", type=int, default=512, help="the model's own input resolution")
+    parser.add_argument("--min-pixels", type=int, default=16, help="pixels an item needs there to be seen")
+    parser.add_argument("--latency", type=float, default=1.5, help="median seconds per vision call")
+    parser.add_argument("--workers", type=int, default=0, help="image process pool size (0 = thread)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
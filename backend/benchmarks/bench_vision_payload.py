@@ -0,0 +1,66 @@
+"""
+Benchmark: vision payload size and encode time across resolution/quality settings.
+
+Pair the payload sizes with detection recall from a replayed or live run to
+pick VISION_IMAGE_MAX_DIMENSION and VISION_IMAGE_QUALITY.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://x SECRET_KEY=x GROQ_API_KEY=x \\
+        python -m benchmarks.bench_vision_payload photo1.jpg photo2.jpg \\
+        --dimensions 768 1024 1280 1920 --qualities 70 80 85
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.services.image import prepare_vision_image
+
+
+def synthetic_photo(size=(3024, 4032)) -> bytes:
+    """A phone-sized JPEG with enough detail that compression isn't trivial."""
+    rng = random.Random(0)
+    img = Image.new("RGB", size, (200, 200, 200))
+    for _ in range(3000):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(20, 200), rng.randrange(20, 200)
+        img.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + w, y + h))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", type=Path, help="photos to test (default: one synthetic photo)")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[768, 1024, 1280, 1920])
+    parser.add_argument("--qualities", type=int, nargs="+", default=[70, 80, 85])
+    args = parser.parse_args()
+
+    sources = [path.read_bytes() for path in args.images] or [synthetic_photo()]
+    print(f"{len(sources)} image(s), mean source size {statistics.mean(map(len, sources)) / 1024:.0f} KiB")
+    print(f"{'max side':>9} {'quality':>8} {'payload KiB':>12} {'encode ms':>10}")
+
+    for dimension in args.dimensions:
+        for quality in args.qualities:
+            sizes, timings = [], []
+            for source in sources:
+                start = time.perf_counter()
+                with Image.open(io.BytesIO(source)) as img:
+                    payload = prepare_vision_image(
+                        img, max_dimension=dimension, quality=quality, max_payload_bytes=2**40
+                    )
+                timings.append(time.perf_counter() - start)
+                sizes.append(payload.payload_bytes)
+            print(
+                f"{dimension:>9} {quality:>8} {statistics.mean(sizes) / 1024:>12.0f} "
+                f"{statistics.mean(timings) * 1000:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
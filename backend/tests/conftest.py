@@ -3,9 +3,18 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
+from app.config import settings
 from app.database import Base, get_db
+from app.core.limiter import limiter
 from app.core.security import create_access_token
 
+# Usage rollups are flushed explicitly in tests, never to the configured database
+settings.LLM_USAGE_FLUSH_SECONDS = 0
+# Scans are detected inline (201) unless a test opts into the worker pool
+settings.SCAN_WORKERS = 0
+# Uploads are resized on a thread unless a test opts into the process pool
+settings.IMAGE_PROCESS_WORKERS = 0
+
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -32,6 +41,8 @@ def client(db):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    # Rate-limit windows are per process; don't let earlier tests use up this one's quota
+    limiter.reset()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -0,0 +1,79 @@
+"""
+Local stub of the Groq chat-completions API for offline tests.
+
+Each model can be scripted with a delay, a status code and a response body
+(a string or a callable taking the request JSON). Use it in-process through
+``stub.http_client()``, or run it as a real server and point GROQ_BASE_URL at it:
+
+    uvicorn tests.groq_stub:app --port 8765
+    GROQ_BASE_URL=http://127.0.0.1:8765
+"""
+import asyncio
+import json
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class ModelBehavior:
+    content: str | Callable[[dict], str] = '{"recipes": []}'
+    delay: float = 0.0
+    status: int = 200
+
+
+@dataclass
+class GroqStub:
+    behaviors: dict[str, ModelBehavior] = field(default_factory=dict)
+    default: ModelBehavior = field(default_factory=ModelBehavior)
+    requests: list[dict] = field(default_factory=list)
+
+    def models_called(self) -> list[str]:
+        return [r["model"] for r in self.requests]
+
+    def build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/openai/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            self.requests.append(body)
+            behavior = self.behaviors.get(body["model"], self.default)
+            await asyncio.sleep(behavior.delay)
+
+            if behavior.status != 200:
+                return JSONResponse(
+                    status_code=behavior.status,
+                    content={"error": {"message": "stubbed error", "type": "stub"}},
+                )
+
+            content = behavior.content(body) if callable(behavior.content) else behavior.content
+            return {
+                "id": f"chatcmpl-stub-{len(self.requests)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": len(json.dumps(body["messages"])) // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": 0,
+                },
+            }
+
+        return app
+
+    def http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.build_app()))
+
+
+# Default instance for `uvicorn tests.groq_stub:app`
+app = GroqStub().build_app()
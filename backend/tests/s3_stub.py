@@ -0,0 +1,63 @@
+"""
+Local stand-in for an S3-compatible object store (the subset MinIO/S3 serve
+for PUT/GET/HEAD/DELETE of single objects) for offline tests.
+
+Requests must carry SigV4 credentials for the configured access key and a
+payload hash matching the body, as a real server would check. Use it
+in-process through ``stub.http_client()``, or run it as a real server:
+
+    uvicorn tests.s3_stub:app --port 9000
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://127.0.0.1:9000 S3_BUCKET=uploads \\
+        S3_ACCESS_KEY=stub S3_SECRET_KEY=stub-secret
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+
+@dataclass
+class S3Stub:
+    access_key: str = "stub"
+    buckets: set[str] = field(default_factory=lambda: {"uploads"})
+    objects: dict[tuple[str, str], bytes] = field(default_factory=dict)
+    requests: list[tuple[str, str]] = field(default_factory=list)
+
+    def build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD", "PUT", "DELETE"])
+        async def object_api(bucket: str, key: str, request: Request):
+            body = await request.body()
+            self.requests.append((request.method, key))
+
+            auth = request.headers.get("authorization", "")
+            if not auth.startswith(f"AWS4-HMAC-SHA256 Credential={self.access_key}/"):
+                return Response(status_code=403)
+            if request.headers.get("x-amz-content-sha256") != hashlib.sha256(body).hexdigest():
+                return Response(status_code=400)
+            if bucket not in self.buckets:
+                return Response(status_code=404)
+
+            if request.method == "PUT":
+                self.objects[bucket, key] = body
+                return Response(status_code=200)
+            if request.method == "DELETE":
+                self.objects.pop((bucket, key), None)
+                return Response(status_code=204)
+            if (bucket, key) not in self.objects:
+                return Response(status_code=404)
+            data = self.objects[bucket, key]
+            if request.method == "HEAD":
+                return Response(status_code=200, headers={"content-length": str(len(data))})
+            return Response(content=data, media_type="application/octet-stream")
+
+        return app
+
+    def http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.build_app()))
+
+
+# Default instance for `uvicorn tests.s3_stub:app`
+app = S3Stub().build_app()
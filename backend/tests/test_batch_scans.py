@@ -0,0 +1,150 @@
+import asyncio
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.models.job import Job
+from app.models.scan import Scan
+from app.services.ingredient_merge import merge_ingredients
+from app.worker import JobWorker
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def photo(color: str) -> tuple:
+    buffer = BytesIO()
+    Image.new("RGB", (60, 40), color=color).save(buffer, format="PNG")
+    buffer.seek(0)
+    return ("files", (f"{color}.png", buffer, "image/png"))
+
+
+def upload_batch(client, auth_headers, *colors):
+    return client.post("/api/v1/scans/batch", files=[photo(c) for c in colors], headers=auth_headers)
+
+
+def test_merge_ingredients_dedupes_by_canonical_name():
+    merged = merge_ingredients([
+        [{"name": "Tomatoes", "quantity": "3", "confidence": 0.7}, {"name": "milk", "confidence": 0.9}],
+        [{"name": "tomato", "quantity": "5", "confidence": 0.95}, {"name": "Tomato", "confidence": 0.5}],
+        [{"name": "eggs", "quantity": "6", "confidence": 0.8}],
+    ])
+
+    assert merged == [
+        {"name": "tomato", "quantity": "5", "confidence": 0.95, "sources": 2},
+        {"name": "milk", "confidence": 0.9, "sources": 1},
+        {"name": "eggs", "quantity": "6", "confidence": 0.8, "sources": 1},
+    ]
+
+
+def test_batch_scan_merges_ingredients_across_images(client, auth_headers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = [
+            [{"name": "Milk", "quantity": "1 carton", "confidence": 0.9}],
+            [{"name": "milk", "quantity": "2 cartons", "confidence": 0.8}, {"name": "Eggs", "confidence": 0.85}],
+            [{"name": "Carrots", "confidence": 0.7}],
+        ]
+        response = upload_batch(client, auth_headers, "red", "green", "blue")
+
+    assert response.status_code == 201
+    scan = response.json()
+    assert (scan["status"], scan["image_path"], scan["error"]) == ("completed", "", None)
+    assert [(i["name"], i["sources"]) for i in scan["ingredients"]] == [("Milk", 2), ("Eggs", 1), ("Carrots", 1)]
+    assert len(scan["children"]) == 3
+    assert all(child["status"] == "completed" and child["image_path"] for child in scan["children"])
+
+
+def test_batch_detections_run_concurrently_within_the_limit(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_BATCH_CONCURRENCY", 2)
+    running = peak = 0
+
+    async def slow_detect(image_bytes):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.2)
+        running -= 1
+        return [{"name": "kale", "confidence": 0.9}]
+
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image", side_effect=slow_detect):
+        started = time.monotonic()
+        response = upload_batch(client, auth_headers, "red", "green", "blue", "white")
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 201
+    assert peak == 2
+    # Two rounds of two, not four detections in a row
+    assert elapsed < 0.75
+
+
+def test_failed_images_do_not_fail_the_batch(client, auth_headers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = [[{"name": "kale", "confidence": 0.9}], Exception("vision model hiccup")]
+        scan = upload_batch(client, auth_headers, "red", "green").json()
+
+    assert scan["status"] == "completed"
+    assert scan["error"] == "1 of 2 images could not be scanned"
+    assert [i["name"] for i in scan["ingredients"]] == ["kale"]
+    assert sorted(child["status"] for child in scan["children"]) == ["completed", "failed"]
+
+
+def test_batch_fails_when_no_image_can_be_scanned(client, auth_headers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = Exception("vision model down")
+        scan = upload_batch(client, auth_headers, "red", "green").json()
+
+    assert (scan["status"], scan["error"]) == ("failed", "vision model down")
+
+
+def test_batch_is_listed_and_deleted_as_one_scan(client, db, auth_headers, upload_dir):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = []
+        scan = upload_batch(client, auth_headers, "red", "green").json()
+
+    listed = client.get("/api/v1/scans", headers=auth_headers).json()
+    assert [s["id"] for s in listed] == [scan["id"]]
+
+    assert client.delete(f"/api/v1/scans/{scan['id']}", headers=auth_headers).status_code == 204
+    assert db.query(Scan).count() == 0
+    assert not [p for p in upload_dir.rglob("*") if p.is_file()]
+
+
+def test_batch_rejects_bad_images_and_too_many_images(client, db, auth_headers, upload_dir, monkeypatch):
+    files = [photo("red"), ("files", ("notes.txt", BytesIO(b"not an image"), "text/plain"))]
+    assert client.post("/api/v1/scans/batch", files=files, headers=auth_headers).status_code == 400
+    assert db.query(Scan).count() == 0
+    assert not [p for p in upload_dir.rglob("*") if p.is_file()]
+
+    monkeypatch.setattr(settings, "SCAN_BATCH_MAX_IMAGES", 2)
+    assert upload_batch(client, auth_headers, "red", "green", "blue").status_code == 400
+
+
+def test_batch_runs_as_one_job_on_the_queue(client, db, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_ENABLED", True)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.0)
+    worker = JobWorker(session_factory=TestingSessionLocal, poll_interval=0)
+
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = [Exception("vision model hiccup"), [{"name": "kale", "confidence": 0.9}]]
+        response = upload_batch(client, auth_headers, "red")
+        assert response.status_code == 202
+        scan_id = response.json()["id"]
+        mock_detect.assert_not_called()
+
+        # The first attempt fails and the queue retries it
+        assert client.portal.call(worker.run_until_idle) == 2
+        assert mock_detect.call_count == 2
+
+    db.expire_all()
+    scan = client.get(f"/api/v1/scans/{scan_id}", headers=auth_headers).json()
+    assert (scan["status"], [i["name"] for i in scan["ingredients"]]) == ("completed", ["kale"])
+    job = db.query(Job).one()
+    assert (job.kind, job.status, job.result) == ("scan.detect_batch", "succeeded", {"ingredients": 1, "images": 1})
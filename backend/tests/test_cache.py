@@ -0,0 +1,100 @@
+import io
+
+from PIL import Image
+
+from app.services.cache import DetectionCache, TTLCache, content_hash
+from app.services.image import perceptual_hash
+
+
+def make_image_bytes(color="red", size=(64, 64), quality=90) -> bytes:
+    img = Image.new("RGB", size, color=color)
+    # Left half a different colour so the hash has some structure
+    img.paste((0, 0, 255), (0, 0, size[0] // 2, size[1]))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class TestTTLCache:
+    """Tests for the LRU + TTL cache."""
+
+    def test_get_set_and_counters(self):
+        cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+        assert cache.get("a") is None
+        cache.set("a", [{"name": "eggs"}])
+        assert cache.get("a") == [{"name": "eggs"}]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_values_are_copied(self):
+        cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+        value = [{"name": "eggs"}]
+        cache.set("a", value)
+        value[0]["name"] = "mutated"
+        cache.get("a")[0]["name"] = "mutated again"
+        assert cache.get("a") == [{"name": "eggs"}]
+
+    def test_lru_eviction(self):
+        cache = TTLCache("test", max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a is now most recently used
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_expiry(self, monkeypatch):
+        cache = TTLCache("test", max_entries=10, ttl_seconds=5)
+        now = [1000.0]
+        monkeypatch.setattr("app.services.cache.time.monotonic", lambda: now[0])
+        cache.set("a", 1)
+        now[0] += 10
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_zero_size_disables(self):
+        cache = TTLCache("test", max_entries=0, ttl_seconds=60)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestDetectionCache:
+    """Tests for content-addressed and near-duplicate detection caching."""
+
+    def test_exact_hash_hit(self):
+        cache = DetectionCache(max_entries=10, ttl_seconds=60)
+        data = make_image_bytes()
+        cache.store(content_hash(data), [{"name": "milk"}])
+        assert cache.lookup(content_hash(data)) == [{"name": "milk"}]
+
+    def test_near_duplicate_hit(self):
+        cache = DetectionCache(max_entries=10, ttl_seconds=60, max_distance=6)
+        original = make_image_bytes(quality=95)
+        reencoded = make_image_bytes(quality=60)
+        assert content_hash(original) != content_hash(reencoded)
+
+        cache.store(content_hash(original), [{"name": "milk"}], perceptual_hash(original))
+        result = cache.lookup(content_hash(reencoded), perceptual_hash(reencoded))
+
+        assert result == [{"name": "milk"}]
+        assert cache.stats()["near_hits"] == 1
+        assert cache.stats()["misses"] == 0
+
+    def test_near_duplicate_disabled_by_default(self):
+        cache = DetectionCache(max_entries=10, ttl_seconds=60)
+        original = make_image_bytes(quality=95)
+        reencoded = make_image_bytes(quality=60)
+        cache.store(content_hash(original), [{"name": "milk"}], perceptual_hash(original))
+        assert cache.lookup(content_hash(reencoded), perceptual_hash(reencoded)) is None
+
+    def test_perceptual_hash_differs_for_different_images(self):
+        a = perceptual_hash(make_image_bytes())
+        b = Image.new("RGB", (64, 64), color="white")
+        b.paste((0, 0, 0), (0, 0, 64, 32))
+        buffer = io.BytesIO()
+        b.save(buffer, format="PNG")
+        assert a != perceptual_hash(buffer.getvalue())
+
+    def test_perceptual_hash_invalid_bytes(self):
+        assert perceptual_hash(b"not an image") is None
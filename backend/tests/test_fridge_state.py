@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.models.scan import Scan
+from app.services.fridge_state import diff_ingredients, mark_new_ingredients
+from app.services.prompt_builder import rank_ingredients
+
+MONDAY = [
+    {"name": "Eggs", "quantity": "6", "confidence": 0.9},
+    {"name": "milk", "quantity": "1 carton", "confidence": 0.9},
+    {"name": "Tomatoes", "quantity": "3", "confidence": 0.8},
+]
+TUESDAY = [
+    {"name": "eggs", "quantity": "5", "confidence": 0.9},
+    {"name": "Milk", "quantity": "3 cartons", "confidence": 0.85},
+    {"name": "spinach", "quantity": "1 bag", "confidence": 0.7},
+]
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+
+def scan(client, auth_headers, ingredients, color="green", headers=None):
+    buffer = BytesIO()
+    Image.new("RGB", (40, 40), color=color).save(buffer, format="PNG")
+    buffer.seek(0)
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = ingredients
+        response = client.post(
+            "/api/v1/scans", files={"file": ("fridge.png", buffer, "image/png")}, headers=auth_headers if headers is None else headers
+        )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_diff_matches_by_name_and_ignores_quantity_noise():
+    diff = diff_ingredients(MONDAY, TUESDAY)
+
+    assert [i["name"] for i in diff["added"]] == ["spinach"]
+    assert [i["name"] for i in diff["removed"]] == ["Tomatoes"]
+    # 6 -> 5 eggs is within one quantity bucket; 1 -> 3 cartons is not
+    assert diff["changed"] == [{"name": "Milk", "quantity": "3 cartons", "previous_quantity": "1 carton"}]
+    assert diff["unchanged"] == 1
+
+
+def test_new_and_changed_items_lead_the_prompt():
+    flagged = mark_new_ingredients(TUESDAY, diff_ingredients(MONDAY, TUESDAY))
+
+    assert [i["name"] for i in rank_ingredients(flagged)] == ["Milk", "spinach", "eggs"]
+    assert mark_new_ingredients(TUESDAY, None) is TUESDAY
+
+
+def test_scan_is_diffed_against_the_previous_completed_scan(client, auth_headers):
+    first = scan(client, auth_headers, MONDAY, "red")
+    assert first["previous_scan_id"] is None
+    assert len(first["diff"]["added"]) == 3
+
+    second = scan(client, auth_headers, TUESDAY, "blue")
+
+    assert second["previous_scan_id"] == first["id"]
+    assert [i["name"] for i in second["diff"]["added"]] == ["spinach"]
+    assert [i["name"] for i in second["diff"]["removed"]] == ["Tomatoes"]
+    assert second["diff"]["unchanged"] == 1
+
+
+def test_edited_ingredients_are_rediffed(client, auth_headers):
+    first = scan(client, auth_headers, MONDAY, "red")
+    second = scan(client, auth_headers, MONDAY, "blue")
+    assert second["diff"] == {"added": [], "removed": [], "changed": [], "unchanged": 3}
+
+    response = client.put(
+        f"/api/v1/scans/{second['id']}", json={"ingredients": MONDAY + [{"name": "Butter", "quantity": 1}]},
+        headers=auth_headers,
+    )
+
+    assert response.json()["previous_scan_id"] == first["id"]
+    assert [i["name"] for i in response.json()["diff"]["added"]] == ["Butter"]
+
+
+def backdate(db, scan_id, hours):
+    db.query(Scan).filter(Scan.id == scan_id).update({Scan.created_at: datetime.now() - timedelta(hours=hours)})
+    db.commit()
+
+
+def test_later_scans_are_rediffed_when_an_earlier_one_changes(client, db, auth_headers):
+    first = scan(client, auth_headers, MONDAY, "red")
+    backdate(db, first["id"], 2)
+    second = scan(client, auth_headers, MONDAY, "green")
+    backdate(db, second["id"], 1)
+    third = scan(client, auth_headers, TUESDAY, "blue")
+    assert third["previous_scan_id"] == second["id"]
+
+    client.put(
+        f"/api/v1/scans/{second['id']}", json={"ingredients": TUESDAY}, headers=auth_headers,
+    )
+    rediffed = client.get(f"/api/v1/scans/{third['id']}", headers=auth_headers).json()
+    assert rediffed["diff"] == {"added": [], "removed": [], "changed": [], "unchanged": 3}
+
+    client.delete(f"/api/v1/scans/{second['id']}", headers=auth_headers)
+    rediffed = client.get(f"/api/v1/scans/{third['id']}", headers=auth_headers).json()
+    assert rediffed["previous_scan_id"] == first["id"]
+    assert [i["name"] for i in rediffed["diff"]["removed"]] == ["Tomatoes"]
+
+
+def test_guest_scans_are_not_diffed(client, auth_headers):
+    guest = scan(client, auth_headers, MONDAY, headers={})
+    assert guest["diff"] is None
+
+
+def test_pantry_sync_applies_only_the_changes(client, auth_headers):
+    first = scan(client, auth_headers, MONDAY, "red")
+    synced = client.post("/api/v1/pantry/sync", json={"scan_id": first["id"]}, headers=auth_headers).json()
+    assert sorted(i["name"] for i in synced["added"]) == ["Eggs", "Tomatoes", "milk"]
+
+    second = scan(client, auth_headers, TUESDAY, "blue")
+    synced = client.post(
+        "/api/v1/pantry/sync", json={"scan_id": second["id"], "remove_missing": True}, headers=auth_headers
+    ).json()
+
+    assert [i["name"] for i in synced["added"]] == ["spinach"]
+    assert [(i["name"], i["quantity"]) for i in synced["updated"]] == [("milk", "3 cartons")]
+    assert synced["removed"] == ["Tomatoes"]
+    assert synced["unchanged"] == 1
+    pantry = client.get("/api/v1/pantry", headers=auth_headers).json()["items"]
+    assert sorted((i["name"], i["quantity"]) for i in pantry) == [
+        ("Eggs", "6"), ("milk", "3 cartons"), ("spinach", "1 bag")
+    ]
+
+
+def test_full_pantry_sync_removes_what_the_scan_does_not_show(client, auth_headers):
+    client.post(
+        "/api/v1/pantry/bulk",
+        json={"items": [{"name": "Tomatoes", "quantity": "3"}, {"name": "Rice", "quantity": "1 bag"}]},
+        headers=auth_headers,
+    )
+    only = scan(client, auth_headers, TUESDAY, "blue")
+
+    synced = client.post(
+        "/api/v1/pantry/sync", json={"scan_id": only["id"], "full": True, "remove_missing": True}, headers=auth_headers
+    ).json()
+
+    assert sorted(i["name"] for i in synced["added"]) == ["Milk", "eggs", "spinach"]
+    assert sorted(synced["removed"]) == ["Rice", "Tomatoes"]
+    pantry = client.get("/api/v1/pantry", headers=auth_headers).json()["items"]
+    assert sorted(i["name"] for i in pantry) == ["Milk", "eggs", "spinach"]
+
+
+def test_pantry_sync_requires_a_completed_scan_of_your_own(client, auth_headers):
+    assert client.post("/api/v1/pantry/sync", json={"scan_id": "missing"}, headers=auth_headers).status_code == 404
+    guest = scan(client, auth_headers, MONDAY, headers={})
+    assert client.post("/api/v1/pantry/sync", json={"scan_id": guest["id"]}, headers=auth_headers).status_code == 403
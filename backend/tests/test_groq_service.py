@@ -0,0 +1,317 @@
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.services import groq_service
+from app.services.model_router import ModelRouter, ModelTier
+
+
+def completion_response(content: dict | str) -> httpx.Response:
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "llama-3.3-70b-versatile",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+    })
+
+
+@pytest_asyncio.fixture
+async def fake_groq(monkeypatch):
+    """Swap the shared AsyncGroq client for one backed by an in-process transport."""
+    # One text tier so request counts aren't affected by model escalation
+    monkeypatch.setattr(
+        groq_service, "text_router",
+        ModelRouter("text", [ModelTier("llama-3.3-70b-versatile", 60)]),
+    )
+    requests = []
+    responses = {"content": {"recipes": []}}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return completion_response(responses["content"])
+
+    await groq_service.close_client()
+    groq_service.detection_cache.clear()
+    await groq_service.init_client(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    yield requests, responses
+    await groq_service.close_client()
+
+
+class TestAsyncClientLifecycle:
+    """Tests for the shared AsyncGroq client."""
+
+    @pytest.mark.asyncio
+    async def test_init_is_idempotent_and_close_resets(self):
+        await groq_service.close_client()
+        first = await groq_service.init_client()
+        second = await groq_service.init_client()
+        assert first is second
+
+        await groq_service.close_client()
+        assert groq_service.client is None
+
+    @pytest.mark.asyncio
+    async def test_generate_recipes_awaits_shared_client(self, fake_groq):
+        requests, responses = fake_groq
+        responses["content"] = {"recipes": [{"title": "A"}, {"title": "B"}, {"title": "C"}]}
+
+        recipes = await groq_service.generate_recipes(
+            [{"name": "eggs", "quantity": "6"}], count=2
+        )
+
+        assert [r["title"] for r in recipes] == ["A", "B"]
+        assert len(requests) == 1
+        assert requests[0]["model"] == "llama-3.3-70b-versatile"
+        assert "eggs (6)" in requests[0]["messages"][0]["content"]
+
+    @pytest.mark.asyncio
+    async def test_generate_recipes_wraps_errors(self, fake_groq):
+        _, responses = fake_groq
+        responses["content"] = "{not valid json"
+
+        with pytest.raises(Exception, match="Failed to generate recipes"):
+            await groq_service.generate_recipes([{"name": "eggs"}], count=1)
+
+
+class TestDetectionCaching:
+    """Vision detection is served from cache for repeat uploads."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_upload_skips_groq(self, fake_groq):
+        requests, responses = fake_groq
+        responses["content"] = {"ingredients": [{"name": "Eggs", "quantity": 6, "confidence": 0.9}]}
+        first = await groq_service.detect_ingredients_from_image(b"same-bytes")
+        second = await groq_service.detect_ingredients_from_image(b"same-bytes")
+
+        assert first == second == [{"name": "Eggs", "quantity": "6", "confidence": 0.9}]
+        assert len(requests) == 1
+        assert groq_service.detection_cache.stats()["hits"] == 1
+
+
+    @pytest.mark.asyncio
+    async def test_prepared_image_is_sent_as_is(self, fake_groq):
+        import base64
+        import io
+
+        from PIL import Image
+
+        requests, responses = fake_groq
+        responses["content"] = {"ingredients": [{"name": "Kale"}]}
+        buffer = io.BytesIO()
+        Image.new("RGB", (512, 288), color="green").save(buffer, format="JPEG")
+
+        await groq_service.detect_ingredients_from_image(buffer.getvalue())
+
+        url = requests[0]["messages"][0]["content"][1]["image_url"]["url"]
+        assert base64.b64decode(url.split(",", 1)[1]) == buffer.getvalue()
+
+
+class TestTiledDetection:
+    """VISION_DETECTION_MODE=tiled detects overlapping crops concurrently and merges them."""
+
+    @pytest.mark.asyncio
+    async def test_full_frame_and_crops_are_detected_and_merged(self, fake_groq, monkeypatch):
+        import base64
+        import io
+
+        from PIL import Image
+
+        monkeypatch.setattr(groq_service.settings, "VISION_DETECTION_MODE", "tiled")
+        requests, responses = fake_groq
+        responses["content"] = {"ingredients": [{"name": "Milk", "quantity": "1", "confidence": 0.8}]}
+        buffer = io.BytesIO()
+        Image.effect_noise((1920, 1440), 64).convert("RGB").save(buffer, format="JPEG")
+
+        ingredients = await groq_service.detect_ingredients_from_image(b"vision-payload", source=buffer.getvalue())
+
+        # Full frame plus a 2x2 grid; confident tiles are not re-queried
+        assert len(requests) == 5
+        assert ingredients == [{"name": "Milk", "quantity": "1", "confidence": 1.0}]
+        sizes = []
+        for request in requests[1:]:
+            url = request["messages"][0]["content"][1]["image_url"]["url"]
+            with Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1]))) as crop:
+                sizes.append(crop.size)
+        # Crops of the full-size image, each at the vision model's full resolution
+        assert sizes == [(1024, 768)] * 4
+
+
+class TestCoalescing:
+    """Identical concurrent Groq requests share one call."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_generate_requests_coalesce(self, fake_groq):
+        import asyncio
+
+        requests, responses = fake_groq
+        responses["content"] = {"recipes": [{"title": "Once"}]}
+        ingredients = [{"name": "eggs", "quantity": "6"}]
+
+        results = await asyncio.gather(
+            *(groq_service.generate_recipes(ingredients, count=1) for _ in range(3))
+        )
+
+        assert all(r == [{"title": "Once"}] for r in results)
+        assert len(requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_detections_coalesce(self, fake_groq):
+        import asyncio
+
+        requests, responses = fake_groq
+        responses["content"] = {"ingredients": [{"name": "Milk"}]}
+
+        results = await asyncio.gather(
+            groq_service.detect_ingredients_from_image(b"double-tap"),
+            groq_service.detect_ingredients_from_image(b"double-tap"),
+        )
+
+        assert results[0] == results[1]
+        assert len(requests) == 1
+
+
+class TestFanout:
+    """Large recipe counts split into concurrent diverse completions."""
+
+    def test_split_count(self):
+        assert groq_service.split_count(10, 3) == [4, 3, 3]
+        assert groq_service.split_count(2, 5) == [1, 1]
+        assert groq_service.split_count(4, 1) == [4]
+
+    def test_dedupe_recipes(self):
+        recipes = [{"title": "Garlic  Chicken"}, {"title": "garlic chicken"}, {"title": "Soup"}]
+        assert groq_service.dedupe_recipes(recipes) == [{"title": "Garlic  Chicken"}, {"title": "Soup"}]
+
+    @pytest.mark.asyncio
+    async def test_large_count_fans_out_and_dedupes(self, fake_groq, monkeypatch):
+        requests, responses = fake_groq
+        monkeypatch.setattr(groq_service.settings, "RECIPE_FANOUT_WIDTH", 3)
+        monkeypatch.setattr(groq_service.settings, "RECIPE_FANOUT_MIN_COUNT", 5)
+        # Every completion returns the same titles, so only one copy of each survives
+        responses["content"] = {"recipes": [{"title": "Stir Fry"}, {"title": "Curry"}, {"title": "Stir fry"}]}
+
+        recipes = await groq_service.generate_recipes([{"name": "tofu", "quantity": "1"}], count=6)
+
+        assert len(requests) == 3
+        prompts = [r["messages"][0]["content"] for r in requests]
+        assert all("Create 2 diverse recipes" in p for p in prompts)
+        assert len(set(prompts)) == 3  # each batch has its own diversity hint
+        assert [r["title"] for r in recipes] == ["Stir Fry", "Curry"]
+
+    @pytest.mark.asyncio
+    async def test_small_count_uses_single_completion(self, fake_groq, monkeypatch):
+        requests, _ = fake_groq
+        monkeypatch.setattr(groq_service.settings, "RECIPE_FANOUT_MIN_COUNT", 5)
+        await groq_service.generate_recipes([{"name": "tofu"}], count=3)
+        assert len(requests) == 1
+
+
+class TestRecipeCacheKey:
+    """Canonical digests for the recipe generation cache."""
+
+    def test_order_case_and_quantity_noise_ignored(self):
+        a = groq_service.recipe_cache_key(
+            "u1", [{"name": "Eggs", "quantity": "6"}, {"name": "milk", "quantity": "1 carton"}], {}, 3
+        )
+        b = groq_service.recipe_cache_key(
+            "u1", [{"name": "milk ", "quantity": "1"}, {"name": "eggs", "quantity": "5 large"}], {}, 3
+        )
+        assert a == b
+
+    def test_preferences_count_and_user_change_key(self):
+        ingredients = [{"name": "eggs", "quantity": "6"}]
+        base = groq_service.recipe_cache_key("u1", ingredients, {"allergies": ["nuts"]}, 3)
+        assert base != groq_service.recipe_cache_key("u1", ingredients, {"allergies": ["dairy"]}, 3)
+        assert base != groq_service.recipe_cache_key("u1", ingredients, {"allergies": ["nuts"]}, 4)
+        assert base != groq_service.recipe_cache_key("u2", ingredients, {"allergies": ["nuts"]}, 3)
+        # Irrelevant preference fields do not affect the key
+        assert base == groq_service.recipe_cache_key(
+            "u1", ingredients, {"allergies": ["Nuts"], "theme": "dark"}, 3
+        )
+
+    def test_ingredients_new_since_the_previous_scan_change_key(self):
+        ingredients = [{"name": "eggs", "quantity": "6"}, {"name": "milk", "quantity": "1 carton"}]
+        marked = [{**ingredients[0], "new": True}, ingredients[1]]
+        assert groq_service.recipe_cache_key("u1", ingredients, {}, 3) != groq_service.recipe_cache_key(
+            "u1", marked, {}, 3
+        )
+
+    def test_bucket_quantity(self):
+        assert groq_service.bucket_quantity("a few") == "some"
+        assert groq_service.bucket_quantity(None) == "some"
+        assert groq_service.bucket_quantity("1 block") == "1"
+        assert groq_service.bucket_quantity("3") == groq_service.bucket_quantity("4")
+        assert groq_service.bucket_quantity("4") != groq_service.bucket_quantity("5")
+
+    def test_invalidate_user(self):
+        cache = groq_service.RecipeCache(max_entries=10, ttl_seconds=60)
+        cache.set(("u1", "a"), [1])
+        cache.set(("u1", "b"), [2])
+        cache.set(("u2", "a"), [3])
+        assert cache.invalidate_user("u1") == 2
+        assert cache.get(("u2", "a")) == [3]
+
+
+class TestRecipeStreamParser:
+    """Incremental extraction of recipe objects from streamed JSON."""
+
+    def test_wrapped_array_split_across_chunks(self):
+        text = '{"recipes": [{"title": "A {tricky} \\"one\\"", "steps": [1, {"x": 2}]}, {"title": "B"}]}'
+        parser = groq_service.RecipeStreamParser()
+        emitted = []
+        for i in range(0, len(text), 7):
+            emitted.extend(parser.feed(text[i:i + 7]))
+        assert [r["title"] for r in emitted] == ['A {tricky} "one"', "B"]
+
+    def test_first_object_emitted_before_stream_ends(self):
+        parser = groq_service.RecipeStreamParser()
+        assert parser.feed('[{"title": "A"}, {"tit') == [{"title": "A"}]
+        assert parser.feed('le": "B"}]') == [{"title": "B"}]
+
+
+def stream_response(chunks: list[str]) -> httpx.Response:
+    lines = []
+    for piece in chunks:
+        lines.append("data: " + json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "llama-3.3-70b-versatile",
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }) + "\n\n")
+    lines.append("data: [DONE]\n\n")
+    return httpx.Response(
+        200, headers={"content-type": "text/event-stream"}, content="".join(lines).encode()
+    )
+
+
+class TestStreamRecipes:
+    """Streaming recipe generation over the shared client."""
+
+    @pytest.mark.asyncio
+    async def test_yields_recipes_and_stops_at_count(self):
+        requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(json.loads(request.content))
+            return stream_response(['{"recipes": [{"title": "A"},', ' {"title": "B"}, {"title": "C"}]}'])
+
+        await groq_service.close_client()
+        await groq_service.init_client(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            titles = [r["title"] async for r in groq_service.stream_recipes([{"name": "eggs"}], count=2)]
+        finally:
+            await groq_service.close_client()
+
+        assert titles == ["A", "B"]
+        assert requests[0]["stream"] is True
@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import io
+import random
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from app.config import settings
+from app.services.image import (
+    load_vision_image,
+    prepare_vision_image,
+    prepare_vision_payload,
+    process_image,
+    save_upload_file,
+    sniff_image_type,
+)
+from app.services.image_pool import ImageProcessPool
+
+
+def noisy_image(size=(3000, 2000), mode="RGB") -> Image.Image:
+    """Random blocks so JPEG can't compress the image to nothing."""
+    rng = random.Random(0)
+    img = Image.new(mode, size)
+    for x in range(0, size[0], 50):
+        for y in range(0, size[1], 50):
+            fill = tuple(rng.randrange(256) for _ in range(len(mode)))
+            img.paste(fill, (x, y, x + 50, y + 50))
+    return img
+
+
+def decode(payload) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(payload.base64_image)))
+
+
+class TestVisionPayload:
+    """Images are downscaled and re-encoded in memory for the vision model."""
+
+    def test_downscales_to_max_dimension(self):
+        payload = prepare_vision_image(noisy_image(), max_dimension=1024, quality=80)
+        assert (payload.width, payload.height) == (1024, 683)
+        assert payload.quality == 80
+        assert decode(payload).size == (1024, 683)
+        assert payload.payload_bytes == len(payload.base64_image)
+
+    def test_small_images_are_not_upscaled(self):
+        payload = prepare_vision_image(noisy_image((400, 300)), max_dimension=1024, quality=80)
+        assert (payload.width, payload.height) == (400, 300)
+
+    def test_payload_cap_lowers_quality_then_resolution(self):
+        uncapped = prepare_vision_image(noisy_image(), max_dimension=1024, quality=90)
+        capped = prepare_vision_image(
+            noisy_image(), max_dimension=1024, quality=90, max_payload_bytes=uncapped.payload_bytes // 4
+        )
+        assert capped.payload_bytes <= uncapped.payload_bytes // 4
+        assert capped.quality == 50
+        assert capped.width < 1024
+
+    def test_transparent_png_is_flattened(self):
+        payload = prepare_vision_image(noisy_image((200, 200), mode="RGBA"))
+        assert decode(payload).mode == "RGB"
+
+    def test_undecodable_bytes_are_sent_as_is(self):
+        payload = prepare_vision_payload(b"not an image")
+        assert base64.b64decode(payload.base64_image) == b"not an image"
+        assert payload.width == 0
+
+
+def encoded(img: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def stored_files(root) -> list[str]:
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file())
+
+
+class TestUploadIngestion:
+    """Uploads are streamed to disk in chunks and validated from their bytes."""
+
+    @pytest.fixture(autouse=True)
+    def upload_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+        return tmp_path
+
+    @pytest.mark.parametrize("fmt, ext", [("JPEG", "jpg"), ("PNG", "png"), ("WEBP", "webp")])
+    def test_sniffs_format_from_magic_bytes(self, fmt, ext):
+        assert sniff_image_type(encoded(noisy_image((20, 20)), fmt)) == ext
+
+    def test_sniffs_heic(self):
+        assert sniff_image_type(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00") == "heic"
+        assert sniff_image_type(b"GIF89a") is None
+
+    @pytest.mark.asyncio
+    async def test_stores_derivative_and_returns_vision_payload(self, upload_dir):
+        data = encoded(noisy_image((3000, 2000)), "PNG")
+        # Misleading filename and content type don't matter
+        upload = UploadFile(io.BytesIO(data), filename="photo.gif", headers={"content-type": "text/plain"})
+
+        saved = await save_upload_file(upload)
+        await saved.stored()
+
+        assert saved.size == len(data)
+        assert saved.sha256 == hashlib.sha256(data).hexdigest()
+        assert stored_files(upload_dir) == [saved.key]
+        with Image.open(upload_dir / saved.key) as stored:
+            assert (stored.format, stored.size) == ("JPEG", (1920, 1280))
+        with Image.open(io.BytesIO(saved.vision)) as vision:
+            assert (vision.format, vision.size) == ("JPEG", (1024, 683))
+
+    @pytest.mark.asyncio
+    async def test_undecodable_image_is_kept_as_uploaded(self, upload_dir):
+        data = b"\x00\x00\x00\x18ftypheic" + b"\x00" * 500
+
+        saved = await save_upload_file(UploadFile(io.BytesIO(data), filename="fridge.heic"))
+        await saved.stored()
+
+        assert saved.key.endswith(".heic")
+        assert saved.vision == data
+        assert (upload_dir / saved.key).read_bytes() == data
+
+    @pytest.mark.asyncio
+    async def test_stored_image_can_be_reloaded_for_vision(self, upload_dir):
+        data = encoded(noisy_image((1500, 1500)), "JPEG")
+        saved = await save_upload_file(UploadFile(io.BytesIO(data), filename="a.jpg"))
+        await saved.stored()
+
+        reloaded = await load_vision_image(saved.key)
+
+        with Image.open(io.BytesIO(reloaded)) as img:
+            assert img.size == (1024, 1024)
+
+    @pytest.mark.asyncio
+    async def test_non_image_is_rejected_from_first_chunk(self, upload_dir):
+        body = io.BytesIO(b"%PDF-1.7" + b"x" * 10_000)
+        with pytest.raises(HTTPException) as exc:
+            await save_upload_file(UploadFile(body, filename="fridge.png"))
+
+        assert exc.value.status_code == 400
+        assert body.tell() == settings.UPLOAD_CHUNK_SIZE
+        assert stored_files(upload_dir) == []
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_stops_reading_at_the_limit(self, upload_dir, monkeypatch):
+        monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 4096)
+        body = io.BytesIO(b"\xff\xd8\xff\xe0" + b"x" * 100_000)
+        with pytest.raises(HTTPException) as exc:
+            await save_upload_file(UploadFile(body, filename="fridge.jpg"))
+
+        assert "too large" in exc.value.detail
+        assert body.tell() <= settings.MAX_UPLOAD_SIZE + settings.UPLOAD_CHUNK_SIZE
+        assert stored_files(upload_dir) == []
+
+
+class TestProcessImage:
+    """One decode yields both the stored derivative and the vision payload."""
+
+    def test_portrait_jpeg_is_draft_decoded_to_thumbnail_size(self, tmp_path):
+        path = tmp_path / "photo.jpg"
+        path.write_bytes(encoded(noisy_image((3024, 4032)), "JPEG"))
+
+        processed = process_image(path)
+
+        with Image.open(io.BytesIO(processed.derivative)) as img:
+            assert img.size == (1440, 1920)
+        assert (processed.vision.width, processed.vision.height) == (768, 1024)
+
+    def test_small_transparent_images_keep_their_size(self, tmp_path):
+        path = tmp_path / "photo.png"
+        path.write_bytes(encoded(noisy_image((300, 200), mode="RGBA"), "PNG"))
+
+        processed = process_image(path)
+
+        with Image.open(io.BytesIO(processed.derivative)) as img:
+            assert (img.format, img.mode, img.size) == ("JPEG", "RGB", (300, 200))
+
+    @pytest.mark.asyncio
+    async def test_process_pool_runs_image_work(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "IMAGE_PROCESS_WORKERS", 1)
+        path = tmp_path / "photo.jpg"
+        path.write_bytes(encoded(noisy_image((2400, 1800)), "JPEG"))
+        pool = ImageProcessPool()
+        try:
+            processed = await pool.run(process_image, path)
+            assert pool.stats()["running"]
+        finally:
+            pool.shutdown()
+
+        with Image.open(io.BytesIO(processed.derivative)) as img:
+            assert img.size == (1920, 1440)
+        assert pool.stats()["completed"] == 1
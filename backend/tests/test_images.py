@@ -0,0 +1,111 @@
+import asyncio
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.derivatives import derivative_cache
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def key(client, auth_headers, upload_dir):
+    buffer = BytesIO()
+    Image.new("RGB", (1200, 800), color="orange").save(buffer, format="PNG")
+    files = {"file": ("fridge.png", BytesIO(buffer.getvalue()), "image/png")}
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = []
+        response = client.post("/api/v1/scans", files=files, headers=auth_headers)
+    return response.json()["image_path"]
+
+
+def test_original_is_served_with_immutable_caching(client, key, upload_dir):
+    response = client.get(f"/uploads/{key}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"].startswith(f'"{key.rsplit("/", 1)[1][:32]}')
+    assert response.content == (upload_dir / key).read_bytes()
+
+
+@pytest.mark.parametrize("fmt, pil_format", [("webp", "WEBP"), ("jpeg", "JPEG")])
+def test_variant_is_resized_and_reencoded(client, key, fmt, pil_format):
+    response = client.get(f"/uploads/{key}", params={"size": 320, "format": fmt})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == f"image/{fmt}"
+    with Image.open(BytesIO(response.content)) as img:
+        assert (img.format, img.size) == (pil_format, (320, 213))
+
+
+def test_variant_is_rendered_once_then_served_from_cache(client, key, upload_dir):
+    renders = derivative_cache.renders
+    first = client.get(f"/uploads/{key}", params={"size": 160, "format": "webp"})
+    second = client.get(f"/uploads/{key}", params={"size": 160, "format": "webp"})
+
+    assert derivative_cache.renders == renders + 1
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert list((upload_dir / ".derivatives").rglob("160.webp"))
+
+
+def test_matching_etag_is_not_modified(client, key):
+    tag = client.get(f"/uploads/{key}", params={"size": 640}).headers["etag"]
+
+    response = client.get(f"/uploads/{key}", params={"size": 640}, headers={"If-None-Match": tag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    other = client.get(f"/uploads/{key}", params={"size": 320}).headers["etag"]
+    assert other != tag
+
+
+def test_range_requests_return_partial_content(client, key):
+    full = client.get(f"/uploads/{key}", params={"size": 640}).content
+
+    response = client.get(f"/uploads/{key}", params={"size": 640}, headers={"Range": "bytes=0-99"})
+
+    assert response.status_code == 206
+    assert response.content == full[:100]
+    assert response.headers["content-range"] == f"bytes 0-99/{len(full)}"
+
+
+def test_unsupported_size_and_bad_keys_are_rejected(client, key):
+    assert client.get(f"/uploads/{key}", params={"size": 333}).status_code == 400
+    assert client.get(f"/uploads/{key}", params={"format": "gif"}).status_code == 422
+    assert client.get("/uploads/../secrets.jpg").status_code == 404
+    assert client.get(f"/uploads/{'0' * 2}/{'0' * 2}/{'0' * 64}.jpg").status_code == 404
+
+
+def test_deleting_the_last_reference_purges_variants(client, auth_headers, key, upload_dir):
+    client.get(f"/uploads/{key}", params={"size": 160})
+    scans = client.get("/api/v1/scans", headers=auth_headers).json()
+
+    for scan in scans:
+        client.delete(f"/api/v1/scans/{scan['id']}", headers=auth_headers)
+
+    assert not [p for p in (upload_dir / ".derivatives").rglob("*") if p.is_file()]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_render(db, upload_dir):
+    from app.services.storage import content_key, image_store
+
+    buffer = BytesIO()
+    Image.new("RGB", (800, 600), color="blue").save(buffer, format="JPEG")
+    stored = content_key(buffer.getvalue(), "jpg")
+    await image_store.write(stored, buffer.getvalue())
+    renders = derivative_cache.renders
+
+    paths = await asyncio.gather(*(derivative_cache.get(stored, 320, "webp") for _ in range(5)))
+
+    assert len(set(paths)) == 1
+    assert derivative_cache.renders == renders + 1
@@ -0,0 +1,207 @@
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+from app.models.job import Job, utcnow
+from app.services.job_queue import (
+    claim,
+    claim_query,
+    complete,
+    enqueue,
+    fail,
+    heartbeat,
+    requeue_expired,
+)
+from app.worker import JobWorker
+from tests.conftest import TestingSessionLocal
+
+DETECTED = [{"name": "Kale", "quantity": "1 bunch", "confidence": 0.9}]
+RECIPE = {
+    "title": "Kale Salad",
+    "description": "Crunchy",
+    "cook_time": 10,
+    "difficulty": "easy",
+    "servings": 2,
+    "ingredients": [{"name": "kale", "amount": "1 bunch", "available": True}],
+    "instructions": ["Chop", "Dress"],
+}
+
+
+@pytest.fixture
+def job_queue(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_ENABLED", True)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.0)
+
+
+@pytest.fixture
+def worker():
+    return JobWorker(session_factory=TestingSessionLocal, poll_interval=0)
+
+
+def add_job(db, kind="test.kind", **kwargs) -> Job:
+    job = enqueue(db, kind, {"n": 1}, **kwargs)
+    db.commit()
+    return job
+
+
+def upload(client, auth_headers):
+    img_bytes = BytesIO()
+    Image.new("RGB", (40, 40), color="green").save(img_bytes, format="PNG")
+    img_bytes.seek(0)
+    return client.post("/api/v1/scans", files={"file": ("kale.png", img_bytes, "image/png")}, headers=auth_headers)
+
+
+def test_claim_leases_job_and_complete_records_result(db):
+    job = add_job(db)
+
+    claimed = claim(db, "w1", ["test.kind"], lease_seconds=30)
+    assert claimed.id == job.id
+    assert (claimed.status, claimed.locked_by, claimed.attempts) == ("running", "w1", 1)
+    assert claimed.lease_expires_at > utcnow()
+    assert claim(db, "w2", ["test.kind"], lease_seconds=30) is None
+
+    assert complete(db, job.id, "w1", {"ok": True})
+    db.refresh(job)
+    assert (job.status, job.result, job.locked_by) == ("succeeded", {"ok": True}, None)
+    assert job.finished_at is not None
+
+
+def test_claim_respects_run_after_and_kinds(db):
+    later = add_job(db, kind="a")
+    later.run_after = utcnow() + timedelta(minutes=5)
+    add_job(db, kind="b")
+    db.commit()
+
+    assert claim(db, "w1", ["a"], lease_seconds=30) is None
+    assert claim(db, "w1", ["a", "b"], lease_seconds=30).kind == "b"
+
+
+def test_claim_query_skips_locked_rows_on_postgres(db):
+    sql = str(claim_query(db, ["scan.detect"]).statement.compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_only_the_lease_holder_can_heartbeat_or_complete(db):
+    job = add_job(db)
+    claim(db, "w1", ["test.kind"], lease_seconds=30)
+
+    assert heartbeat(db, job.id, "w1", lease_seconds=30)
+    assert not heartbeat(db, job.id, "w2", lease_seconds=30)
+    assert not complete(db, job.id, "w2", {})
+
+
+def test_fail_requeues_until_attempts_run_out(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 10.0)
+    job = add_job(db, max_attempts=2)
+
+    claim(db, "w1", ["test.kind"], lease_seconds=30)
+    assert fail(db, job.id, "w1", "boom", attempts=1, max_attempts=2)
+    db.refresh(job)
+    assert (job.status, job.error) == ("queued", "boom")
+    assert job.run_after > utcnow() + timedelta(seconds=7)
+
+    job.run_after = utcnow()
+    db.commit()
+    claim(db, "w1", ["test.kind"], lease_seconds=30)
+    assert fail(db, job.id, "w1", "boom again", attempts=2, max_attempts=2)
+    db.refresh(job)
+    assert job.status == "failed"
+    assert job.finished_at is not None
+
+
+def test_expired_leases_are_requeued_or_failed(db):
+    retryable = add_job(db, max_attempts=3)
+    exhausted = add_job(db, max_attempts=1)
+    for _ in range(2):
+        claim(db, "dead-worker", ["test.kind"], lease_seconds=30)
+    for job in (retryable, exhausted):
+        job.lease_expires_at = utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert requeue_expired(db) == 1
+    db.refresh(retryable)
+    db.refresh(exhausted)
+    assert (retryable.status, retryable.locked_by) == ("queued", None)
+    assert (exhausted.status, exhausted.error) == ("failed", "Worker lease expired")
+
+
+def test_scan_detection_runs_on_the_worker(client, db, auth_headers, job_queue, worker):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = DETECTED
+        response = upload(client, auth_headers)
+        assert response.status_code == 202
+        assert response.json()["stage"] == "queued"
+        mock_detect.assert_not_called()
+
+        assert client.portal.call(worker.run_until_idle) == 1
+
+    db.expire_all()
+    scan = client.get(f"/api/v1/scans/{response.json()['id']}", headers=auth_headers).json()
+    assert (scan["status"], scan["ingredients"], scan["attempts"]) == ("completed", DETECTED, 1)
+    job = db.query(Job).one()
+    assert (job.kind, job.status, job.result) == ("scan.detect", "succeeded", {"ingredients": 1})
+
+
+def test_failed_scan_job_is_retried_by_the_worker(client, db, auth_headers, job_queue, worker):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = [Exception("vision model hiccup"), DETECTED]
+        scan_id = upload(client, auth_headers).json()["id"]
+        assert client.portal.call(worker.run_until_idle) == 2
+
+    db.expire_all()
+    scan = client.get(f"/api/v1/scans/{scan_id}", headers=auth_headers).json()
+    assert (scan["status"], scan["attempts"], scan["error"]) == ("completed", 2, None)
+
+
+def test_recipe_generation_job(client, db, auth_headers, job_queue, worker):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = DETECTED
+        scan_id = upload(client, auth_headers).json()["id"]
+        client.portal.call(worker.run_until_idle)
+
+    response = client.post("/api/v1/recipes/generate/jobs", json={"scan_id": scan_id, "count": 1}, headers=auth_headers)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.headers["Location"].endswith(f"/api/v1/jobs/{job_id}")
+    assert response.json()["status"] == "queued"
+
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [RECIPE]
+        client.portal.call(worker.run_until_idle)
+
+    db.expire_all()
+    job = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "succeeded"
+    [recipe_id] = job["result"]["recipe_ids"]
+    assert client.get(f"/api/v1/recipes/{recipe_id}", headers=auth_headers).json()["title"] == "Kale Salad"
+
+
+def test_recipe_job_for_deleted_scan_fails_without_retry(client, db, auth_headers, job_queue, worker):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = DETECTED
+        scan_id = upload(client, auth_headers).json()["id"]
+        client.portal.call(worker.run_until_idle)
+
+    response = client.post("/api/v1/recipes/generate/jobs", json={"scan_id": scan_id, "count": 1}, headers=auth_headers)
+    client.delete(f"/api/v1/scans/{scan_id}", headers=auth_headers)
+    client.portal.call(worker.run_until_idle)
+
+    db.expire_all()
+    job = client.get(f"/api/v1/jobs/{response.json()['id']}", headers=auth_headers).json()
+    assert (job["status"], job["attempts"]) == ("failed", 1)
+
+
+def test_recipe_jobs_require_the_queue(client, auth_headers):
+    response = client.post("/api/v1/recipes/generate/jobs", json={"scan_id": "x", "count": 1}, headers=auth_headers)
+    assert response.status_code == 503
+
+
+def test_job_status_is_private(client, db, auth_headers):
+    job = add_job(db, user_id="someone-else")
+    assert client.get(f"/api/v1/jobs/{job.id}", headers=auth_headers).status_code == 403
+    assert client.get("/api/v1/jobs/missing", headers=auth_headers).status_code == 404
@@ -0,0 +1,93 @@
+import json
+
+import httpx
+import pytest
+
+from app.services.llm_transport import (
+    LatencyModel,
+    RecordingTransport,
+    ReplayTransport,
+    request_key,
+)
+
+URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+def completion(content: str) -> dict:
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+def echo_upstream(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    return httpx.Response(
+        200,
+        json=completion(body["messages"][0]["content"].upper()),
+        headers={"x-ratelimit-remaining-requests": "42", "x-request-id": "abc"},
+    )
+
+
+async def post(transport: httpx.AsyncBaseTransport, model: str, prompt: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.post(URL, json={"model": model, "messages": [{"role": "user", "content": prompt}]})
+
+
+def test_request_key_ignores_json_key_order():
+    a = httpx.Request("POST", URL, content=b'{"model": "m", "messages": []}')
+    b = httpx.Request("POST", URL, content=b'{"messages":[],"model":"m"}')
+    c = httpx.Request("POST", URL, content=b'{"messages":[],"model":"other"}')
+    assert request_key(a) == request_key(b)
+    assert request_key(a) != request_key(c)
+
+
+def test_latency_model_specs():
+    assert LatencyModel("none").sample(3.0) == 0.0
+    assert LatencyModel("recorded").sample(1.5) == 1.5
+    assert LatencyModel("fixed:0.25").sample(9.0) == 0.25
+    assert all(0.5 <= LatencyModel("uniform:0.5:1.0", seed=i).sample() <= 1.0 for i in range(20))
+    samples = [LatencyModel("lognormal:1.0:0.5", seed=7).sample() for _ in range(3)]
+    assert samples == [samples[0]] * 3  # seeded -> deterministic
+    with pytest.raises(ValueError):
+        LatencyModel("uniform:1")
+    with pytest.raises(ValueError):
+        LatencyModel("gaussian:1:2")
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_exact(tmp_path):
+    cassette = tmp_path / "groq.jsonl"
+    recorder = RecordingTransport(httpx.MockTransport(echo_upstream), cassette)
+    response = await post(recorder, "llama", "hello")
+    assert response.json()["choices"][0]["message"]["content"] == "HELLO"
+
+    entry = json.loads(cassette.read_text().splitlines()[0])
+    assert entry["model"] == "llama"
+    assert entry["headers"] == {"content-type": "application/json", "x-ratelimit-remaining-requests": "42"}
+
+    replay = ReplayTransport(cassette, latency=LatencyModel("none"))
+    replayed = await post(replay, "llama", "hello")
+    assert replayed.status_code == 200
+    assert replayed.json()["choices"][0]["message"]["content"] == "HELLO"
+    assert replayed.headers["x-ratelimit-remaining-requests"] == "42"
+    assert replay.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_replay_miss_and_model_fallback(tmp_path):
+    cassette = tmp_path / "groq.jsonl"
+    recorder = RecordingTransport(httpx.MockTransport(echo_upstream), cassette)
+    await post(recorder, "llama", "one")
+    await post(recorder, "llama", "two")
+
+    exact = ReplayTransport(cassette, latency=LatencyModel("none"))
+    miss = await post(exact, "llama", "something new")
+    assert miss.status_code == 404
+    assert miss.json()["error"]["type"] == "replay_miss"
+
+    by_model = ReplayTransport(cassette, latency=LatencyModel("none"), match="model")
+    contents = [
+        (await post(by_model, "llama", f"new {i}")).json()["choices"][0]["message"]["content"]
+        for i in range(3)
+    ]
+    assert contents == ["ONE", "TWO", "ONE"]
+    assert by_model.fallbacks == 3
+    assert (await post(by_model, "other-model", "x")).status_code == 404
@@ -0,0 +1,247 @@
+import json
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import pytest_asyncio
+from groq import RateLimitError
+
+from app.config import settings
+from app.models.llm_usage import LLMUsageRollup
+from app.services import groq_service, llm_usage
+from app.services.llm_usage import (
+    LLMCall,
+    LLMCallRecord,
+    UsageRecorder,
+    bind_call_context,
+    estimate_cost,
+    histogram_percentile,
+    usage_summary,
+)
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker
+
+
+def make_record(**overrides) -> LLMCallRecord:
+    fields = {
+        "task": "text", "model": "llama-3.3-70b-versatile", "endpoint": "recipes.generate",
+        "user_id": "user-1", "outcome": "ok", "queue_wait": 0.0, "ttfb": 0.3, "latency": 1.5,
+        "prompt_tokens": 1000, "completion_tokens": 500, "cost_usd": 0.001, "at": datetime(2026, 10, 17, 9, 15),
+    }
+    fields.update(overrides)
+    return LLMCallRecord(**fields)
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = UsageRecorder(max_pending=100)
+    monkeypatch.setattr(llm_usage, "usage_recorder", recorder)
+    return recorder
+
+
+@pytest_asyncio.fixture
+async def groq_with(monkeypatch):
+    """Install a fresh limiter/breaker and a Groq client backed by the given handler."""
+    monkeypatch.setattr(groq_service, "groq_limiter", AdaptiveLimiter("test", initial_limit=4))
+    monkeypatch.setattr(groq_service, "groq_breaker", CircuitBreaker("test"))
+
+    async def install(handler):
+        await groq_service.close_client()
+        await groq_service.init_client(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    yield install
+    await groq_service.close_client()
+
+
+def test_estimate_cost_uses_price_table():
+    assert estimate_cost("llama-3.3-70b-versatile", 1_000_000, 1_000_000) == pytest.approx(0.59 + 0.79)
+    assert estimate_cost("some-unpriced-model", 5000, 5000) == 0.0
+
+
+def test_histogram_percentile():
+    # 10 calls <= 0.25s, 10 calls in the (1, 2] bucket
+    histogram = [10, 0, 0, 10, 0, 0, 0, 0, 0, 0]
+    assert histogram_percentile(histogram, 50) == 0.25
+    assert histogram_percentile(histogram, 95) == 2.0
+    assert histogram_percentile([0] * 10, 50) is None
+    assert histogram_percentile([0] * 9 + [1], 99) == 64.0
+
+
+def test_call_finishes_once(recorder):
+    call = LLMCall(task="vision", model="llama-3.3-70b-versatile", endpoint="scans.create", user_id="u")
+    call.finish("ok", 100, 50)
+    call.finish("error")
+    assert recorder.pending() == 1
+    assert call.record.outcome == "ok"
+    assert call.record.cost_usd == pytest.approx(estimate_cost("llama-3.3-70b-versatile", 100, 50))
+
+
+@pytest.mark.asyncio
+async def test_completion_records_tokens_outcome_and_context(recorder, groq_with):
+    async def handler(request):
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 80, "total_tokens": 200},
+        })
+
+    await groq_with(handler)
+    bind_call_context("recipes.generate", "user-42")
+    await groq_service.create_completion(
+        task="text", model="llama-3.1-8b-instant", messages=[{"role": "user", "content": "hi"}]
+    )
+
+    [record] = recorder._drain()
+    assert (record.task, record.model, record.outcome) == ("text", "llama-3.1-8b-instant", "ok")
+    assert (record.endpoint, record.user_id) == ("recipes.generate", "user-42")
+    assert (record.prompt_tokens, record.completion_tokens) == (120, 80)
+    assert record.cost_usd == pytest.approx(estimate_cost("llama-3.1-8b-instant", 120, 80))
+    assert 0 <= record.ttfb <= record.latency
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_call_is_recorded(recorder, groq_with):
+    async def handler(request):
+        return httpx.Response(
+            429, json={"error": {"message": "slow down"}}, headers={"x-should-retry": "false"}
+        )
+
+    await groq_with(handler)
+    with pytest.raises(RateLimitError):
+        await groq_service.create_completion(model="llama-3.1-8b-instant", messages=[])
+
+    [record] = recorder._drain()
+    assert record.outcome == "rate_limited"
+    assert record.prompt_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_is_finished_on_close_with_estimated_tokens(recorder):
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="x" * 40))]),
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="y" * 40))]),
+    ]
+
+    class FakeStream:
+        closed = False
+
+        async def __aiter__(self):
+            for chunk in chunks:
+                yield chunk
+
+        async def close(self):
+            self.closed = True
+
+    stream = FakeStream()
+    call = LLMCall(task="text", model="llama-3.3-70b-versatile", endpoint="e", user_id="u")
+    wrapped = llm_usage.InstrumentedStream(stream, call, prompt_tokens_estimate=30)
+    async for _ in wrapped:
+        break
+    await wrapped.close()
+
+    assert stream.closed
+    [record] = recorder._drain()
+    assert (record.outcome, record.prompt_tokens, record.completion_tokens) == ("ok", 30, 10)
+
+
+@pytest.mark.asyncio
+async def test_stream_abandoned_mid_way_is_still_recorded(recorder):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="x" * 40))])] * 3
+
+    class FakeStream:
+        async def __aiter__(self):
+            for chunk in chunks:
+                yield chunk
+
+    call = LLMCall(task="text", model="llama-3.3-70b-versatile", endpoint="e", user_id="u")
+    chunk_iter = aiter(llm_usage.InstrumentedStream(FakeStream(), call, prompt_tokens_estimate=30))
+    await anext(chunk_iter)
+    # What a disconnected SSE client's generator does to the stream it was reading
+    await chunk_iter.aclose()
+
+    [record] = recorder._drain()
+    assert (record.outcome, record.prompt_tokens, record.completion_tokens) == ("cancelled", 30, 10)
+
+
+def test_flush_merges_into_hourly_rollups(db, recorder):
+    recorder.record(make_record(latency=0.2))
+    recorder.record(make_record(latency=1.5, at=datetime(2026, 10, 17, 9, 50)))
+    recorder.record(make_record(user_id="user-2", latency=5.0))
+    assert recorder.flush(db) == 3
+    assert recorder.pending() == 0
+
+    recorder.record(make_record(latency=1.8))
+    recorder.flush(db)
+
+    rows = db.query(LLMUsageRollup).order_by(LLMUsageRollup.user_id).all()
+    assert [(r.user_id, r.calls) for r in rows] == [("user-1", 3), ("user-2", 1)]
+    assert rows[0].bucket_start == datetime(2026, 10, 17, 9, 0)
+    assert rows[0].prompt_tokens == 3000
+    assert rows[0].latency_histogram == [1, 0, 0, 2, 0, 0, 0, 0, 0, 0]
+
+
+def test_usage_summary_groups_and_reports_percentiles(db, recorder):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    recorder.record(make_record(at=now, latency=0.4, cost_usd=0.01))
+    recorder.record(make_record(at=now, latency=3.0, cost_usd=0.02, outcome="timeout"))
+    recorder.record(make_record(at=now, endpoint="scans.create", task="vision", latency=6.0, cost_usd=0.05))
+    recorder.flush(db)
+
+    by_endpoint = {s["endpoint"]: s for s in usage_summary(db, "endpoint", hours=24)}
+    generate = by_endpoint["recipes.generate"]
+    assert generate["calls"] == 2
+    assert generate["errors"] == 1
+    assert generate["cost_usd"] == pytest.approx(0.03)
+    assert generate["p50"] == 0.5
+    assert generate["p99"] == 4.0
+    assert by_endpoint["scans.create"]["p50"] == 8.0
+
+    [by_user] = usage_summary(db, "user_id", hours=24)
+    assert by_user["calls"] == 3
+
+    with pytest.raises(ValueError):
+        usage_summary(db, "password_hash")
+
+
+def test_failed_flush_requeues_records(recorder):
+    class BrokenSession:
+        def query(self, *args):
+            raise RuntimeError("database down")
+
+        def rollback(self):
+            pass
+
+    recorder.record(make_record())
+    with pytest.raises(RuntimeError):
+        recorder.flush(BrokenSession())
+    assert recorder.pending() == 1
+
+
+def test_usage_endpoint(client, db, recorder, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "Test@Example.com")
+    recorder.record(make_record(at=datetime.now(UTC).replace(tzinfo=None)))
+    recorder.flush(db)
+
+    response = client.get(
+        "/api/v1/health/health/llm/usage", params={"group_by": "model"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    [row] = response.json()["usage"]
+    assert row["model"] == "llama-3.3-70b-versatile"
+    assert row["calls"] == 1
+
+    assert client.get(
+        "/api/v1/health/health/llm/usage", params={"group_by": "password_hash"}, headers=auth_headers
+    ).status_code == 422
+
+
+def test_usage_endpoint_is_admin_only(client, auth_headers, monkeypatch):
+    """Usage can be grouped by user, so it must not be public."""
+    assert client.get("/api/v1/health/health/llm/usage").status_code == 401
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "ops@example.com")
+    response = client.get(
+        "/api/v1/health/health/llm/usage", params={"group_by": "user_id"}, headers=auth_headers
+    )
+    assert response.status_code == 403
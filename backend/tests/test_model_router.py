@@ -0,0 +1,142 @@
+import json
+
+import pytest
+import pytest_asyncio
+
+from app.services import groq_service
+from app.services.model_router import (
+    LatencyTracker,
+    ModelRouter,
+    ModelTier,
+    parse_model_tiers,
+)
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker, ServiceUnavailableError
+from tests.groq_stub import GroqStub, ModelBehavior
+
+FAST = "llama-3.1-8b-instant"
+STRONG = "llama-3.3-70b-versatile"
+
+GOOD_RECIPES = json.dumps({"recipes": [
+    {"title": "Omelette", "instructions": ["Whisk", "Cook"]},
+    {"title": "Frittata", "instructions": ["Bake"]},
+]})
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    """Point the shared Groq client at a local stub with a fast and a strong text tier."""
+    groq_stub = GroqStub()
+    monkeypatch.setattr(
+        groq_service, "text_router",
+        ModelRouter(
+            "text", [ModelTier(FAST, 0.2), ModelTier(STRONG, 5)],
+            on_timeout=groq_service._record_groq_timeout,
+        ),
+    )
+    monkeypatch.setattr(groq_service, "groq_limiter", AdaptiveLimiter("groq", initial_limit=8))
+    monkeypatch.setattr(groq_service, "groq_breaker", CircuitBreaker("groq"))
+    await groq_service.close_client()
+    await groq_service.init_client(http_client=groq_stub.http_client())
+    yield groq_stub
+    await groq_service.close_client()
+
+
+class TestParsing:
+    def test_parse_model_tiers(self):
+        tiers = parse_model_tiers("llama-3.1-8b-instant:10, meta-llama/llama-4-scout-17b-16e-instruct:30")
+        assert tiers == [
+            ModelTier("llama-3.1-8b-instant", 10.0),
+            ModelTier("meta-llama/llama-4-scout-17b-16e-instruct", 30.0),
+        ]
+
+    def test_parse_rejects_missing_timeout(self):
+        with pytest.raises(ValueError):
+            parse_model_tiers("llama-3.1-8b-instant")
+        with pytest.raises(ValueError):
+            parse_model_tiers("")
+
+    def test_latency_percentiles(self):
+        tracker = LatencyTracker()
+        assert tracker.percentile(50) is None
+        for ms in range(1, 101):
+            tracker.record(ms / 1000)
+        assert tracker.percentile(50) == pytest.approx(0.05)
+        assert tracker.percentile(95) == pytest.approx(0.095)
+        assert tracker.summary()["samples"] == 100
+
+
+class TestRoutingAgainstStub:
+    """Model escalation, exercised offline against the local Groq stub."""
+
+    @pytest.mark.asyncio
+    async def test_fast_model_serves_when_good(self, stub):
+        stub.behaviors[FAST] = ModelBehavior(content=GOOD_RECIPES)
+
+        recipes = await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        assert [r["title"] for r in recipes] == ["Omelette", "Frittata"]
+        assert stub.models_called() == [FAST]
+        assert groq_service.text_router.decisions == {f"{FAST}:ok": 1}
+
+    @pytest.mark.asyncio
+    async def test_escalates_on_timeout(self, stub):
+        stub.behaviors[FAST] = ModelBehavior(content=GOOD_RECIPES, delay=1.0)
+        stub.behaviors[STRONG] = ModelBehavior(content=GOOD_RECIPES)
+
+        recipes = await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        assert len(recipes) == 2
+        assert stub.models_called() == [FAST, STRONG]
+        decisions = groq_service.text_router.decisions
+        assert decisions[f"{FAST}:timeout"] == 1
+        assert decisions[f"{STRONG}:ok"] == 1
+        assert groq_service.text_router.stats()["latency"][FAST]["samples"] == 1
+        # The SLO miss counted as overload; the fallback's success closed the breaker again
+        assert groq_service.groq_limiter.limit == pytest.approx(4 + 1 / 4)
+        assert groq_service.groq_breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_timeout_reopens_a_half_open_breaker(self, stub, monkeypatch):
+        stub.behaviors[FAST] = ModelBehavior(content=GOOD_RECIPES, delay=1.0)
+        breaker = CircuitBreaker("groq", failure_threshold=1)
+        breaker.record_failure()
+        breaker.opened_until = 0  # due for a probe
+        monkeypatch.setattr(groq_service, "groq_breaker", breaker)
+
+        with pytest.raises(ServiceUnavailableError):
+            await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        # The probe timed out, so the breaker opened and refused the fallback tier
+        assert stub.models_called() == [FAST]
+        assert breaker.state == CircuitBreaker.OPEN
+
+    @pytest.mark.asyncio
+    async def test_escalates_on_malformed_json(self, stub):
+        stub.behaviors[FAST] = ModelBehavior(content='{"recipes": [{"title": ')
+        stub.behaviors[STRONG] = ModelBehavior(content=GOOD_RECIPES)
+
+        await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        assert stub.models_called() == [FAST, STRONG]
+        assert groq_service.text_router.decisions[f"{FAST}:malformed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_escalates_on_low_quality(self, stub):
+        stub.behaviors[FAST] = ModelBehavior(content=json.dumps({"recipes": [{"title": "Eggs"}]}))
+        stub.behaviors[STRONG] = ModelBehavior(content=GOOD_RECIPES)
+
+        recipes = await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        assert [r["title"] for r in recipes] == ["Omelette", "Frittata"]
+        assert groq_service.text_router.decisions[f"{FAST}:low_quality"] == 1
+
+    @pytest.mark.asyncio
+    async def test_returns_low_quality_answer_when_all_tiers_fail(self, stub):
+        weak = json.dumps({"recipes": [{"title": "Eggs"}]})
+        stub.behaviors[FAST] = ModelBehavior(content=weak)
+        stub.behaviors[STRONG] = ModelBehavior(content=weak, delay=10)
+        groq_service.text_router.tiers[-1] = ModelTier(STRONG, 0.1)
+
+        recipes = await groq_service.generate_recipes([{"name": "eggs"}], count=2)
+
+        assert recipes == [{"title": "Eggs"}]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services import groq_service
+
+PREFETCHED = [{"title": f"Prefetched {i}", "instructions": ["Cook"]} for i in range(3)]
+FRESH = [{"title": "Fresh", "instructions": ["Cook"]}]
+
+
+@pytest.fixture
+def prefetch(monkeypatch):
+    """Enable prefetch with a fake generator that takes ``delay`` seconds."""
+    monkeypatch.setattr(settings, "RECIPE_PREFETCH_ENABLED", True)
+    groq_service.recipe_cache.clear()
+    state = {"delay": 0.0, "calls": 0}
+
+    async def fake_generate(**kwargs):
+        state["calls"] += 1
+        await asyncio.sleep(state["delay"])
+        return PREFETCHED[:kwargs["count"]]
+
+    monkeypatch.setattr(groq_service, "generate_recipes", fake_generate)
+    yield state
+    groq_service.recipe_cache.clear()
+
+
+def upload_scan(client, auth_headers) -> str:
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = [{"name": "Leeks", "quantity": "2", "confidence": 0.9}]
+        img_bytes = BytesIO()
+        Image.new("RGB", (50, 50), color="green").save(img_bytes, format="PNG")
+        img_bytes.seek(0)
+        response = client.post(
+            "/api/v1/scans", files={"file": ("leeks.png", img_bytes, "image/png")}, headers=auth_headers
+        )
+    return response.json()["id"]
+
+
+def generate(client, auth_headers, scan_id):
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = FRESH
+        response = client.post(
+            "/api/v1/recipes/generate", json={"scan_id": scan_id, "count": 3}, headers=auth_headers
+        )
+    assert response.status_code == 201
+    return [r["title"] for r in response.json()], mock_gen.call_count
+
+
+def test_completed_prefetch_is_served_from_cache(client, auth_headers, prefetch):
+    scan_id = upload_scan(client, auth_headers)
+    time.sleep(0.1)
+
+    titles, fresh_calls = generate(client, auth_headers, scan_id)
+
+    assert titles == [r["title"] for r in PREFETCHED]
+    assert fresh_calls == 0
+    assert prefetch["calls"] == 1
+
+
+def test_generate_joins_inflight_prefetch(client, auth_headers, prefetch):
+    prefetch["delay"] = 0.3
+    scan_id = upload_scan(client, auth_headers)
+
+    titles, fresh_calls = generate(client, auth_headers, scan_id)
+
+    assert titles == [r["title"] for r in PREFETCHED]
+    assert fresh_calls == 0
+    assert prefetch["calls"] == 1
+
+
+def test_editing_scan_discards_prefetch(client, auth_headers, prefetch):
+    prefetch["delay"] = 0.3
+    scan_id = upload_scan(client, auth_headers)
+
+    client.put(
+        f"/api/v1/scans/{scan_id}",
+        json={"ingredients": [{"name": "Leeks", "quantity": "2", "confidence": 0.9}]},
+        headers=auth_headers,
+    )
+    titles, fresh_calls = generate(client, auth_headers, scan_id)
+
+    assert titles == ["Fresh"]
+    assert fresh_calls == 1
+
+
+def test_preference_change_discards_prefetch(client, auth_headers, prefetch):
+    scan_id = upload_scan(client, auth_headers)
+    time.sleep(0.1)
+
+    client.put("/api/v1/user/preferences", json={"servings": 4}, headers=auth_headers)
+    titles, fresh_calls = generate(client, auth_headers, scan_id)
+
+    assert titles == ["Fresh"]
+    assert fresh_calls == 1
+
+
+def test_prefetch_is_opt_in(client, auth_headers, prefetch, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_PREFETCH_ENABLED", False)
+    scan_id = upload_scan(client, auth_headers)
+
+    titles, fresh_calls = generate(client, auth_headers, scan_id)
+
+    assert titles == ["Fresh"]
+    assert prefetch["calls"] == 0
@@ -0,0 +1,76 @@
+from datetime import date
+
+from app.services import groq_service
+from app.services.prompt_builder import (
+    estimate_tokens,
+    rank_ingredients,
+    select_within_budget,
+)
+
+TODAY = date(2026, 3, 1)
+
+
+def pantry(name, category="Other", expiry=None):
+    return {"name": name, "quantity": "some", "source": "pantry", "category": category, "expiry_date": expiry}
+
+
+class TestRanking:
+    """Tests for ingredient relevance ranking."""
+
+    def test_scan_then_expiring_then_category_mix(self):
+        ingredients = [
+            pantry("rice", "Grains"),
+            pantry("pasta", "Grains"),
+            pantry("cumin", "Spices"),
+            pantry("old milk", "Dairy & Eggs", "2026-03-03"),
+            pantry("yogurt", "Dairy & Eggs", date(2026, 3, 2)),
+            pantry("frozen peas", "Frozen", "2026-09-01"),
+            {"name": "spinach", "source": "scan", "confidence": 0.7},
+            {"name": "tomato", "source": "scan", "confidence": 0.95},
+        ]
+
+        ranked = [ing["name"] for ing in rank_ingredients(ingredients, today=TODAY)]
+
+        assert ranked[:2] == ["tomato", "spinach"]
+        assert ranked[2:4] == ["yogurt", "old milk"]
+        # Far-off expiry is not urgent; the rest alternate across categories
+        assert ranked[4:7] == ["rice", "cumin", "frozen peas"]
+        assert ranked[7] == "pasta"
+
+    def test_select_within_budget_truncates_in_rank_order(self):
+        ranked = [{"name": f"item {i}", "quantity": "1"} for i in range(100)]
+        selected = select_within_budget(ranked, token_budget=50)
+        assert 0 < len(selected) < 100
+        assert selected == ranked[:len(selected)]
+        assert select_within_budget(ranked, token_budget=0) == ranked[:1]
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcd") == 1
+        assert estimate_tokens("abcde") == 2
+
+
+class TestBudgetedPrompt:
+    """build_recipe_prompt keeps large pantries within the token budget."""
+
+    def test_large_pantry_is_truncated(self, monkeypatch):
+        monkeypatch.setattr(groq_service.settings, "RECIPE_PROMPT_TOKEN_BUDGET", 400)
+        scan = [{"name": "Salmon", "quantity": "2 fillets", "confidence": 0.9}]
+        big_pantry = [
+            {"name": f"pantry item {i}", "quantity": "1 jar", "category": "Other"}
+            for i in range(150)
+        ]
+        big_pantry.append({"name": "lemon", "quantity": "1", "category": "Produce", "expiry_date": date.today().isoformat()})
+
+        prompt = groq_service.build_recipe_prompt(scan, None, 3, big_pantry)
+
+        assert estimate_tokens(prompt) <= 400
+        assert "Salmon (2 fillets)" in prompt
+        assert "lemon (1)" in prompt
+        assert "pantry item 149" not in prompt
+
+    def test_small_inputs_are_untouched(self):
+        prompt = groq_service.build_recipe_prompt(
+            [{"name": "eggs", "quantity": "6"}], None, 3, [{"name": "flour", "quantity": "1 bag"}]
+        )
+        assert "eggs (6), flour (1 bag)" in prompt
@@ -0,0 +1,158 @@
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.core.security import create_access_token
+from app.models.recipe_catalog import CatalogIngredient, CatalogRecipe
+from app.services import groq_service
+from app.services.auth import create_user
+from app.services.recipe_catalog import available_keys, recipe_catalog, required_keys
+from app.services.recipe_dedup import recipe_indexes
+
+OMELETTE = {
+    "title": "Cheese Omelette",
+    "description": "Fluffy",
+    "cook_time": 10,
+    "difficulty": "easy",
+    "servings": 1,
+    "ingredients": [
+        {"name": "Large Eggs", "amount": "3", "available": True},
+        {"name": "Cheddar", "amount": "50g", "available": True},
+        {"name": "Milk", "amount": "2 tbsp", "available": False},
+        {"name": "salt", "amount": "pinch"},
+    ],
+    "instructions": ["Whisk", "Cook"],
+}
+CHICKEN_RICE = {
+    "title": "Chicken Fried Rice",
+    "cook_time": 25,
+    "ingredients": [{"name": "chicken breast"}, {"name": "rice"}, {"name": "eggs"}, {"name": "soy sauce"}],
+    "instructions": ["Fry"],
+}
+FRIDGE = [{"name": "Eggs"}, {"name": "Cheddar"}, {"name": "Whole milk"}, {"name": "bread"}]
+
+
+@pytest.fixture(autouse=True)
+def catalog_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_CATALOG_ENABLED", True)
+    recipe_catalog.reset_stats()
+    recipe_indexes.clear()
+    groq_service.recipe_cache.clear()
+    yield
+    recipe_indexes.clear()
+    groq_service.recipe_cache.clear()
+
+
+def test_required_keys_skip_staples_and_preparation_words():
+    assert required_keys(OMELETTE) == ["cheddar", "egg", "milk"]
+    assert available_keys([{"name": "Cheddar cheese"}, {"name": "Whole milk"}]) == {
+        "cheddar cheese", "cheese", "milk"
+    }
+
+
+def test_contribute_strips_user_data_and_counts_repeats(db):
+    assert recipe_catalog.contribute(db, [OMELETTE, CHICKEN_RICE]) == 2
+    assert recipe_catalog.contribute(db, [OMELETTE]) == 0
+
+    entry = db.query(CatalogRecipe).filter(CatalogRecipe.title == "Cheese Omelette").one()
+    assert entry.contributions == 2
+    assert entry.required_count == 3
+    assert all("available" not in ing for ing in entry.ingredients)
+    assert db.query(CatalogIngredient).count() == 7
+
+
+def test_lookup_serves_covered_recipes(db):
+    recipe_catalog.contribute(db, [OMELETTE, CHICKEN_RICE])
+
+    hits = recipe_catalog.lookup(db, FRIDGE, {}, count=2)
+
+    assert [h["title"] for h in hits] == ["Cheese Omelette"]
+    available = {ing["name"]: ing["available"] for ing in hits[0]["ingredients"]}
+    assert available == {"Large Eggs": True, "Cheddar": True, "Milk": True, "salt": True}
+    stats = recipe_catalog.stats()
+    assert stats["recipes_served"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["saved_usd"] > 0
+
+
+@pytest.mark.parametrize("preferences", [
+    {"allergies": ["Dairy"]},
+    {"allergies": ["eggs"]},
+    {"dietary": ["vegan"]},
+    {"dietary": ["keto"]},  # not checkable, so the catalog is bypassed
+    {"max_cook_time": 5},
+])
+def test_lookup_respects_preferences(db, preferences):
+    recipe_catalog.contribute(db, [OMELETTE])
+
+    assert recipe_catalog.lookup(db, FRIDGE, preferences, count=1) == []
+
+
+def test_lookup_requires_coverage(db):
+    recipe_catalog.contribute(db, [CHICKEN_RICE])
+
+    assert recipe_catalog.lookup(db, [{"name": "chicken"}, {"name": "rice"}], None, count=1) == []
+    assert recipe_catalog.lookup(db, [{"name": "chicken"}, {"name": "chicken breast"}], None, count=1) == []
+    fridge = [{"name": "Chicken Breast"}, {"name": "rice"}, {"name": "eggs"}, {"name": "Soy sauce"}]
+    assert len(recipe_catalog.lookup(db, fridge, {"dietary": ["vegetarian"]}, count=1)) == 0
+    assert len(recipe_catalog.lookup(db, fridge, None, count=1)) == 1
+
+
+def scan_fridge(client, headers) -> str:
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = [{**ing, "quantity": "some", "confidence": 0.9} for ing in FRIDGE]
+        img_bytes = BytesIO()
+        Image.new("RGB", (50, 50), color="yellow").save(img_bytes, format="PNG")
+        img_bytes.seek(0)
+        response = client.post("/api/v1/scans", files={"file": ("f.png", img_bytes, "image/png")}, headers=headers)
+    return response.json()["id"]
+
+
+def test_generate_serves_catalog_hits_and_generates_the_rest(client, auth_headers, db):
+    fresh = {"title": "French Toast", "ingredients": [{"name": "bread"}, {"name": "eggs"}], "instructions": ["Fry"]}
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [OMELETTE]
+        first = client.post(
+            "/api/v1/recipes/generate", json={"scan_id": scan_fridge(client, auth_headers), "count": 1},
+            headers=auth_headers,
+        )
+    assert first.status_code == 201
+    assert db.query(CatalogRecipe).count() == 1
+
+    other = create_user(db, "other@example.com", "testpass123", "Other User")
+    other_headers = {"Authorization": f"Bearer {create_access_token({'sub': str(other.id)})}"}
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [fresh]
+        response = client.post(
+            "/api/v1/recipes/generate", json={"scan_id": scan_fridge(client, other_headers), "count": 2},
+            headers=other_headers,
+        )
+
+    assert response.status_code == 201
+    assert [r["title"] for r in response.json()] == ["Cheese Omelette", "French Toast"]
+    assert mock_gen.call_args.kwargs["count"] == 1
+    assert mock_gen.call_args.kwargs["avoid_titles"] == ["Cheese Omelette"]
+
+    health = client.get("/api/v1/health/health/catalog").json()
+    assert health["entries"] == 2
+    assert health["total_times_served"] == 1
+    assert health["recipes_served"] == 1
+
+
+def test_catalog_skips_recipes_already_in_library(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "merge")
+    scan_id = scan_fridge(client, auth_headers)
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [OMELETTE]
+        client.post("/api/v1/recipes/generate", json={"scan_id": scan_id, "count": 1}, headers=auth_headers)
+    groq_service.recipe_cache.clear()
+
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [CHICKEN_RICE]
+        response = client.post("/api/v1/recipes/generate", json={"scan_id": scan_id, "count": 1}, headers=auth_headers)
+
+    assert mock_gen.call_count == 1
+    assert [r["title"] for r in response.json()] == ["Chicken Fried Rice"]
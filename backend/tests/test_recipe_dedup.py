@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.dedupe_recipes import dedupe_all
+from app.models.recipe import Recipe
+from app.models.shopping_list import ShoppingList
+from app.services import groq_service
+from app.services.recipe_dedup import RecipeIndex, recipe_indexes, recipe_signature, similarity
+
+CHICKEN = {
+    "title": "Garlic Chicken Stir Fry",
+    "ingredients": [{"name": "chicken thighs"}, {"name": "garlic"}, {"name": "soy sauce"}, {"name": "rice"}],
+    "instructions": ["Fry"],
+}
+CHICKEN_AGAIN = {
+    "title": "Easy Garlic Chicken Stir-Fry",
+    "ingredients": [{"name": "Chicken thigh"}, {"name": "Garlic"}, {"name": "soy sauce"}, {"name": "rice"}],
+    "instructions": ["Fry it"],
+}
+SOUP = {
+    "title": "Roasted Tomato Soup",
+    "ingredients": [{"name": "tomatoes"}, {"name": "onion"}, {"name": "basil"}],
+    "instructions": ["Roast", "Blend"],
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    recipe_indexes.clear()
+    groq_service.recipe_cache.clear()
+    yield
+    recipe_indexes.clear()
+    groq_service.recipe_cache.clear()
+
+
+def test_signature_similarity_separates_variants_from_other_dishes():
+    chicken = recipe_signature(CHICKEN)
+
+    assert similarity(chicken, recipe_signature(CHICKEN_AGAIN)) >= settings.RECIPE_DEDUP_THRESHOLD
+    assert similarity(chicken, recipe_signature(SOUP)) < 0.2
+    assert recipe_signature(CHICKEN) == chicken
+
+
+def test_index_add_find_remove():
+    index = RecipeIndex()
+    index.add("chicken", recipe_signature(CHICKEN))
+    index.add("soup", recipe_signature(SOUP))
+
+    match = index.find_similar(recipe_signature(CHICKEN_AGAIN), 0.75)
+    assert match is not None and match[0] == "chicken"
+
+    index.remove("chicken")
+    assert index.find_similar(recipe_signature(CHICKEN_AGAIN), 0.75) is None
+    assert len(index) == 1
+
+
+def create_scan(client, auth_headers) -> str:
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = [{"name": "Chicken", "quantity": "2", "confidence": 0.9}]
+        img_bytes = BytesIO()
+        Image.new("RGB", (50, 50), color="white").save(img_bytes, format="PNG")
+        img_bytes.seek(0)
+        response = client.post(
+            "/api/v1/scans", files={"file": ("f.png", img_bytes, "image/png")}, headers=auth_headers
+        )
+    return response.json()["id"]
+
+
+def generate(client, auth_headers, scan_id, *batches):
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.side_effect = list(batches)
+        response = client.post(
+            "/api/v1/recipes/generate",
+            json={"scan_id": scan_id, "count": len(batches[0])},
+            headers=auth_headers,
+        )
+    assert response.status_code == 201
+    return response.json(), mock_gen
+
+
+def test_merge_mode_returns_existing_recipe(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "merge")
+    scan_id = create_scan(client, auth_headers)
+    first, _ = generate(client, auth_headers, scan_id, [CHICKEN])
+    groq_service.recipe_cache.clear()
+
+    second, _ = generate(client, auth_headers, scan_id, [CHICKEN_AGAIN, SOUP])
+
+    assert [r["id"] for r in second][0] == first[0]["id"]
+    assert [r["title"] for r in second] == ["Garlic Chicken Stir Fry", "Roasted Tomato Soup"]
+    assert db.query(Recipe).count() == 2
+
+
+def test_skip_mode_drops_duplicate(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "skip")
+    scan_id = create_scan(client, auth_headers)
+    generate(client, auth_headers, scan_id, [CHICKEN])
+    groq_service.recipe_cache.clear()
+
+    second, _ = generate(client, auth_headers, scan_id, [CHICKEN_AGAIN, SOUP])
+
+    assert [r["title"] for r in second] == ["Roasted Tomato Soup"]
+    assert db.query(Recipe).count() == 2
+
+
+def test_replace_mode_requests_different_dishes(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "replace")
+    scan_id = create_scan(client, auth_headers)
+    generate(client, auth_headers, scan_id, [CHICKEN])
+    groq_service.recipe_cache.clear()
+
+    second, mock_gen = generate(client, auth_headers, scan_id, [CHICKEN_AGAIN], [SOUP])
+
+    assert [r["title"] for r in second] == ["Roasted Tomato Soup"]
+    assert mock_gen.call_count == 2
+    assert "Easy Garlic Chicken Stir-Fry" in mock_gen.call_args.kwargs["avoid_titles"]
+
+
+def test_off_mode_keeps_duplicates(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "off")
+    scan_id = create_scan(client, auth_headers)
+    generate(client, auth_headers, scan_id, [CHICKEN])
+    groq_service.recipe_cache.clear()
+
+    generate(client, auth_headers, scan_id, [CHICKEN_AGAIN])
+
+    assert db.query(Recipe).count() == 2
+
+
+def test_deleted_recipe_leaves_index(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_DEDUP_MODE", "skip")
+    scan_id = create_scan(client, auth_headers)
+    first, _ = generate(client, auth_headers, scan_id, [CHICKEN])
+    client.delete(f"/api/v1/recipes/{first[0]['id']}", headers=auth_headers)
+    groq_service.recipe_cache.clear()
+
+    second, _ = generate(client, auth_headers, scan_id, [CHICKEN_AGAIN])
+
+    assert [r["title"] for r in second] == ["Easy Garlic Chicken Stir-Fry"]
+
+
+def add_recipe(db, user_id, data, **fields) -> Recipe:
+    recipe = Recipe(
+        user_id=user_id,
+        title=data["title"],
+        ingredients=data["ingredients"],
+        instructions=data["instructions"],
+        **fields,
+    )
+    db.add(recipe)
+    db.commit()
+    return recipe
+
+
+def test_backfill_folds_duplicates_into_oldest(db, auth_headers):
+    from app.models.user import User
+
+    user = db.query(User).one()
+    day = timedelta(days=1)
+    keeper = add_recipe(db, user.id, CHICKEN, times_made=2, created_at=datetime(2025, 1, 1))
+    duplicate = add_recipe(
+        db, user.id, CHICKEN_AGAIN, times_made=1, is_favorite=True, created_at=datetime(2025, 1, 1) + day
+    )
+    add_recipe(db, user.id, SOUP, created_at=datetime(2025, 1, 1) + 2 * day)
+    shopping_list = ShoppingList(user_id=user.id, recipe_id=duplicate.id, name="For stir fry", items=[])
+    db.add(shopping_list)
+    db.commit()
+    keeper_id, list_id = keeper.id, shopping_list.id
+
+    preview = dedupe_all(db, threshold=0.75, batch_size=2, dry_run=True)
+    assert (preview.scanned, preview.removed) == (3, 1)
+    assert db.query(Recipe).count() == 3
+    assert db.query(Recipe).filter(Recipe.minhash.is_(None)).count() == 3
+
+    stats = dedupe_all(db, threshold=0.75, batch_size=2)
+    db.expire_all()
+
+    assert (stats.users, stats.signed, stats.removed) == (1, 3, 1)
+    assert {r.title for r in db.query(Recipe)} == {CHICKEN["title"], SOUP["title"]}
+    kept = db.get(Recipe, keeper_id)
+    assert kept.is_favorite is True
+    assert kept.times_made == 3
+    assert db.get(ShoppingList, list_id).recipe_id == keeper_id
+    assert db.query(Recipe).filter(Recipe.minhash.is_(None)).count() == 0
@@ -1,21 +1,23 @@
-import pytest
-from fastapi import status
 from unittest.mock import patch
 
+from fastapi import status
+
+
 def test_generate_recipes_success(client, auth_headers):
     """Test generating recipes from a valid scan."""
     # 1. Create a scan first (mocking Groq image detection)
     # Patch where it is imported in the endpoint module
     with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
         mock_detect.return_value = [{"name": "Chicken", "quantity": "200g", "confidence": 0.9}]
-        
+
         from io import BytesIO
+
         from PIL import Image
         img = Image.new('RGB', (100, 100), color='red')
         img_bytes = BytesIO()
         img.save(img_bytes, format='PNG')
         img_bytes.seek(0)
-        
+
         files = {"file": ("test.png", img_bytes, "image/png")}
         scan_response = client.post("/api/v1/scans", files=files, headers=auth_headers)
         scan_id = scan_response.json()["id"]
@@ -57,6 +59,7 @@ def test_list_recipes_uses_lightweight_payload(client, auth_headers):
         mock_detect.return_value = [{"name": "Tomato", "quantity": "2", "confidence": 0.9}]
 
         from io import BytesIO
+
         from PIL import Image
         img = Image.new('RGB', (100, 100), color='green')
         img_bytes = BytesIO()
@@ -98,3 +101,105 @@ def test_get_recipe_not_found(client, auth_headers):
     """Test getting a non-existent recipe."""
     response = client.get("/api/v1/recipes/non-existent-id", headers=auth_headers)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def create_scan_with_ingredients(client, auth_headers, ingredients):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = ingredients
+
+        from io import BytesIO
+
+        from PIL import Image
+        img = Image.new('RGB', (100, 100), color='blue')
+        img_bytes = BytesIO()
+        img.save(img_bytes, format='PNG')
+        img_bytes.seek(0)
+
+        files = {"file": ("test.png", img_bytes, "image/png")}
+        return client.post("/api/v1/scans", files=files, headers=auth_headers).json()["id"]
+
+
+def test_generate_recipes_repeat_request_uses_cache(client, auth_headers):
+    """Identical generate requests reuse cached drafts until preferences change."""
+    scan_id = create_scan_with_ingredients(
+        client, auth_headers, [{"name": "Eggs", "quantity": "6", "confidence": 0.9}]
+    )
+
+    with patch("app.api.v1.endpoints.recipes.generate_recipes") as mock_gen:
+        mock_gen.return_value = [
+            {"title": "Cached Omelette", "ingredients": [], "instructions": ["Whisk"]}
+        ]
+        payload = {"scan_id": scan_id, "count": 1}
+
+        first = client.post("/api/v1/recipes/generate", json=payload, headers=auth_headers)
+        second = client.post("/api/v1/recipes/generate", json=payload, headers=auth_headers)
+
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.json()[0]["title"] == "Cached Omelette"
+        # The repeat returns the recipe the first request saved instead of a copy
+        assert second.json()[0]["id"] == first.json()[0]["id"]
+        assert len(client.get("/api/v1/recipes", headers=auth_headers).json()) == 1
+        assert mock_gen.call_count == 1
+
+        client.put("/api/v1/user/preferences", json={"dietary": ["vegetarian"]}, headers=auth_headers)
+        client.post("/api/v1/recipes/generate", json=payload, headers=auth_headers)
+        assert mock_gen.call_count == 2
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    import json
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_recipes_emits_and_saves_each_recipe(client, auth_headers):
+    """The streaming endpoint persists each recipe and pushes it as an SSE event."""
+    scan_id = create_scan_with_ingredients(
+        client, auth_headers, [{"name": "Rice", "quantity": "1 cup", "confidence": 0.9}]
+    )
+
+    async def fake_stream(**kwargs):
+        for title in ("Fried Rice", "Rice Pudding"):
+            yield {"title": title, "ingredients": [], "instructions": ["Cook"]}
+
+    with patch("app.api.v1.endpoints.recipes.stream_recipes", new=fake_stream):
+        response = client.post(
+            "/api/v1/recipes/generate/stream",
+            json={"scan_id": scan_id, "count": 2},
+            headers=auth_headers,
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["recipe", "recipe", "done"]
+    assert events[0][1]["title"] == "Fried Rice"
+    assert events[2][1] == {"count": 2}
+
+    saved = client.get(f"/api/v1/recipes/{events[1][1]['id']}", headers=auth_headers)
+    assert saved.json()["title"] == "Rice Pudding"
+
+
+def test_stream_recipes_reports_errors_as_events(client, auth_headers):
+    """A failure mid-stream is sent as an error event instead of breaking the response."""
+    scan_id = create_scan_with_ingredients(
+        client, auth_headers, [{"name": "Kale", "quantity": "1", "confidence": 0.9}]
+    )
+
+    async def failing_stream(**kwargs):
+        yield {"title": "Kale Chips", "ingredients": [], "instructions": []}
+        raise Exception("Groq went away")
+
+    with patch("app.api.v1.endpoints.recipes.stream_recipes", new=failing_stream):
+        response = client.post(
+            "/api/v1/recipes/generate/stream",
+            json={"scan_id": scan_id, "count": 3},
+            headers=auth_headers,
+        )
+
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["recipe", "error"]
+    assert "Groq went away" in events[1][1]["detail"]
@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from groq import APIStatusError
+
+from app.services import groq_service
+from app.services.resilience import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    ServiceUnavailableError,
+    parse_duration,
+)
+from tests.groq_stub import GroqStub, ModelBehavior
+
+
+@pytest.fixture
+def open_groq_breaker():
+    """Force the shared Groq breaker open for the duration of a test."""
+    breaker = groq_service.groq_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    yield breaker
+    breaker.record_success()
+
+
+class TestParseDuration:
+    def test_groq_formats(self):
+        assert parse_duration("7.66s") == pytest.approx(7.66)
+        assert parse_duration("2m59.56s") == pytest.approx(179.56)
+        assert parse_duration("120ms") == pytest.approx(0.12)
+        assert parse_duration("1h") == 3600
+        assert parse_duration("12") == 12
+        assert parse_duration(None) is None
+        assert parse_duration("soon") is None
+
+
+class TestAdaptiveLimiter:
+    """Tests for the AIMD concurrency limiter."""
+
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter("test", initial_limit=4, min_limit=1, max_limit=5)
+        for _ in range(4):
+            limiter.on_success()
+        assert 4.9 < limiter.limit <= 5
+        limiter.on_overload()
+        assert limiter.limit == pytest.approx(2.5, abs=0.1)
+        for _ in range(5):
+            limiter.on_overload()
+        assert limiter.limit == 1
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency(self):
+        limiter = AdaptiveLimiter("test", initial_limit=2)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            await limiter.acquire()
+            try:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+            finally:
+                limiter.release()
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_headers_pause_calls(self):
+        limiter = AdaptiveLimiter("test", initial_limit=4)
+        limiter.observe_headers({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "50ms",
+        })
+        waited = await limiter.acquire()
+        assert waited >= 0.04
+
+    def test_headers_with_remaining_budget_do_not_pause(self):
+        limiter = AdaptiveLimiter("test", initial_limit=4)
+        limiter.observe_headers({
+            "x-ratelimit-remaining-requests": "10",
+            "x-ratelimit-reset-requests": "5s",
+        })
+        assert limiter.stats()["paused_for"] == 0
+
+
+class TestCircuitBreaker:
+    """Tests for the circuit breaker state machine."""
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(ServiceUnavailableError) as exc_info:
+            breaker.before_call()
+        assert 29 <= exc_info.value.retry_after <= 30
+
+    def test_half_open_probe(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("app.services.resilience.time.monotonic", lambda: now[0])
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+        breaker.record_failure()
+
+        now[0] += 11
+        breaker.before_call()  # the probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(ServiceUnavailableError):
+            breaker.before_call()  # only one probe at a time
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        now[0] += 11
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_frees_the_breaker_and_limiter(self, monkeypatch):
+        """A probe cancelled mid-call (SLO timeout, client gone) must not lock the breaker."""
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0)
+        limiter = AdaptiveLimiter("test", initial_limit=1)
+        monkeypatch.setattr(groq_service, "groq_breaker", breaker)
+        monkeypatch.setattr(groq_service, "groq_limiter", limiter)
+        stub = GroqStub(default=ModelBehavior(delay=5))
+        await groq_service.close_client()
+        await groq_service.init_client(http_client=stub.http_client())
+        breaker.record_failure()
+
+        probe = asyncio.create_task(groq_service.create_completion(model="m", messages=[]))
+        while not stub.requests:
+            await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        await groq_service.close_client()
+
+        assert limiter.in_flight == 0
+        breaker.before_call()  # the next call gets to probe
+
+    @pytest.mark.asyncio
+    async def test_client_error_does_not_close_a_half_open_breaker(self, monkeypatch):
+        """A probe answered with a 4xx says nothing about upstream health."""
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0)
+        monkeypatch.setattr(groq_service, "groq_breaker", breaker)
+        monkeypatch.setattr(groq_service, "groq_limiter", AdaptiveLimiter("test", initial_limit=1))
+        await groq_service.close_client()
+        await groq_service.init_client(http_client=GroqStub(default=ModelBehavior(status=413)).http_client())
+        breaker.record_failure()
+
+        with pytest.raises(APIStatusError):
+            await groq_service.create_completion(model="m", messages=[])
+        await groq_service.close_client()
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()  # the next call gets to probe
+
+    def test_retry_after_extends_open_window(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=5)
+        breaker.record_failure(retry_after=60)
+        assert breaker.stats()["retry_after"] > 55
+
+
+def test_open_breaker_returns_503_with_retry_after(client, auth_headers, open_groq_breaker):
+    """Recipe generation fails fast with a Retry-After hint while the breaker is open."""
+    from tests.test_recipes import create_scan_with_ingredients
+
+    scan_id = create_scan_with_ingredients(
+        client, auth_headers, [{"name": "Eggs", "quantity": "2", "confidence": 0.9}]
+    )
+    response = client.post(
+        "/api/v1/recipes/generate",
+        json={"scan_id": scan_id, "count": 1},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert int(response.headers["Retry-After"]) >= 1
+
+    health = client.get("/api/v1/health/health/llm").json()
+    assert health["breaker"]["state"] == "open"
+    assert health["status"] == "degraded"
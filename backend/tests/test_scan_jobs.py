@@ -0,0 +1,140 @@
+import asyncio
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.scan_jobs import scan_workers
+from tests.conftest import TestingSessionLocal
+
+DETECTED = [{"name": "Kale", "quantity": "1 bunch", "confidence": 0.9}]
+
+
+@pytest.fixture
+def workers(client, monkeypatch):
+    """Run scans on the worker pool against the test database, with fast retries."""
+    monkeypatch.setattr(settings, "SCAN_WORKERS", 2)
+    monkeypatch.setattr(settings, "SCAN_QUEUE_MAX_DEPTH", 10)
+    monkeypatch.setattr(settings, "SCAN_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(scan_workers, "session_factory", TestingSessionLocal)
+    yield
+    client.portal.call(scan_workers.shutdown)
+
+
+def upload(client, auth_headers):
+    img_bytes = BytesIO()
+    Image.new("RGB", (40, 40), color="green").save(img_bytes, format="PNG")
+    img_bytes.seek(0)
+    return client.post("/api/v1/scans", files={"file": ("kale.png", img_bytes, "image/png")}, headers=auth_headers)
+
+
+def finished_scan(client, db, auth_headers, scan_id) -> dict:
+    client.portal.call(scan_workers.join)
+    db.expire_all()
+    response = client.get(f"/api/v1/scans/{scan_id}", headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_create_scan_returns_202_and_detects_in_background(client, db, auth_headers, workers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = DETECTED
+        response = upload(client, auth_headers)
+
+        assert response.status_code == 202
+        body = response.json()
+        assert body["status"] == "processing"
+        assert body["stage"] == "queued"
+        assert response.headers["Location"].endswith(f"/api/v1/scans/{body['id']}")
+
+        scan = finished_scan(client, db, auth_headers, body["id"])
+
+    assert scan["status"] == "completed"
+    assert scan["stage"] == "completed"
+    assert scan["attempts"] == 1
+    assert scan["ingredients"] == DETECTED
+
+
+def test_failed_detection_is_retried(client, db, auth_headers, workers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = [Exception("vision model hiccup"), DETECTED]
+        scan_id = upload(client, auth_headers).json()["id"]
+        scan = finished_scan(client, db, auth_headers, scan_id)
+
+    assert scan["status"] == "completed"
+    assert scan["attempts"] == 2
+    assert scan["error"] is None
+    assert mock_detect.call_count == 2
+
+
+def test_detection_fails_after_max_attempts(client, db, auth_headers, workers):
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.side_effect = Exception("vision model down")
+        scan_id = upload(client, auth_headers).json()["id"]
+        scan = finished_scan(client, db, auth_headers, scan_id)
+
+    assert scan["status"] == "failed"
+    assert scan["attempts"] == settings.SCAN_DETECTION_MAX_ATTEMPTS
+    assert scan["error"] == "vision model down"
+    assert mock_detect.call_count == settings.SCAN_DETECTION_MAX_ATTEMPTS
+
+
+def test_full_queue_returns_503(client, db, auth_headers, workers, monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_WORKERS", 1)
+    monkeypatch.setattr(settings, "SCAN_QUEUE_MAX_DEPTH", 1)
+
+    async def slow_detect(image_path):
+        await asyncio.sleep(0.3)
+        return DETECTED
+
+    before = scan_workers.stats()
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image", new=slow_detect):
+        running = upload(client, auth_headers)
+        time.sleep(0.05)  # let the worker pick it up
+        queued = upload(client, auth_headers)
+        rejected = upload(client, auth_headers)
+
+        assert (running.status_code, queued.status_code) == (202, 202)
+        assert rejected.status_code == 503
+        assert int(rejected.headers["Retry-After"]) >= 1
+
+        for response in (running, queued):
+            assert finished_scan(client, db, auth_headers, response.json()["id"])["status"] == "completed"
+
+    stats = client.get("/api/v1/health/health/scans").json()
+    assert stats["rejected"] - before["rejected"] == 1
+    assert stats["processed"] - before["processed"] == 2
+
+
+def test_backoff_grows_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_RETRY_BACKOFF_SECONDS", 1.0)
+    monkeypatch.setattr(settings, "SCAN_DETECTION_MAX_ATTEMPTS", 3)
+
+    assert 0.8 <= scan_workers.backoff(1) <= 1.2
+    assert 1.6 <= scan_workers.backoff(2) <= 2.4
+    assert scan_workers.backoff(1, retry_after=10) == 10
+    assert scan_workers.backoff(3) is None
+
+
+def test_batch_scan_is_detected_on_the_pool(client, db, auth_headers, workers):
+    images = []
+    for color in ("green", "red"):
+        img_bytes = BytesIO()
+        Image.new("RGB", (40, 40), color=color).save(img_bytes, format="PNG")
+        img_bytes.seek(0)
+        images.append(("files", (f"{color}.png", img_bytes, "image/png")))
+
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        mock_detect.return_value = DETECTED
+        response = client.post("/api/v1/scans/batch", files=images, headers=auth_headers)
+        assert response.status_code == 202
+        assert [child["stage"] for child in response.json()["children"]] == ["queued", "queued"]
+
+        scan = finished_scan(client, db, auth_headers, response.json()["id"])
+
+    assert scan["status"] == "completed"
+    assert scan["ingredients"] == [{**DETECTED[0], "sources": 2}]
+    assert scan_workers.processed >= 1
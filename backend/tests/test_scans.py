@@ -74,3 +74,61 @@ def test_update_scan_ingredients(client, auth_headers):
 
         assert response.status_code == status.HTTP_200_OK
         assert len(response.json()["ingredients"]) == 2
+
+def test_oversized_upload_is_refused_before_parsing(client, auth_headers, monkeypatch):
+    """A body over the limit gets a 413 from its Content-Length, without being read."""
+    from unittest.mock import patch
+
+    from app.config import settings
+    from app.middleware.body_limit import max_body_size
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1024)
+    files = {"file": ("big.jpg", BytesIO(b"\xff\xd8\xff\xe0" + b"x" * max_body_size("/")), "image/jpeg")}
+    with patch("app.api.v1.endpoints.scans.detect_ingredients_from_image") as mock_detect:
+        response = client.post("/api/v1/scans", files=files, headers=auth_headers)
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert "too large" in response.json()["detail"]
+    assert not mock_detect.called
+
+@pytest.mark.asyncio
+async def test_oversized_chunked_upload_is_cut_off(client, auth_headers, monkeypatch):
+    """Without a Content-Length the body is read only until it passes the limit."""
+    from app.config import settings
+    from app.main import app
+    from app.middleware.body_limit import max_body_size
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1024)
+    head = (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n\xff\xd8\xff\xe0"
+    )
+    chunk = b"x" * 16 * 1024
+    received = []
+
+    async def receive():
+        received.append(1)
+        if len(received) == 1:
+            return {"type": "http.request", "body": head, "more_body": True}
+        # About 1.6MB in all, far past the limit
+        return {"type": "http.request", "body": chunk, "more_body": len(received) < 100}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/v1/scans", "raw_path": b"/api/v1/scans", "query_string": b"",
+        "root_path": "", "client": ("testclient", 50000), "server": ("testserver", 80),
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"multipart/form-data; boundary=b"),
+            (b"authorization", auth_headers["Authorization"].encode()),
+        ],
+    }
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert (len(received) - 1) * len(chunk) <= max_body_size("/scans") + len(chunk)
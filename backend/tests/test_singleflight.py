@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical concurrent calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return [{"title": "Shared"}]
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+        assert calls == 1
+        assert results == [[{"title": "Shared"}]] * 3
+        assert results[0] is not results[1]
+        assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_and_sequential_calls_run_separately(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b")))
+        await flight.do("a", lambda: work("a"))
+
+        assert sorted(calls) == ["a", "a", "b"]
+        assert flight.coalesced == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.do("key", work), flight.do("key", work), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_work(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
@@ -0,0 +1,108 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.ingredient_merge import combine_crop_detections
+from app.services.tiled_detection import detect_tiled, is_low_confidence, tile_boxes
+
+QUADRANTS = {(255, 0, 0): "tomato", (0, 255, 0): "lettuce", (0, 0, 255): "blueberries", (255, 255, 0): "lemon"}
+
+
+def quadrant_photo(size=(1600, 1200)) -> bytes:
+    img = Image.new("RGB", size)
+    w, h = size[0] // 2, size[1] // 2
+    for (x, y), color in zip([(0, 0), (w, 0), (0, h), (w, h)], QUADRANTS, strict=True):
+        img.paste(color, (x, y, x + w, y + h))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class FakeDetector:
+    """Names the colors filling a crop; unsure of blueberries until seen up close."""
+
+    def __init__(self, fail_full_frame=False):
+        self.calls = []
+        self.fail_full_frame = fail_full_frame
+
+    async def __call__(self, image_bytes: bytes) -> list[dict]:
+        if image_bytes == b"full-frame":
+            self.calls.append("full-frame")
+            if self.fail_full_frame:
+                raise RuntimeError("full frame timed out")
+            return []
+
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            colors = img.convert("RGB").quantize(colors=8).convert("RGB").getcolors()
+            size = img.size
+        self.calls.append(size)
+        found = []
+        for count, rgb in colors:
+            if count / (size[0] * size[1]) < 0.2:
+                continue
+            name = QUADRANTS[min(QUADRANTS, key=lambda q: sum((a - b) ** 2 for a, b in zip(q, rgb, strict=True)))]
+            confidence = 0.5 if name == "blueberries" and size[0] > 500 else 0.9
+            found.append({"name": name, "quantity": "some", "confidence": confidence})
+        return found
+
+
+def test_tiles_overlap_and_cover_the_region():
+    boxes = tile_boxes(2, 0.2)
+
+    assert boxes[0] == pytest.approx((0.0, 0.0, 0.55, 0.55))
+    assert boxes[3] == pytest.approx((0.45, 0.45, 1.0, 1.0))
+    assert tile_boxes(2, 0.0, (0.5, 0.5, 1.0, 1.0))[0] == pytest.approx((0.5, 0.5, 0.75, 0.75))
+
+
+def test_low_confidence_is_the_mean_of_what_a_tile_found():
+    assert is_low_confidence([{"confidence": 0.9}, {"confidence": 0.4}], 0.7)
+    assert not is_low_confidence([{"confidence": 0.9}, {"confidence": 0.6}], 0.7)
+    assert not is_low_confidence([], 0.7)
+
+
+def test_crop_confidence_is_aggregated_as_noisy_or():
+    combined = combine_crop_detections([
+        [{"name": "Eggs", "quantity": "6", "confidence": 0.6}],
+        [{"name": "egg", "quantity": "4", "confidence": 0.5}, {"name": "milk", "confidence": 0.7}],
+    ])
+
+    assert combined == [
+        {"name": "Eggs", "quantity": "6", "confidence": 0.8},
+        {"name": "milk", "confidence": 0.7},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_only_low_confidence_tiles_are_requeried():
+    detect = FakeDetector()
+
+    ingredients = await detect_tiled(b"full-frame", detect, source=quadrant_photo(), grid=2, overlap=0.0)
+
+    # Full frame, four tiles, and four closer crops of the blueberry tile
+    assert len(detect.calls) == 9
+    assert detect.calls[5:] == [(400, 300)] * 4
+    assert {i["name"] for i in ingredients} == set(QUADRANTS.values())
+    blueberries = next(i for i in ingredients if i["name"] == "blueberries")
+    assert blueberries["confidence"] > 0.9
+
+
+@pytest.mark.asyncio
+async def test_failed_calls_are_skipped_unless_all_fail():
+    detect = FakeDetector(fail_full_frame=True)
+    ingredients = await detect_tiled(b"full-frame", detect, source=quadrant_photo(), grid=2, overlap=0.0)
+    assert len(ingredients) == 4
+
+    async def down(image_bytes):
+        raise RuntimeError("vision model down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        await detect_tiled(b"full-frame", down, source=quadrant_photo())
+
+
+@pytest.mark.asyncio
+async def test_undecodable_source_falls_back_to_the_full_frame():
+    async def detect(image_bytes):
+        return [{"name": "kale", "confidence": 0.9}]
+
+    assert await detect_tiled(b"not an image", detect) == [{"name": "kale", "confidence": 0.9}]
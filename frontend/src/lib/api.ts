@@ -11,10 +11,16 @@ import type {
   PantryItem,
   PantryItemCreate,
   PantryItemUpdate,
-  PantryResponse
+  PantryResponse,
+  PantrySyncResponse
 } from '@/types/api';
 import { safeLocalStorage } from '@/store/auth';
-import { UPLOAD_TIMEOUT_MS, DEFAULT_PAGE_SIZE } from '@/lib/constants';
+import {
+  UPLOAD_TIMEOUT_MS,
+  DEFAULT_PAGE_SIZE,
+  SCAN_POLL_INTERVAL_MS,
+  SCAN_POLL_TIMEOUT_MS,
+} from '@/lib/constants';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
 
@@ -132,6 +138,16 @@ export const authApi = {
   },
 };
 
+// 202 Accepted: detection runs in the background, poll until it finishes
+async function waitForScan(scan: Scan): Promise<Scan> {
+  const deadline = Date.now() + SCAN_POLL_TIMEOUT_MS;
+  while (scan.status === 'processing' && Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, SCAN_POLL_INTERVAL_MS));
+    scan = await scansApi.get(scan.id);
+  }
+  return scan;
+}
+
 // Scans API
 export const scansApi = {
   create: async (file: File): Promise<Scan> => {
@@ -144,7 +160,19 @@ export const scansApi = {
       },
       timeout: UPLOAD_TIMEOUT_MS,
     });
-    return data;
+    return waitForScan(data);
+  },
+  // Several photos of one fridge; the returned scan holds their merged ingredients
+  createBatch: async (files: File[]): Promise<Scan> => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    const { data } = await api.post('/scans/batch', formData, {
+      headers: {
+        'Content-Type': undefined,
+      },
+      timeout: UPLOAD_TIMEOUT_MS,
+    });
+    return waitForScan(data);
   },
   list: async (limit = DEFAULT_PAGE_SIZE, offset = 0): Promise<Scan[]> => {
     const { data } = await api.get('/scans', { params: { limit, offset } });
@@ -272,4 +300,11 @@ export const pantryApi = {
   clear: async (): Promise<void> => {
     await api.delete('/pantry');
   },
+  syncScan: async (
+    scanId: string,
+    options: { remove_missing?: boolean; full?: boolean } = {}
+  ): Promise<PantrySyncResponse> => {
+    const { data } = await api.post('/pantry/sync', { scan_id: scanId, ...options });
+    return data;
+  },
 };
@@ -2,6 +2,8 @@
 export const UPLOAD_TIMEOUT_MS = 60_000;
 export const RECIPE_REDIRECT_DELAY_MS = 500;
 export const SCAN_STAGE_DELAY_MS = 1_500;
+export const SCAN_POLL_INTERVAL_MS = 1_000;
+export const SCAN_POLL_TIMEOUT_MS = 120_000;
 
 // Pagination
 export const DEFAULT_PAGE_SIZE = 20;
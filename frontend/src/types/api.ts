@@ -21,6 +21,22 @@ export interface Ingredient {
   name: string;
   quantity: string;
   confidence: number;
+  // Batch scans: number of images the ingredient was seen in
+  sources?: number;
+}
+
+export interface IngredientChange {
+  name: string;
+  quantity: string | null;
+  previous_quantity: string | null;
+}
+
+// What changed since the user's previous completed scan
+export interface ScanDiff {
+  added: Ingredient[];
+  removed: Ingredient[];
+  changed: IngredientChange[];
+  unchanged: number;
 }
 
 export interface Scan {
@@ -29,6 +45,14 @@ export interface Scan {
   image_path: string;
   ingredients: Ingredient[];
   status: 'pending' | 'processing' | 'completed' | 'failed';
+  stage?: 'queued' | 'detecting' | 'retrying' | 'completed' | 'failed';
+  attempts?: number;
+  error?: string | null;
+  parent_id?: string | null;
+  // Batch scans: one per uploaded image
+  children?: Pick<Scan, 'id' | 'image_path' | 'status' | 'stage' | 'error' | 'ingredients'>[];
+  previous_scan_id?: string | null;
+  diff?: ScanDiff | null;
   created_at: string;
   updated_at: string;
 }
@@ -112,6 +136,13 @@ export interface PantryResponse {
   categories: string[];
 }
 
+export interface PantrySyncResponse {
+  added: PantryItem[];
+  updated: PantryItem[];
+  removed: string[];
+  unchanged: number;
+}
+
 // API response types
 export interface AuthResponse {
   access_token: string;